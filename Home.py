@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.styles import get_css, apply_custom_styles
+from utils.metrics import metrics
 from pathlib import Path
 
 # Page config
@@ -84,7 +85,8 @@ nav_items = {
     "🔍 Search": "pages/1_Document_Search",
     "📚 Library": "pages/2_Document_Library",
     "⚙️ Settings": "pages/5_Settings",
-    "📋 Logs": "pages/4_Logs"
+    "📋 Logs": "pages/4_Logs",
+    "📈 Metrics": "pages/6_Metrics"
 }
 
 # Create navigation container
@@ -103,6 +105,9 @@ for idx, (label, page) in enumerate(nav_items.items()):
             if page:
                 st.switch_page(page + ".py")
 
+# Start the Prometheus exporters configured in the environment (once per process)
+metrics.start_exporters_from_env()
+
 # Hero section
 st.markdown("""
 <div class="hero-container">
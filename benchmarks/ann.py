@@ -0,0 +1,105 @@
+"""Approximate nearest-neighbour backends for the vector search benchmark.
+
+Each backend indexes chunk vectors and returns document numbers ranked by best chunk score.
+IVF is pure NumPy; HNSW is used when the optional hnswlib package is installed.
+"""
+import numpy as np
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+
+def _top_documents(chunk_ids, scores, doc_of_chunk, k):
+    """Collapse scored chunks to the k best distinct documents"""
+    order = np.argsort(-scores)
+    docs = doc_of_chunk[chunk_ids[order]]
+    _, first = np.unique(docs, return_index=True)
+    return docs[np.sort(first)][:k].tolist()
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means lists, scanning only the nprobe closest lists"""
+
+    name = "ivf"
+
+    def __init__(self, nlist=None, nprobe=8, train_size=50000, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+
+    def params(self):
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "train_size": self.train_size,
+                "iterations": self.iterations}
+
+    def build(self, matrix, doc_of_chunk):
+        rng = np.random.default_rng(self.seed)
+        n = len(matrix)
+        self.nlist = self.nlist or max(1, min(int(4 * np.sqrt(n)), n))
+        sample = matrix[rng.choice(n, min(self.train_size, n), replace=False)]
+        centroids = sample[rng.choice(len(sample), min(self.nlist, len(sample)), replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+        self.nlist = len(centroids)
+        self.centroids = centroids
+
+        assignment = np.concatenate([
+            np.argmax(matrix[start:start + 65536] @ centroids.T, axis=1)
+            for start in range(0, n, 65536)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        # Lists are stored contiguously so a probe scans one slice per list
+        self.vectors = matrix[order]
+        self.chunk_ids = order
+        self.offsets = np.searchsorted(assignment[order], np.arange(self.nlist + 1))
+        self.doc_of_chunk = doc_of_chunk
+
+    def search(self, query, k):
+        probes = np.argpartition(-(self.centroids @ query), min(self.nprobe, self.nlist) - 1)[:self.nprobe]
+        rows = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes])
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ query
+        return _top_documents(self.chunk_ids[rows], scores, self.doc_of_chunk, k)
+
+
+class HNSWIndex:
+    """Hierarchical navigable small-world graph from hnswlib"""
+
+    name = "hnsw"
+
+    def __init__(self, m=16, ef_construction=200, ef_search=128, overfetch=4, threads=-1):
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.overfetch = overfetch
+        self.threads = threads
+
+    def params(self):
+        return {"m": self.m, "ef_construction": self.ef_construction, "ef_search": self.ef_search,
+                "overfetch": self.overfetch}
+
+    def build(self, matrix, doc_of_chunk):
+        if not HNSWLIB_AVAILABLE:
+            raise RuntimeError("hnswlib is not installed (pip install hnswlib)")
+        self.index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        self.index.init_index(max_elements=len(matrix), ef_construction=self.ef_construction, M=self.m)
+        self.index.add_items(matrix, np.arange(len(matrix)), num_threads=self.threads)
+        self.doc_of_chunk = doc_of_chunk
+
+    def search(self, query, k):
+        # Several chunks of one document can crowd the neighbour list, so fetch extra
+        fetch = min(k * self.overfetch, self.index.get_current_count())
+        self.index.set_ef(max(self.ef_search, fetch))
+        labels, distances = self.index.knn_query(query, k=fetch)
+        return _top_documents(labels[0].astype(np.int64), 1.0 - distances[0], self.doc_of_chunk, k)
@@ -0,0 +1,271 @@
+"""Shared helpers for the benchmark suites: deterministic synthetic data, latency statistics
+and machine-readable result files that can be compared across commits."""
+import hashlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+# Corpus vectors are generated in fixed-size blocks so the data never depends on batch sizes
+GENERATION_BLOCK = 65536
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for the embeddings API: the same text always maps to the same
+    unit vector, and texts sharing a topic word land near the same cluster centre"""
+
+    def __init__(self, dims=1536, clusters=64, noise=0.35, seed=0):
+        self.dims = dims
+        self.clusters = clusters
+        self.noise = noise
+        self.centers = _unit_rows(np.random.default_rng(seed).standard_normal((clusters, dims)))
+
+    @staticmethod
+    def _digest(text):
+        return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+    def embed(self, text):
+        """Return the embedding of one text as a list of floats"""
+        return self.embed_many([text])[0].tolist()
+
+    def embed_many(self, texts):
+        """Return a (texts x dims) float32 matrix of embeddings"""
+        vectors = np.empty((len(texts), self.dims), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.split()
+            topic = self._digest(words[0].lower() if words else "") % self.clusters
+            rng = np.random.default_rng(self._digest(text))
+            vectors[row] = self.centers[topic] + self.noise * rng.standard_normal(self.dims) / np.sqrt(self.dims)
+        return _unit_rows(vectors)
+
+
+class SyntheticCorpus:
+    """Deterministic clustered corpus of chunk embeddings grouped into documents"""
+
+    def __init__(self, num_chunks, dims=1536, chunks_per_doc=10, clusters=256, noise=1.0, seed=0):
+        self.num_chunks = num_chunks
+        self.dims = dims
+        self.chunks_per_doc = chunks_per_doc
+        self.clusters = clusters
+        self.noise = noise
+        self.seed = seed
+        self.centers = _unit_rows(np.random.default_rng(seed).standard_normal((clusters, dims)))
+
+    @property
+    def num_documents(self):
+        return -(-self.num_chunks // self.chunks_per_doc)
+
+    def params(self):
+        return {
+            "chunks": self.num_chunks,
+            "documents": self.num_documents,
+            "dims": self.dims,
+            "chunks_per_doc": self.chunks_per_doc,
+            "clusters": self.clusters,
+            "noise": self.noise,
+            "seed": self.seed
+        }
+
+    def _block(self, block):
+        """Generate one block of chunk vectors"""
+        start = block * GENERATION_BLOCK
+        size = min(GENERATION_BLOCK, self.num_chunks - start)
+        rng = np.random.default_rng([self.seed, block])
+        topics = rng.integers(0, self.clusters, size)
+        noise = rng.standard_normal((size, self.dims), dtype=np.float32)
+        return _unit_rows(self.centers[topics] + self.noise * noise / np.sqrt(self.dims))
+
+    def iter_blocks(self):
+        """Yield (first chunk number, vectors) blocks covering the corpus"""
+        for block in range(-(-self.num_chunks // GENERATION_BLOCK)):
+            yield block * GENERATION_BLOCK, self._block(block)
+
+    def matrix(self):
+        """Return the full (chunks x dims) float32 matrix"""
+        matrix = np.empty((self.num_chunks, self.dims), dtype=np.float32)
+        for start, vectors in self.iter_blocks():
+            matrix[start:start + len(vectors)] = vectors
+        return matrix
+
+    def doc_starts(self):
+        """Return the first chunk row of every document"""
+        return np.arange(0, self.num_chunks, self.chunks_per_doc, dtype=np.int64)
+
+    def doc_of_chunk(self):
+        """Return the document number of every chunk row"""
+        return np.arange(self.num_chunks, dtype=np.int64) // self.chunks_per_doc
+
+    def iter_documents(self, batch_chunks=GENERATION_BLOCK):
+        """Yield lists of documents shaped like the MongoDB schema"""
+        batch = []
+        for start, vectors in self.iter_blocks():
+            for offset in range(0, len(vectors), self.chunks_per_doc):
+                first = start + offset
+                doc_number = first // self.chunks_per_doc
+                rows = vectors[offset:offset + self.chunks_per_doc]
+                batch.append({
+                    "doc_number": doc_number,
+                    "filename": f"synthetic_{doc_number:08d}.txt",
+                    "file_type": "txt",
+                    "created_at": datetime(2024, 1, 1),
+                    "content": "",
+                    "chunks": [
+                        {"text": f"chunk {first + i}", "embedding": row.tolist()}
+                        for i, row in enumerate(rows)
+                    ]
+                })
+                if len(batch) * self.chunks_per_doc >= batch_chunks:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def queries(self, count, seed=None):
+        """Return (count x dims) query vectors drawn from the corpus topic clusters"""
+        rng = np.random.default_rng([self.seed if seed is None else seed, 1])
+        topics = rng.integers(0, self.clusters, count)
+        noise = rng.standard_normal((count, self.dims), dtype=np.float32)
+        return _unit_rows(self.centers[topics] + self.noise * noise / np.sqrt(self.dims))
+
+
+def _unit_rows(matrix):
+    """Scale each row to unit length, as the embeddings API does"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def exact_top_documents(corpus, queries, k):
+    """Ground-truth top-k document numbers per query by best chunk similarity.
+
+    The corpus is scored one generated block at a time and only each query's running top-k is
+    kept, so ground truth for any corpus size fits in memory.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    best_docs = np.empty((len(queries), 0), dtype=np.int64)
+    carry_doc = carry_scores = None
+    for start, vectors in corpus.iter_blocks():
+        scores = queries @ vectors.T
+        docs = (start + np.arange(len(vectors))) // corpus.chunks_per_doc
+        first_rows = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        doc_scores = np.maximum.reduceat(scores, first_rows, axis=1)
+        doc_numbers = docs[first_rows]
+        if carry_doc is not None:
+            if doc_numbers[0] == carry_doc:
+                doc_scores[:, 0] = np.maximum(doc_scores[:, 0], carry_scores)
+            else:
+                best_scores, best_docs = _merge_top(best_scores, best_docs, carry_scores[:, None],
+                                                    np.array([carry_doc]), k)
+        # The block's last document may continue in the next block
+        carry_doc, carry_scores = doc_numbers[-1], doc_scores[:, -1]
+        best_scores, best_docs = _merge_top(best_scores, best_docs, doc_scores[:, :-1], doc_numbers[:-1], k)
+    if carry_doc is not None:
+        best_scores, best_docs = _merge_top(best_scores, best_docs, carry_scores[:, None],
+                                            np.array([carry_doc]), k)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_docs, order, axis=1).tolist()
+
+
+def _merge_top(scores, docs, new_scores, new_docs, k):
+    """Keep the k best (score, document) pairs per row of two candidate sets"""
+    scores = np.hstack([scores, new_scores])
+    docs = np.hstack([docs, np.broadcast_to(new_docs, new_scores.shape)])
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        docs = np.take_along_axis(docs, keep, axis=1)
+    return scores, docs
+
+
+def latency_summary(latencies):
+    """Summarize latencies in seconds as millisecond percentiles"""
+    if not latencies:
+        return {"count": 0}
+    ms = np.asarray(latencies) * 1000.0
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max())
+    }
+
+
+def recall_at_k(results, truth, k):
+    """Mean fraction of the true top-k found in each result list"""
+    if not truth:
+        return None
+    found = [len(set(result[:k]) & set(expected[:k])) / max(len(expected[:k]), 1)
+             for result, expected in zip(results, truth)]
+    return float(np.mean(found))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in megabytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_metadata():
+    """Describe the code and machine a benchmark ran on"""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "--short", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def write_results(name, payload, out=None):
+    """Write a result file; by default one file per run under benchmarks/results/"""
+    metadata = run_metadata()
+    if out is None:
+        stamp = metadata["timestamp"].replace(":", "").replace("-", "")
+        out = RESULTS_DIR / f"{name}_{stamp}_{metadata['commit'] or 'nogit'}.json"
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": name, "run": metadata, **payload}, f, indent=2, default=str)
+    return out
+
+
+def _lookup(payload, path):
+    for key in path.split("."):
+        if not isinstance(payload, dict) or key not in payload:
+            return None
+        payload = payload[key]
+    return payload
+
+
+def compare_results(current, baseline, metrics):
+    """Return (metric, baseline value, current value, relative change) for dotted metric paths"""
+    rows = []
+    for metric in metrics:
+        before, after = _lookup(baseline, metric), _lookup(current, metric)
+        change = (after - before) / before if isinstance(before, (int, float)) and before and after is not None else None
+        rows.append((metric, before, after, change))
+    return rows
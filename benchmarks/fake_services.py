@@ -0,0 +1,173 @@
+"""Local stand-ins for external services used by the benchmarks."""
+import json
+import queue
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.common import FakeEmbedder
+
+
+class FakeEmbeddingServer:
+    """OpenAI-compatible /v1/embeddings endpoint with deterministic vectors and injected latency.
+
+    Point the OpenAI SDK at it with OPENAI_BASE_URL=server.base_url.
+    """
+
+    def __init__(self, embedder=None, latency_ms=0.0, per_input_ms=0.0, error_rate=0.0,
+                 host="127.0.0.1", port=0, seed=0):
+        self.embedder = embedder or FakeEmbedder(seed=seed)
+        self.latency_ms = latency_ms
+        self.per_input_ms = per_input_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.inputs = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; avoid delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                texts = body.get("input", [])
+                texts = [texts] if isinstance(texts, str) else texts
+                with server._lock:
+                    server.requests += 1
+                    server.inputs += len(texts)
+                    # Fail every 1/error_rate-th request, deterministically
+                    fail = server.error_rate and server.requests % max(int(1 / server.error_rate), 1) == 0
+                    if fail:
+                        server.errors += 1
+                time.sleep((server.latency_ms + server.per_input_ms * len(texts)) / 1000.0)
+                if not self.path.endswith("/embeddings"):
+                    return self._send(404, {"error": {"message": "Not found"}})
+                if fail:
+                    return self._send(503, {"error": {"message": "Injected failure"}})
+                vectors = server.embedder.embed_many(texts)
+                tokens = sum(len(text.split()) for text in texts)
+                self._send(200, {
+                    "object": "list",
+                    "model": body.get("model"),
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": vector.tolist()}
+                        for i, vector in enumerate(vectors)
+                    ],
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+                })
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-embeddings", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def get_stats(self):
+        with self._lock:
+            return {"requests": self.requests, "inputs": self.inputs, "errors": self.errors}
+
+
+class LatencyProxy:
+    """TCP proxy that delays traffic in both directions, to make a local server look remote"""
+
+    def __init__(self, target_host, target_port, latency_ms=0.0, host="127.0.0.1", port=0):
+        self.target = (target_host, target_port)
+        # Half the round trip is added in each direction
+        self.delay = latency_ms / 2000.0
+        self.connections = 0
+        self._listener = socket.create_server((host, port))
+        self._lock = threading.Lock()
+
+    @property
+    def address(self):
+        return self._listener.getsockname()[:2]
+
+    def start(self):
+        threading.Thread(target=self._accept, name="latency-proxy", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._listener.close()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                client.close()
+                continue
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self.connections += 1
+            for source, destination in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self._pump, args=(source, destination), daemon=True).start()
+
+    def _pump(self, source, destination):
+        # Reads are timestamped on arrival so back-to-back segments are delayed once, not serially
+        pending = queue.Queue()
+
+        def deliver():
+            try:
+                while True:
+                    due, data = pending.get()
+                    if data is None:
+                        break
+                    wait = due - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    destination.sendall(data)
+            except OSError:
+                pass
+            finally:
+                for sock in (source, destination):
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    sock.close()
+
+        sender = threading.Thread(target=deliver, daemon=True)
+        sender.start()
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                pending.put((time.monotonic() + self.delay, data))
+        except OSError:
+            pass
+        pending.put((0, None))
@@ -0,0 +1,232 @@
+"""Ingestion throughput benchmark with a per-stage breakdown.
+
+Usage:
+    python -m benchmarks.ingestion --repeat 3 --embed-latency-ms 50
+    python -m benchmarks.ingestion --baseline benchmarks/results/ingestion_<earlier run>.json
+
+Runs the upload pipeline of the Library page over a fixed sample set: text extraction, cleaning,
+chunking, embedding (through OpenAIClient against a local fake server with injected latency) and
+MongoDB storage (against a local mongod; skipped if none is reachable). Reports pages/sec,
+chunks/sec, MB/sec, wall time per stage and peak RSS. The median of the repeats is reported.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from benchmarks.common import FakeEmbedder, compare_results, peak_rss_mb, write_results
+from benchmarks.fake_services import FakeEmbeddingServer
+from benchmarks.samples import count_pages, generate_samples
+
+STAGES = ("extract", "clean", "chunk", "embed", "store")
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - started
+
+    def wrap(self, name, fn):
+        """Time every call of fn as the given stage"""
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return timed
+
+    def breakdown(self):
+        """Stage times with cleaning taken out of extraction, which calls it"""
+        seconds = {stage: self.seconds.get(stage, 0.0) for stage in STAGES}
+        seconds["extract"] -= seconds["clean"]
+        return seconds
+
+
+def ingest(path, processor, timer, embed_mode, store):
+    """Run one file through the same steps as an upload on the Library page"""
+    from utils.mongodb import mongodb
+    from utils.openai_client import openai_client
+
+    with timer.stage("extract"):
+        extracted = processor.extract_document(path)
+        text_content = extracted["text"]
+    with timer.stage("chunk"):
+        chunks = processor.create_chunks(text_content)
+    with timer.stage("embed"):
+        if embed_mode == "batch":
+            embeddings = openai_client.get_embeddings(chunks)
+        else:
+            embeddings = [openai_client.get_embedding(chunk) for chunk in chunks]
+    if store:
+        with timer.stage("store"):
+            mongodb.store_document({
+                "filename": path.name,
+                "content": text_content[:1000] + "..." if len(text_content) > 1000 else text_content,
+                "chunks": [{"text": chunk, "embedding": embedding} for chunk, embedding in zip(chunks, embeddings)],
+                "content_hash": extracted["content_hash"],
+                "extractor_version": extracted["extractor_version"],
+                "created_at": datetime.utcnow()
+            })
+    return len(chunks)
+
+
+def connect_storage(args):
+    """Attach MongoDB to a scratch database; returns None or the reason storage is skipped"""
+    if args.no_store:
+        return "disabled with --no-store"
+    from utils.lexical_index import lexical_index
+    from utils.mongodb import mongodb, client_registry
+    try:
+        # Keep benchmark documents out of the application's database and keyword index
+        lexical_index.db_path = Path(tempfile.mkdtemp(prefix="bench-lexical-")) / "lexical.db"
+        mongodb.db_name = args.mongodb_database
+        client_registry.get_client(args.mongodb_uri).drop_database(args.mongodb_database)
+        mongodb.connect(args.mongodb_uri)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def run_once(samples, args):
+    from utils.document_processor import DocumentProcessor
+    from utils.text_store import TextStore
+
+    store = None
+    if args.text_store == "warm":
+        store = TextStore(args.warm_store_root)
+    elif args.text_store == "cold":
+        store = TextStore(tempfile.mkdtemp(prefix="bench-text-"))
+    processor = DocumentProcessor(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, store=store)
+    timer = StageTimer()
+    # extract_text cleans internally; timing the cleaner separates the two costs
+    processor._clean_text = timer.wrap("clean", processor._clean_text)
+    chunks = 0
+    started = time.perf_counter()
+    for path in samples:
+        chunks += ingest(path, processor, timer, args.embed_mode, store=args.store_skipped is None)
+    return {"wall_seconds": time.perf_counter() - started, "chunks": chunks, "stages": timer.breakdown()}
+
+
+def summarize(runs, pages, total_bytes):
+    """Median run figures with derived throughputs"""
+    wall = statistics.median(run["wall_seconds"] for run in runs)
+    chunks = runs[0]["chunks"]
+    stages = {stage: statistics.median(run["stages"][stage] for run in runs) for stage in STAGES}
+    return {
+        "wall_seconds": wall,
+        "pages_per_sec": pages / wall,
+        "chunks_per_sec": chunks / wall,
+        "mb_per_sec": total_bytes / (1024 * 1024) / wall,
+        "stages": {
+            stage: {"seconds": seconds, "share": seconds / wall if wall else 0.0}
+            for stage, seconds in stages.items()
+        }
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark document ingestion stage by stage")
+    parser.add_argument("--samples", default=None, help="Directory of PDF/TXT files (default: generated set)")
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--txts", type=int, default=4)
+    parser.add_argument("--txt-pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--embed-mode", choices=["per-chunk", "batch"], default="per-chunk",
+                        help="per-chunk matches the Library page; batch sends one request per batch")
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0, help="Injected latency per embeddings request")
+    parser.add_argument("--embed-per-input-ms", type=float, default=0.5, help="Extra latency per text in a request")
+    parser.add_argument("--text-store", choices=["none", "cold", "warm"], default="none",
+                        help="none parses every file; cold also writes an empty text store; "
+                             "warm reads text stored by an earlier pass (the re-chunk path)")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mongodb-uri", default=os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--mongodb-database", default="searchDb_benchmark")
+    parser.add_argument("--no-store", action="store_true", help="Skip the MongoDB storage stage")
+    parser.add_argument("--baseline", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/...)")
+    args = parser.parse_args(argv)
+
+    if args.samples:
+        samples = sorted(p for p in Path(args.samples).iterdir() if p.suffix.lower() in (".pdf", ".txt"))
+    else:
+        samples = generate_samples(tempfile.mkdtemp(prefix="bench-samples-"), args.pdfs, args.pdf_pages,
+                                   args.txts, args.txt_pages, seed=args.seed)
+    pages = sum(count_pages(path) for path in samples)
+    if args.text_store == "warm":
+        from utils.document_processor import DocumentProcessor
+        from utils.text_store import TextStore
+        args.warm_store_root = tempfile.mkdtemp(prefix="bench-text-")
+        warm = DocumentProcessor(store=TextStore(args.warm_store_root))
+        for path in samples:
+            warm.extract_document(path)
+    total_bytes = sum(path.stat().st_size for path in samples)
+
+    server = FakeEmbeddingServer(FakeEmbedder(dims=args.dims, seed=args.seed), args.embed_latency_ms,
+                                 args.embed_per_input_ms).start()
+    # The OpenAI SDK picks up the base URL when the client is created
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    from utils.openai_client import openai_client
+    openai_client.connect(api_key="benchmark")
+    args.store_skipped = connect_storage(args)
+    if args.store_skipped:
+        print(f"Storage stage skipped: {args.store_skipped}")
+
+    runs = []
+    try:
+        for repeat in range(args.repeat):
+            runs.append(run_once(samples, args))
+            print(f"Run {repeat + 1}/{args.repeat}: {runs[-1]['wall_seconds']:.2f}s")
+    finally:
+        server.stop()
+
+    summary = summarize(runs, pages, total_bytes)
+    print(f"{len(samples)} files, {pages} pages, {total_bytes / 1024:.0f} KB, {runs[0]['chunks']} chunks")
+    print(f"{summary['pages_per_sec']:.1f} pages/s, {summary['chunks_per_sec']:.1f} chunks/s, "
+          f"{summary['mb_per_sec']:.2f} MB/s")
+    for stage, figures in summary["stages"].items():
+        print(f"  {stage:8s} {figures['seconds']:8.3f}s  {figures['share']:6.1%}")
+
+    payload = {
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("out", "baseline", "mongodb_uri", "store_skipped", "warm_store_root")},
+        "inputs": {"files": [path.name for path in samples], "pages": pages, "bytes": total_bytes,
+                   "chunks": runs[0]["chunks"]},
+        "storage_skipped": args.store_skipped,
+        "embedding_server": server.get_stats(),
+        "peak_rss_mb": peak_rss_mb(),
+        "summary": summary,
+        "runs": runs
+    }
+    out = write_results("ingestion", payload, args.out)
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        metrics = ["summary.pages_per_sec", "summary.chunks_per_sec", "summary.mb_per_sec", "peak_rss_mb"]
+        metrics += [f"summary.stages.{stage}.seconds" for stage in STAGES]
+        print(f"Compared with {baseline['run'].get('commit')}:")
+        for metric, before, after, change in compare_results(payload, baseline, metrics):
+            if change is not None:
+                print(f"  {metric:32s} {before:10.3f} -> {after:10.3f}  {change:+.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,232 @@
+"""Multi-user load test for the search path.
+
+Usage:
+    python -m benchmarks.load_test --users 50 --duration 60 --mix search=0.8,library=0.2
+
+Each simulated user repeats what a Streamlit session does on the Search and Library pages:
+attach to MongoDB, then run a search (OpenAIClient + MongoDB + keyword index) or list the
+library, pausing for a random think time in between. OpenAI is replaced by a local fake
+embeddings server and MongoDB by a local mongod (optionally behind a latency proxy), seeded
+with a synthetic corpus in a scratch database. Reports throughput, tail latency and errors.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from benchmarks.common import FakeEmbedder, latency_summary, peak_rss_mb, write_results
+from benchmarks.fake_services import FakeEmbeddingServer, LatencyProxy
+
+OPERATIONS = ("search", "library")
+
+
+def parse_mix(text):
+    """Parse 'search=0.8,library=0.2' into normalized weights"""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def build_corpus(embedder, documents, chunks_per_doc, seed):
+    """Synthetic documents whose chunk text leads with a topic word, so keyword and vector
+    search agree on what is relevant"""
+    rng = random.Random(seed)
+    topics = [f"topic{number}" for number in range(embedder.clusters)]
+    words = [f"word{number}" for number in range(500)]
+    corpus = []
+    for number in range(documents):
+        texts = [
+            " ".join([rng.choice(topics)] + rng.sample(words, 30)) + "."
+            for _ in range(chunks_per_doc)
+        ]
+        vectors = embedder.embed_many(texts)
+        corpus.append({
+            "filename": f"loadtest_{number:05d}.{rng.choice(['pdf', 'txt'])}",
+            "content": texts[0],
+            "chunks": [{"text": text, "embedding": vector.tolist()} for text, vector in zip(texts, vectors)],
+            "created_at": datetime(2024, 1, 1) + timedelta(hours=number)
+        })
+    queries = [f"{rng.choice(topics)} {' '.join(rng.sample(words, 3))}" for _ in range(1000)]
+    return corpus, topics, queries
+
+
+class LoadStats:
+    """Thread-safe latency, count and error collection per operation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, operation, seconds, error=None):
+        with self._lock:
+            if error is None:
+                self.latencies[operation].append(seconds)
+            else:
+                self.errors[operation][type(error).__name__] += 1
+
+
+def page_run(operation, query, args):
+    """One Streamlit page run issuing the given operation"""
+    from utils.mongodb import mongodb
+    from utils.search import search
+
+    # Every page run attaches to the shared client first
+    mongodb.connect(args.effective_uri)
+    if operation == "search":
+        return search(query, limit=args.top_k, mode=args.search_mode)
+    if not mongodb.is_connected():
+        raise ConnectionError("MongoDB not connected")
+    return mongodb.get_all_documents()
+
+
+def user_loop(user, args, mix, queries, stats, stop_at):
+    rng = random.Random(args.seed * 100003 + user)
+    # Stagger session starts across the ramp-up period
+    time.sleep(args.ramp_up * user / max(args.users, 1))
+    operations, weights = zip(*mix.items())
+    while time.monotonic() < stop_at:
+        operation = rng.choices(operations, weights)[0]
+        started = time.perf_counter()
+        try:
+            page_run(operation, rng.choice(queries[:args.distinct_queries]), args)
+            stats.record(operation, time.perf_counter() - started)
+        except Exception as e:
+            stats.record(operation, time.perf_counter() - started, e)
+        if args.think_ms:
+            time.sleep(rng.expovariate(1000.0 / args.think_ms))
+
+
+def seed_database(corpus, args):
+    """Load the corpus into a scratch database through the normal write path"""
+    from utils.lexical_index import lexical_index
+    from utils.mongodb import mongodb, client_registry
+
+    # Keep load-test documents out of the application's database and keyword index
+    lexical_index.db_path = Path(tempfile.mkdtemp(prefix="loadtest-lexical-")) / "lexical.db"
+    mongodb.db_name = args.mongodb_database
+    client_registry.get_client(args.mongodb_uri).drop_database(args.mongodb_database)
+    mongodb.connect(args.mongodb_uri)
+    for document in corpus:
+        mongodb.store_document(document)
+    mongodb.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent users on the search path")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load after ramp-up starts")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which users start")
+    parser.add_argument("--think-ms", type=float, default=1000.0, help="Mean think time between page runs")
+    parser.add_argument("--mix", default="search=0.8,library=0.2", help="Operation weights")
+    parser.add_argument("--search-mode", default="hybrid", help="Search mode used by simulated users")
+    parser.add_argument("--top-k", type=int, default=50, help="Results fetched per search (the Search page uses 50)")
+    parser.add_argument("--distinct-queries", type=int, default=200,
+                        help="Size of the query pool; smaller pools raise cache hit rates")
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--chunks-per-doc", type=int, default=10)
+    parser.add_argument("--embed-latency-ms", type=float, default=80.0)
+    parser.add_argument("--embed-per-input-ms", type=float, default=0.5)
+    parser.add_argument("--embed-error-rate", type=float, default=0.0, help="Fraction of embedding requests failing with 503")
+    parser.add_argument("--mongodb-uri", default=os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--mongodb-database", default="searchDb_loadtest")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0.0,
+                        help="Round-trip latency added in front of mongod")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/...)")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    # Load-test queries must not land in the persistent query embedding cache
+    os.environ["QUERY_CACHE_PERSIST"] = "0"
+    embedder = FakeEmbedder(seed=args.seed)
+    server = FakeEmbeddingServer(embedder, args.embed_latency_ms, args.embed_per_input_ms,
+                                 args.embed_error_rate).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+
+    from pymongo.uri_parser import parse_uri
+    from utils.mongodb import mongodb
+    from utils.openai_client import openai_client
+
+    corpus, _, queries = build_corpus(embedder, args.documents, args.chunks_per_doc, args.seed)
+    print(f"Seeding {len(corpus)} documents...")
+    seed_database(corpus, args)
+
+    proxy = None
+    args.effective_uri = args.mongodb_uri
+    if args.mongo_latency_ms:
+        host, port = parse_uri(args.mongodb_uri)["nodelist"][0]
+        proxy = LatencyProxy(host, port, args.mongo_latency_ms).start()
+        proxy_host, proxy_port = proxy.address
+        args.effective_uri = f"mongodb://{proxy_host}:{proxy_port}/?directConnection=true"
+    mongodb.connect(args.effective_uri)
+    openai_client.connect(api_key="loadtest")
+
+    stats = LoadStats()
+    print(f"Running {args.users} users for {args.duration:.0f}s...")
+    started = time.monotonic()
+    stop_at = started + args.duration
+    threads = [
+        threading.Thread(target=user_loop, args=(user, args, mix, queries, stats, stop_at),
+                         name=f"user-{user}", daemon=True)
+        for user in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    server.stop()
+    if proxy:
+        proxy.stop()
+
+    operations = {}
+    for operation in mix:
+        latencies = stats.latencies.get(operation, [])
+        errors = dict(stats.errors.get(operation, {}))
+        operations[operation] = {
+            "completed": len(latencies),
+            "errors": errors,
+            "error_rate": sum(errors.values()) / max(len(latencies) + sum(errors.values()), 1),
+            "throughput_per_sec": len(latencies) / elapsed,
+            "latency": latency_summary(latencies)
+        }
+        summary = operations[operation]["latency"]
+        if summary["count"]:
+            print(f"  {operation:8s} {len(latencies):6d} ok, {sum(errors.values()):4d} errors, "
+                  f"{len(latencies) / elapsed:7.1f}/s, p50 {summary['p50_ms']:.0f} ms, "
+                  f"p95 {summary['p95_ms']:.0f} ms, p99 {summary['p99_ms']:.0f} ms")
+        else:
+            print(f"  {operation:8s} no successful operations, errors: {errors}")
+
+    payload = {
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("out", "mongodb_uri", "effective_uri")},
+        "elapsed_seconds": elapsed,
+        "throughput_per_sec": sum(len(values) for values in stats.latencies.values()) / elapsed,
+        "operations": operations,
+        "embedding_server": server.get_stats(),
+        "proxy_connections": proxy.connections if proxy else None,
+        "client_stats": {
+            "openai": openai_client.get_stats(),
+            "result_cache": mongodb.result_cache.get_stats()
+        },
+        "peak_rss_mb": peak_rss_mb()
+    }
+    out = write_results("load_test", payload, args.out)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+"""Deterministic sample documents (TXT and PDF) for the ingestion benchmark."""
+from pathlib import Path
+import numpy as np
+from PyPDF2 import PdfReader
+
+LINES_PER_PAGE = 50
+WORDS_PER_LINE = 12
+# Text files have no pages; count one per this many bytes, about one PDF page of sample text
+TXT_BYTES_PER_PAGE = 3500
+
+
+def _vocabulary(rng, size=2000):
+    """Pseudo-words of 2-10 lowercase letters"""
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return ["".join(rng.choice(letters, rng.integers(2, 11))) for _ in range(size)]
+
+
+def _lines(rng, vocabulary, count):
+    """Lines of words where roughly every tenth word ends a sentence"""
+    lines = []
+    for _ in range(count):
+        words = [vocabulary[i] for i in rng.integers(0, len(vocabulary), WORDS_PER_LINE)]
+        for position in np.flatnonzero(rng.random(WORDS_PER_LINE) < 0.1):
+            words[position] += "."
+        lines.append(" ".join(words))
+    return lines
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one Helvetica text block per page (lines must not contain parentheses)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 50 780 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_refs)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    Path(path).write_bytes(bytes(out))
+
+
+def generate_samples(directory, pdfs=4, pages_per_pdf=20, txts=4, txt_pages=20, seed=0):
+    """Write the sample set to a directory and return the paths; the same seed gives the same bytes"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    vocabulary = _vocabulary(rng)
+    samples = []
+    for number in range(pdfs):
+        path = directory / f"sample_{number:02d}.pdf"
+        write_pdf(path, [_lines(rng, vocabulary, LINES_PER_PAGE) for _ in range(pages_per_pdf)])
+        samples.append(path)
+    for number in range(txts):
+        path = directory / f"sample_{number:02d}.txt"
+        # A text page holds as many lines as a PDF page
+        path.write_text("\n".join(_lines(rng, vocabulary, LINES_PER_PAGE * txt_pages)) + "\n", encoding="utf-8")
+        samples.append(path)
+    return samples
+
+
+def count_pages(path):
+    """Page count of a PDF, or the page-equivalent size of a text file"""
+    path = Path(path)
+    if path.suffix.lower() == ".pdf":
+        return len(PdfReader(path).pages)
+    return max(1, -(-path.stat().st_size // TXT_BYTES_PER_PAGE))
@@ -0,0 +1,156 @@
+"""Cold-start import benchmark for every Streamlit page.
+
+Usage:
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --baseline benchmarks/results/startup_<earlier run>.json
+
+Each page's module-level imports run in a fresh interpreter under `-X importtime`, after Streamlit
+itself is loaded (the server has it before the first page renders). Reports wall time per page
+(median of the repeats), the heaviest modules each page pulls in, and any dependency that is meant
+to be imported lazily. Exits with status 1 if a lazy dependency is imported eagerly, a page exceeds
+`--budget-ms`, or a page got slower than the baseline by more than `--max-regression`.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from benchmarks.common import PROJECT_ROOT, compare_results, write_results
+
+PAGES = ["Home.py"] + sorted(str(path.relative_to(PROJECT_ROOT)) for path in (PROJECT_ROOT / "pages").glob("*.py"))
+
+# Loaded on first use by the utils modules; a page importing any of these at startup is a regression
+LAZY_MODULES = ("pymongo", "openai", "httpx", "PyPDF2", "cryptography", "dotenv", "numpy")
+
+MARKER = "--- page imports ---"
+
+PROBE = """
+import json, sys, time
+import streamlit
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+started = time.perf_counter()
+exec(compile({code!r}, {page!r}, "exec"), {{"__name__": "__page__"}})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "lazy_loaded": sorted(
+    name for name in {lazy!r} if name in sys.modules)}}))
+"""
+
+
+def page_imports(page):
+    """Source of the import statements at the top level of a page script"""
+    tree = ast.parse((PROJECT_ROOT / page).read_text(encoding="utf-8"))
+    statements = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in statements)
+
+
+def parse_importtime(stderr):
+    """(module, self us, cumulative us, depth) for every import after the marker"""
+    rows = []
+    lines = stderr.splitlines()
+    start = lines.index(MARKER) + 1 if MARKER in lines else 0
+    for line in lines[start:]:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue
+        # Names are indented two spaces per level after the column separator's space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(page, code):
+    """Import one page's modules in a fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    probe = PROBE.format(marker=MARKER, code=code, page=page, lazy=LAZY_MODULES)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=PROJECT_ROOT,
+                               env=env, capture_output=True, text=True, timeout=120)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {page} failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def summarize(runs, top_n):
+    """Median wall time, heaviest modules and eagerly loaded lazy dependencies of one page"""
+    imports = runs[0]["imports"]
+    top_level = sorted((row for row in imports if row[3] == 0), key=lambda row: -row[2])
+    heaviest = sorted(imports, key=lambda row: -row[1])
+    return {
+        "wall_ms": statistics.median(run["seconds"] for run in runs) * 1000.0,
+        "importtime_ms": sum(row[2] for row in imports if row[3] == 0) / 1000.0,
+        "modules": len(imports),
+        "lazy_loaded": sorted(set().union(*(run["lazy_loaded"] for run in runs))),
+        "top_imports": [{"module": name, "cumulative_ms": cumulative / 1000.0}
+                        for name, _, cumulative, _ in top_level[:top_n]],
+        "heaviest_modules": [{"module": name, "self_ms": self_us / 1000.0}
+                             for name, self_us, _, _ in heaviest[:top_n]]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the import cost of every page")
+    parser.add_argument("--pages", default=",".join(PAGES), help="Comma-separated page scripts")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per page")
+    parser.add_argument("--top", type=int, default=8, help="Modules listed per page")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if any page takes longer")
+    parser.add_argument("--baseline", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed relative slowdown per page against the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=30.0,
+                        help="Slowdowns smaller than this are treated as noise")
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/...)")
+    args = parser.parse_args(argv)
+
+    pages = {}
+    for page in args.pages.split(","):
+        code = page_imports(page)
+        runs = [measure(page, code) for _ in range(args.repeat)]
+        # Keyed by script name without the extension so result paths stay dot-separated
+        summary = pages[Path(page).stem] = summarize(runs, args.top)
+        summary["script"] = page
+        print(f"{page:28s} {summary['wall_ms']:8.1f} ms  {summary['modules']:4d} modules"
+              + (f"  eager: {', '.join(summary['lazy_loaded'])}" if summary["lazy_loaded"] else ""))
+        for row in summary["top_imports"][:3]:
+            print(f"    {row['module']:40s} {row['cumulative_ms']:8.1f} ms")
+
+    payload = {
+        "params": {key: value for key, value in vars(args).items() if key not in ("out", "baseline")},
+        "pages": pages
+    }
+    out = write_results("startup", payload, args.out)
+    print(f"Results written to {out}")
+
+    failures = []
+    for summary in pages.values():
+        page = summary["script"]
+        if summary["lazy_loaded"]:
+            failures.append(f"{page} imports {', '.join(summary['lazy_loaded'])} at startup")
+        if args.budget_ms is not None and summary["wall_ms"] > args.budget_ms:
+            failures.append(f"{page} took {summary['wall_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {baseline['run'].get('commit')}:")
+        metrics = [f"pages.{page}.wall_ms" for page in pages]
+        for metric, before, after, change in compare_results(payload, baseline, metrics):
+            if change is None:
+                continue
+            print(f"  {metric:44s} {before:8.1f} -> {after:8.1f}  {change:+.1%}")
+            if change > args.max_regression and after - before > args.min_delta_ms:
+                failures.append(f"{metric} regressed {change:+.1%} ({before:.1f} -> {after:.1f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
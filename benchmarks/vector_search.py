@@ -0,0 +1,186 @@
+"""Vector search benchmark over a synthetic corpus.
+
+Usage:
+    python -m benchmarks.vector_search --chunks 100000 --dims 1536 --backends numpy,ivf,mongo
+
+Measures p50/p95/p99 latency, QPS and recall@k per backend against exact ground truth:
+  numpy  exact in-memory search (utils.vector_index.ExactVectorIndex)
+  ivf    NumPy inverted-file ANN index
+  hnsw   hnswlib graph index (when installed)
+  mongo  MongoDB.search_documents against a local mongod (benchmark database, dropped first)
+
+Ground truth and the MongoDB load stream the corpus block by block. The in-memory backends need
+the whole (chunks x dims) float32 matrix, so they refuse corpora larger than --max-memory-gb.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.ann import IVFIndex, HNSWIndex
+from benchmarks.common import (
+    SyntheticCorpus, exact_top_documents, latency_summary, recall_at_k, peak_rss_mb, write_results
+)
+
+BACKENDS = ("numpy", "ivf", "hnsw", "mongo")
+IN_MEMORY_BACKENDS = ("numpy", "ivf", "hnsw")
+
+
+def measure(search, queries, truth, k, warmup):
+    """Time single-query searches and score them against the ground truth"""
+    for query in queries[:warmup]:
+        search(query)
+    latencies, results = [], []
+    started = time.perf_counter()
+    for query in queries:
+        query_started = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - query_started)
+    elapsed = time.perf_counter() - started
+    return {
+        "latency": latency_summary(latencies),
+        "qps": len(queries) / elapsed if elapsed else None,
+        f"recall_at_{k}": recall_at_k(results, truth, k)
+    }
+
+
+def run_numpy(corpus, matrix, queries, truth, args):
+    from utils.vector_index import ExactVectorIndex
+    index = ExactVectorIndex()
+    started = time.perf_counter()
+    documents = [{"doc_number": number} for number in range(corpus.num_documents)]
+    index.build_arrays(matrix, corpus.doc_starts(), documents, range(corpus.num_chunks))
+    build_seconds = time.perf_counter() - started
+
+    def search(query):
+        return [hit["doc_number"] for hit in index.search_many([query], k=args.k)[0]]
+
+    return {"build_seconds": build_seconds, **measure(search, queries, truth, args.k, args.warmup)}
+
+
+def run_ann(index, matrix, corpus, queries, truth, args):
+    started = time.perf_counter()
+    index.build(matrix, corpus.doc_of_chunk())
+    build_seconds = time.perf_counter() - started
+    return {
+        "build_seconds": build_seconds,
+        "params": index.params(),
+        **measure(lambda query: index.search(query, args.k), queries, truth, args.k, args.warmup)
+    }
+
+
+def run_mongo(corpus, queries, truth, args):
+    from utils.lexical_index import lexical_index
+    from utils.mongodb import mongodb, client_registry
+
+    # Keep the synthetic corpus out of the application's database and keyword index
+    lexical_index.db_path = Path(tempfile.mkdtemp(prefix="bench-lexical-")) / "lexical.db"
+    mongodb.db_name = args.mongodb_database
+    client_registry.get_client(args.mongodb_uri).drop_database(args.mongodb_database)
+    mongodb.connect(args.mongodb_uri)
+
+    started = time.perf_counter()
+    for batch in corpus.iter_documents(batch_chunks=20000):
+        mongodb.collection.insert_many(batch, ordered=False)
+    load_seconds = time.perf_counter() - started
+    mongodb.result_cache.clear()
+
+    def search(query):
+        hits = mongodb.search_documents(query.tolist(), limit=args.k)
+        return [int(hit["filename"].split("_")[1].split(".")[0]) for hit in hits]
+
+    count = min(args.mongo_queries, len(queries))
+    return {
+        "load_seconds": load_seconds,
+        "search_index": mongodb.get_search_index_status()["status"],
+        **measure(search, queries[:count], truth[:count], args.k, min(args.warmup, count))
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark vector search backends on a synthetic corpus")
+    parser.add_argument("--chunks", type=int, default=10000, help="Corpus size in chunks (10k to 10M)")
+    parser.add_argument("--dims", type=int, default=1536, help="Embedding dimensions")
+    parser.add_argument("--chunks-per-doc", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=256, help="Topic clusters in the corpus")
+    parser.add_argument("--noise", type=float, default=1.0,
+                        help="Spread of chunks around their cluster (higher is harder for ANN)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default="numpy,ivf,hnsw,mongo",
+                        help=f"Comma-separated subset of {', '.join(BACKENDS)}")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default 4*sqrt(chunks))")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query")
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef", type=int, default=128)
+    parser.add_argument("--mongodb-uri", default=os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--mongodb-database", default="searchDb_benchmark")
+    parser.add_argument("--mongo-queries", type=int, default=50,
+                        help="Queries sent to MongoDB (exact aggregation is slow on large corpora)")
+    parser.add_argument("--max-memory-gb", type=float, default=16.0,
+                        help="Largest corpus matrix the in-memory backends may build")
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/...)")
+    args = parser.parse_args(argv)
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+    in_memory = [name for name in backends if name in IN_MEMORY_BACKENDS]
+    matrix_gb = args.chunks * args.dims * 4 / 1024 ** 3
+    if in_memory and matrix_gb > args.max_memory_gb:
+        parser.error(f"In-memory backends ({', '.join(in_memory)}) hold the corpus in memory: {args.chunks} x {args.dims} "
+                     f"float32 needs {matrix_gb:.1f} GB (--max-memory-gb {args.max_memory_gb:g}). "
+                     f"Use fewer --chunks or --dims, raise the limit, or run only the mongo backend.")
+
+    corpus = SyntheticCorpus(args.chunks, args.dims, args.chunks_per_doc, args.clusters, args.noise, args.seed)
+    started = time.perf_counter()
+    queries = corpus.queries(args.queries)
+    truth = exact_top_documents(corpus, queries, args.k)
+    print(f"Computed ground truth over {args.chunks} chunks x {args.dims} dims in "
+          f"{time.perf_counter() - started:.1f}s")
+    matrix = None
+    if in_memory:
+        started = time.perf_counter()
+        matrix = corpus.matrix()
+        print(f"Generated the corpus matrix in {time.perf_counter() - started:.1f}s")
+
+    results = {}
+    for name in backends:
+        print(f"Running {name}...")
+        try:
+            if name == "numpy":
+                results[name] = run_numpy(corpus, matrix, queries, truth, args)
+            elif name == "ivf":
+                results[name] = run_ann(IVFIndex(args.nlist, args.nprobe, seed=args.seed),
+                                        matrix, corpus, queries, truth, args)
+            elif name == "hnsw":
+                results[name] = run_ann(HNSWIndex(args.hnsw_m, ef_search=args.hnsw_ef),
+                                        matrix, corpus, queries, truth, args)
+            else:
+                results[name] = run_mongo(corpus, queries, truth, args)
+        except Exception as e:
+            # A missing optional backend or server should not lose the other measurements
+            results[name] = {"skipped": str(e)}
+        summary = results[name]
+        if "latency" in summary:
+            print(f"  p50 {summary['latency']['p50_ms']:.2f} ms, p99 {summary['latency']['p99_ms']:.2f} ms, "
+                  f"{summary['qps']:.1f} QPS, recall@{args.k} {summary[f'recall_at_{args.k}']:.3f}")
+        else:
+            print(f"  skipped: {summary['skipped']}")
+
+    out = write_results("vector_search", {
+        "corpus": corpus.params(),
+        "queries": args.queries,
+        "k": args.k,
+        "peak_rss_mb": peak_rss_mb(),
+        "backends": results
+    }, args.out)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,16 @@
 import streamlit as st
-from utils.mongodb import MongoDB
-from utils.openai_client import OpenAIClient
+from utils.mongodb import mongodb
+from utils.search import search, SEARCH_MODES
+from utils.tracing import start_trace
+from utils.profiling import profiler
 from utils.styles import get_css, apply_custom_styles
-from dotenv import load_dotenv
+from utils.config import load_env_file
+from datetime import datetime, timedelta, time
+from time import perf_counter
 import os
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env (once per process)
+load_env_file()
 
 # Page config
 st.set_page_config(
@@ -59,7 +63,8 @@ nav_items = {
     "🔍 Search": "",
     "📚 Library": "pages/2_Document_Library",
     "⚙️ Settings": "pages/5_Settings",
-    "📋 Logs": "pages/4_Logs"
+    "📋 Logs": "pages/4_Logs",
+    "📈 Metrics": "pages/6_Metrics"
 }
 
 # Create navigation container
@@ -183,14 +188,56 @@ if not st.session_state.get('mongodb_uri') or not st.session_state.get('openai_a
     st.markdown("[Go to Settings ➜](Settings)")
     st.stop()
 
+# Number of results fetched once per search; pages are served from this set
+SEARCH_TOP_K = 50
+
+# Results of the last search are kept per session so reruns and navigation don't re-query
+search_state = st.session_state.get('search_state')
+
 # Search interface
 search_col1, search_col2 = st.columns([3, 1])
 
 with search_col1:
-    search_query = st.text_input("Enter your search query:", placeholder="What would you like to find?")
+    search_query = st.text_input(
+        "Enter your search query:",
+        value=search_state['query'] if search_state else "",
+        placeholder="What would you like to find?"
+    )
 
 with search_col2:
-    num_results = st.slider("Number of results:", min_value=1, max_value=10, value=5)
+    page_size = st.slider("Results per page:", min_value=1, max_value=20, value=5)
+
+search_mode = st.radio(
+    "Search mode:",
+    options=list(SEARCH_MODES),
+    format_func=SEARCH_MODES.get,
+    horizontal=True,
+    help="Keyword search is best for exact terms like part numbers or error codes"
+)
+
+# Metadata filters; these are pushed down into the index rather than applied afterwards
+with st.expander("🔎 Filters"):
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        file_types = st.multiselect("File type", options=["pdf", "txt"], format_func=str.upper)
+    with filter_col2:
+        filter_by_date = st.checkbox("Filter by upload date")
+        date_range = st.date_input(
+            "Uploaded between",
+            value=(datetime.utcnow().date() - timedelta(days=30), datetime.utcnow().date()),
+            disabled=not filter_by_date
+        )
+    with filter_col3:
+        filename_prefix = st.text_input("Filename starts with", placeholder="e.g. report_")
+
+search_filters = {}
+if file_types:
+    search_filters["file_types"] = file_types
+if filter_by_date and isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+    search_filters["created_after"] = datetime.combine(date_range[0], time.min)
+    search_filters["created_before"] = datetime.combine(date_range[1] + timedelta(days=1), time.min)
+if filename_prefix.strip():
+    search_filters["filename_prefix"] = filename_prefix.strip()
 
 # Search button
 if st.button("🔍 Search", type="primary"):
@@ -199,42 +246,124 @@ if st.button("🔍 Search", type="primary"):
     else:
         try:
             with st.spinner("Searching documents..."):
-                # Get embedding for search query
-                openai_client = OpenAIClient()
-                query_embedding = openai_client.get_embedding(search_query)
+                # Fetch the top results once; paging never re-queries
+                with start_trace("search", query=search_query, mode=search_mode) as trace, \
+                        profiler.profile("search", query=search_query, mode=search_mode):
+                    results = search(search_query, limit=SEARCH_TOP_K, mode=search_mode, filters=search_filters)
                 
-                # Search documents
-                mongodb = MongoDB()
-                results = mongodb.search_documents(query_embedding, limit=num_results)
-                
-                if not results:
-                    st.info("No matching documents found.")
-                else:
-                    st.markdown(f"### Found {len(results)} matching documents")
-                    
-                    # Display results
-                    for result in results:
-                        # Calculate relevance percentage
-                        relevance = int(result['similarity'] * 100)
-                        
-                        # Create unique button key for this result
-                        view_key = f"view_{result['filename'].replace('.', '_')}"
-                        
-                        st.markdown(f"""
-                        <div class="result-card">
-                            <h4>📄 {result['filename']}</h4>
-                            <div class="relevance-score">🎯 Relevance: {relevance}%</div>
-                            <div class="result-text">{result['best_chunk']}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Add view button with proper session state handling
-                        if st.button("👁️ View Full Document", key=view_key):
-                            st.session_state.viewing_document = result['filename']
-                            st.switch_page("pages/2_Document_Library.py")
+                search_state = {
+                    "query": search_query,
+                    "mode": search_mode,
+                    "filters": search_filters,
+                    "results": results,
+                    "page": 0,
+                    "index_status": mongodb.get_search_index_status()["status"],
+                    "trace": trace,
+                    # The first render of these results is part of the search's timing
+                    "render_pending": True
+                }
+                st.session_state.search_state = search_state
         except Exception as e:
             st.error(f"Error performing search: {str(e)}")
             if "API key" in str(e):
                 st.markdown("Please check your API credentials in the [Settings](Settings) page.")
             elif "MongoDB" in str(e):
-                st.markdown("Please check your MongoDB connection string in the [Settings](Settings) page.") 
\ No newline at end of file
+                st.markdown("Please check your MongoDB connection string in the [Settings](Settings) page.")
+
+# Display the current result set
+if search_state:
+    render_started = perf_counter()
+    results = search_state["results"]
+    
+    # Let users know why searches may be slower right after setup
+    if search_state.get("mode") != "keyword" and search_state["index_status"] in ("pending", "checking", "building"):
+        st.caption("ℹ️ The vector search index is still building. Results use exact search in the meantime.")
+    
+    if not results:
+        st.info("No matching documents found.")
+    else:
+        num_pages = (len(results) + page_size - 1) // page_size
+        page = min(search_state["page"], num_pages - 1)
+        page_results = results[page * page_size:(page + 1) * page_size]
+        
+        header_col, clear_col = st.columns([6, 1])
+        with header_col:
+            st.markdown(f"### Found {len(results)} matching documents for “{search_state['query']}”")
+        with clear_col:
+            if st.button("✖️ Clear", key="clear_results", use_container_width=True):
+                st.session_state.pop('search_state', None)
+                st.experimental_rerun()
+        
+        # Display results
+        for result in page_results:
+            # Calculate relevance percentage; keyword-only matches have no vector similarity
+            if result.get('similarity') is not None:
+                relevance_label = f"🎯 Relevance: {int(result['similarity'] * 100)}%"
+            else:
+                relevance_label = "🔤 Keyword match"
+            
+            # Create unique button key for this result
+            view_key = f"view_{result['_id']}"
+            
+            st.markdown(f"""
+            <div class="result-card">
+                <h4>📄 {result['filename']}</h4>
+                <div class="relevance-score">{relevance_label}</div>
+                <div class="result-text">{result['best_chunk']}</div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Add view button with proper session state handling
+            if st.button("👁️ View Full Document", key=view_key):
+                st.session_state.viewing_document = result['filename']
+                st.session_state.viewing_from_search = True
+                st.switch_page("pages/2_Document_Library.py")
+        
+        # Pagination controls
+        def set_page(new_page):
+            search_state["page"] = new_page
+        
+        if num_pages > 1:
+            prev_col, page_col, next_col = st.columns([1, 4, 1])
+            with prev_col:
+                st.button(
+                    "← Previous", key="prev_page", disabled=page == 0, use_container_width=True,
+                    on_click=set_page, args=(page - 1,)
+                )
+            with page_col:
+                st.markdown(
+                    f"<div style='text-align: center'>Page {page + 1} of {num_pages}</div>",
+                    unsafe_allow_html=True
+                )
+            with next_col:
+                st.button(
+                    "Next →", key="next_page", disabled=page >= num_pages - 1, use_container_width=True,
+                    on_click=set_page, args=(page + 1,)
+                )
+    
+    # Explain where the time of this search went
+    trace = search_state.get("trace")
+    if trace is not None:
+        if search_state.get("render_pending"):
+            trace.add_span("render", render_started, perf_counter() - render_started)
+            search_state["render_pending"] = False
+        with st.expander("⏱️ Explain timing"):
+            render_ms = trace.total_ms("render")
+            timing_cols = st.columns(5)
+            with timing_cols[0]:
+                st.metric("Embed", f"{trace.total_ms('embed'):.0f} ms")
+            with timing_cols[1]:
+                st.metric("Database", f"{trace.total_ms(prefix='mongo.'):.0f} ms")
+            with timing_cols[2]:
+                st.metric("Keyword index", f"{trace.total_ms('keyword'):.0f} ms")
+            with timing_cols[3]:
+                st.metric("Render", f"{render_ms:.0f} ms")
+            with timing_cols[4]:
+                st.metric("Total", f"{trace.duration_ms + render_ms:.0f} ms")
+            st.caption(f"Request ID: {trace.request_id} (quote this when reporting a slow search)")
+            st.download_button(
+                "⬇️ Download Trace JSON",
+                data=trace.to_json(),
+                file_name=f"trace_{trace.request_id}.json",
+                mime="application/json"
+            )
@@ -2,6 +2,8 @@ import streamlit as st
 from utils.mongodb import mongodb
 from utils.openai_client import openai_client
 from utils.document_processor import document_processor
+from utils.tracing import start_trace
+from utils.profiling import profiler
 from utils.styles import get_css, apply_custom_styles
 from datetime import datetime
 from pathlib import Path
@@ -64,7 +66,8 @@ nav_items = {
     "🔍 Search": "pages/1_Document_Search",
     "📚 Library": "",
     "⚙️ Settings": "pages/5_Settings",
-    "📋 Logs": "pages/4_Logs"
+    "📋 Logs": "pages/4_Logs",
+    "📈 Metrics": "pages/6_Metrics"
 }
 
 # Create navigation container
@@ -112,7 +115,7 @@ if not credentials:
 st.session_state['mongodb_uri'] = credentials['mongodb_uri']
 st.session_state['openai_api_key'] = credentials['openai_api_key']
 
-# Initialize MongoDB connection at the start
+# Attach to the shared MongoDB client (a no-op once this process is connected)
 try:
     mongodb.connect()  # This will use the session state credentials that we just loaded
 except Exception as e:
@@ -192,36 +195,53 @@ if not st.session_state.viewing_document:
                 f.write(uploaded_file.getbuffer())
             
             with st.spinner("Processing document..."):
-                # Extract text from document
-                text_content = document_processor.extract_text(file_path)
+                # Trace the upload so its log lines and stage timings share one request ID,
+                # and profile it when profiling is switched on
+                with start_trace("upload", filename=uploaded_file.name) as trace, \
+                        profiler.profile("upload", filename=uploaded_file.name):
+                    # Extract text from document (reused from the text store if this file was seen before)
+                    extracted = document_processor.extract_document(file_path)
+                    text_content = extracted["text"]
                 
-                # Create text chunks
-                chunks = document_processor.create_chunks(text_content)
+                    # Create text chunks with the active corpus version's settings
+                    version = mongodb.active_version()
+                    chunks = document_processor.create_chunks(
+                        text_content, version["chunk_size"], version["chunk_overlap"]
+                    )
                 
-                # Get embeddings for each chunk
-                chunk_data = []
-                for chunk in chunks:
-                    embedding = openai_client.get_embedding(chunk)
-                    chunk_data.append({
-                        "text": chunk,
-                        "embedding": embedding
-                    })
+                    # Embed all chunks with batched API calls
+                    embeddings = openai_client.get_embeddings(
+                        chunks, model=version["model"], dimensions=version["dimensions"]
+                    )
+                    chunk_data = [
+                        {"text": chunk, "embedding": embedding}
+                        for chunk, embedding in zip(chunks, embeddings)
+                    ]
                 
-                # Store in MongoDB
-                document = {
-                    "filename": uploaded_file.name,
-                    "content": text_content[:1000] + "..." if len(text_content) > 1000 else text_content,  # Store preview
-                    "chunks": chunk_data,
-                    "created_at": datetime.utcnow()
-                }
+                    # Store in MongoDB
+                    document = {
+                        "filename": uploaded_file.name,
+                        "content": text_content[:1000] + "..." if len(text_content) > 1000 else text_content,  # Store preview
+                        "chunks": chunk_data,
+                        # Re-chunking jobs find the stored text by this hash
+                        "content_hash": extracted["content_hash"],
+                        "extractor_version": extracted["extractor_version"],
+                        "created_at": datetime.utcnow()
+                    }
                 
-                mongodb.store_document(document)
+                    mongodb.store_document(document, version)
                 
-                # Move file to processed directory
-                processed_path = processed_dir / uploaded_file.name
-                file_path.rename(processed_path)
+                    # Move file to processed directory
+                    processed_path = processed_dir / uploaded_file.name
+                    file_path.rename(processed_path)
                 
                 st.success("✅ File uploaded and processed successfully!")
+                st.caption(
+                    f"Processed in {trace.duration_ms / 1000:.1f}s "
+                    f"(extract {trace.total_ms('extract'):.0f} ms, chunk {trace.total_ms('chunk'):.0f} ms, "
+                    f"embed {trace.total_ms('embed'):.0f} ms, store {trace.total_ms('store'):.0f} ms) "
+                    f"· request {trace.request_id}"
+                )
                 
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
@@ -250,8 +270,15 @@ try:
                 # Back button and delete button in the same row
                 col1, col2 = st.columns([6,1])
                 with col1:
+                    if st.session_state.get('viewing_from_search') and st.session_state.get('search_state'):
+                        # Return to the cached result set without searching again
+                        if st.button("← Back to Search Results"):
+                            st.session_state.viewing_document = None
+                            st.session_state.viewing_from_search = False
+                            st.switch_page("pages/1_Document_Search.py")
                     if st.button("← Back to Documents"):
                         st.session_state.viewing_document = None
+                        st.session_state.viewing_from_search = False
                         st.experimental_rerun()
                 with col2:
                     if st.button("🗑️ Delete", type="secondary"):
@@ -280,7 +307,7 @@ try:
                 with chunks_tab:
                     st.markdown("### Processed Chunks")
                     st.info("These chunks are used for semantic search and processing.")
-                    for i, chunk in enumerate(doc.get('chunks', []), 1):
+                    for i, chunk in enumerate(doc.get(mongodb.active_version()["field"], []), 1):
                         with st.expander(f"Chunk {i}"):
                             st.markdown(chunk['text'])
             else:
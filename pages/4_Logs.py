@@ -1,9 +1,13 @@
 import streamlit as st
 from pathlib import Path
 from datetime import datetime, timedelta
-import re
+import html
+import time
 from utils.styles import get_css, apply_custom_styles
-from utils.logger import logger
+from utils.logger import logger, log_buffer
+from utils.log_index import log_index, format_record
+from utils.log_segments import segment_label, parse_segment_name, read_logs
+from utils.profiling import profiler
 
 # Page config
 st.set_page_config(
@@ -56,7 +60,8 @@ nav_items = {
     "🔍 Search": "pages/1_Document_Search",
     "📚 Library": "pages/2_Document_Library",
     "⚙️ Settings": "pages/5_Settings",
-    "📋 Logs": ""
+    "📋 Logs": "",
+    "📈 Metrics": "pages/6_Metrics"
 }
 
 # Create navigation container
@@ -81,10 +86,25 @@ st.markdown(f"<style>{get_css()}</style>", unsafe_allow_html=True)
 # Title
 st.title("📋 Application Logs")
 
+# Log entries shown per page, and how many matches are counted for paging
+LOG_PAGE_SIZE = 200
+LOG_COUNT_LIMIT = 10000
+
+# Lines kept on screen by the live tail, and how long it follows before pausing
+LIVE_TAIL_LINES = 200
+LIVE_TAIL_SECONDS = 15 * 60
+LIVE_TAIL_POLL_SECONDS = 1.0
+
 # Get project root directory
 project_root = Path(__file__).parent.parent
 logs_dir = project_root / "logs"
 
+# Bring the log index up to date; only bytes appended since the last refresh are read
+try:
+    log_index.refresh()
+except Exception as e:
+    st.error(f"Error indexing logs: {str(e)}")
+
 # Sidebar filters
 st.sidebar.header("Log Filters")
 
@@ -95,16 +115,21 @@ date_range = st.sidebar.date_input(
     value=(today - timedelta(days=7), today),
     max_value=today
 )
+# While a range is being picked the widget holds only its start date
+start_date, end_date = (date_range[0], date_range[-1]) if date_range else (None, None)
 
 # Log level filter
 log_levels = ["ALL", "INFO", "ERROR", "WARNING", "DEBUG"]
 selected_level = st.sidebar.selectbox("Log Level", log_levels)
 
 # Search filter
-search_query = st.sidebar.text_input("Search in logs", "")
+search_query = st.sidebar.text_input("Search in logs", "", help="Matches messages containing every word")
+
+# Request filter
+request_filter = st.sidebar.text_input("Request ID", "", help="Show only lines logged by one request")
 
 # Get log files
-log_files = sorted(logs_dir.glob("app_*.log"), reverse=True)
+log_files = log_index.indexed_files()
 
 if not log_files:
     st.warning("No log files found. Logs will appear here as the application runs.")
@@ -116,92 +141,186 @@ else:
         # Log file selector
         selected_file = st.selectbox(
             "Select Log File",
-            options=log_files,
-            format_func=lambda x: x.stem.replace("app_", ""),
-            index=0
+            options=["ALL"] + log_files,
+            format_func=lambda x: "All files" if x == "ALL" else segment_label(x),
+            index=1
         )
         
-        # Read and filter logs
-        if selected_file:
-            with open(selected_file, 'r') as f:
-                logs = f.readlines()
-            
-            # Apply filters
-            filtered_logs = []
-            for log in logs:
-                # Parse log entry
-                match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\w+) - (\w+) - (.+)', log)
-                if match:
-                    timestamp, name, level, message = match.groups()
-                    log_date = datetime.strptime(timestamp.split()[0], '%Y-%m-%d')
-                    
-                    # Apply date filter
-                    if date_range[0] <= log_date.date() <= date_range[1]:
-                        # Apply level filter
-                        if selected_level == "ALL" or level == selected_level:
-                            # Apply search filter
-                            if not search_query or search_query.lower() in message.lower():
-                                filtered_logs.append(log)
-            
-            # Display logs with syntax highlighting
-            if filtered_logs:
-                st.markdown("### Log Entries")
-                for log in filtered_logs:
-                    # Color-code based on log level
-                    if "ERROR" in log:
-                        st.markdown(f'<div style="color: #ff4444">{log}</div>', unsafe_allow_html=True)
-                    elif "WARNING" in log:
-                        st.markdown(f'<div style="color: #ffbb33">{log}</div>', unsafe_allow_html=True)
-                    else:
-                        st.markdown(f'<div style="color: #00C851">{log}</div>', unsafe_allow_html=True)
-            else:
-                st.info("No logs match the selected filters.")
+        # Matching entries are fetched a page at a time, newest first
+        filters = {
+            "file": None if selected_file == "ALL" else selected_file,
+            "start_date": start_date,
+            "end_date": end_date,
+            "level": None if selected_level == "ALL" else selected_level,
+            "search": search_query,
+            "request_id": request_filter.strip() or None
+        }
+        # Counting stops at a cap so a broad filter over months of logs stays cheap
+        total_matches = log_index.count(limit=LOG_COUNT_LIMIT + 1, **filters)
+        page_count = max((min(total_matches, LOG_COUNT_LIMIT) + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE, 1)
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+        filtered_logs = log_index.query(limit=LOG_PAGE_SIZE, offset=(page - 1) * LOG_PAGE_SIZE, **filters)
+        
+        # Display logs with syntax highlighting
+        if filtered_logs:
+            st.markdown("### Log Entries")
+            matches_label = f"{LOG_COUNT_LIMIT}+" if total_matches > LOG_COUNT_LIMIT else str(total_matches)
+            st.caption(f"{matches_label} matching entries, newest first (page {page} of {page_count})")
+            for record in filtered_logs:
+                log = html.escape(format_record(record))
+                # Color-code based on log level
+                if record["level"] == "ERROR":
+                    st.markdown(f'<div style="color: #ff4444">{log}</div>', unsafe_allow_html=True)
+                elif record["level"] == "WARNING":
+                    st.markdown(f'<div style="color: #ffbb33">{log}</div>', unsafe_allow_html=True)
+                else:
+                    st.markdown(f'<div style="color: #00C851">{log}</div>', unsafe_allow_html=True)
+        else:
+            st.info("No logs match the selected filters.")
+        
+        # Raw lines for the date range, read from the (compressed) segments through their block index
+        with st.expander("📦 Export raw log lines for the date range"):
+            if st.button("Prepare Export"):
+                range_start = f"{start_date:%Y-%m-%d} 00:00:00,000" if start_date else None
+                range_end = f"{end_date:%Y-%m-%d} 23:59:59,999" if end_date else None
+                try:
+                    exported = "\n".join(read_logs(logs_dir, range_start, range_end))
+                    st.download_button(
+                        "⬇️ Download Logs",
+                        data=exported,
+                        file_name=f"logs_{start_date}_{end_date}.log",
+                        mime="text/plain"
+                    )
+                except Exception as e:
+                    st.error(f"Error exporting logs: {str(e)}")
     
     with tab2:
         # Basic statistics
         st.markdown("### Log Statistics")
         
         # Count by log level
-        level_counts = {"INFO": 0, "ERROR": 0, "WARNING": 0, "DEBUG": 0}
-        total_logs = 0
-        
-        for log_file in log_files:
-            with open(log_file, 'r') as f:
-                for line in f:
-                    if " - doc_upload - " in line:
-                        total_logs += 1
-                        for level in level_counts:
-                            if f" - {level} - " in line:
-                                level_counts[level] += 1
+        level_counts = log_index.level_counts()
+        total_logs = sum(level_counts.values())
         
         # Display statistics
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("Total Logs", total_logs)
         with col2:
-            st.metric("Info Logs", level_counts["INFO"])
+            st.metric("Info Logs", level_counts.get("INFO", 0))
         with col3:
-            st.metric("Warning Logs", level_counts["WARNING"])
+            st.metric("Warning Logs", level_counts.get("WARNING", 0))
         with col4:
-            st.metric("Error Logs", level_counts["ERROR"])
+            st.metric("Error Logs", level_counts.get("ERROR", 0))
         
         # Log file information
         st.markdown("### Log Files")
+        file_counts = log_index.level_counts(by_file=True)
         for log_file in log_files:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()
-                error_count = sum(1 for line in lines if " - ERROR - " in line)
-                warning_count = sum(1 for line in lines if " - WARNING - " in line)
-                info_count = sum(1 for line in lines if " - INFO - " in line)
-                
-                st.markdown(f"""
-                **{log_file.stem.replace('app_', '')}**
-                - Total entries: {len(lines)}
-                - Errors: {error_count}
-                - Warnings: {warning_count}
-                - Info: {info_count}
-                """)
+            counts = file_counts.get(log_file, {})
+            segment_path = logs_dir / log_file
+            size_mb = segment_path.stat().st_size / (1024 * 1024) if segment_path.exists() else 0
+            compression = parse_segment_name(log_file)[2]
+            st.markdown(f"""
+            **{segment_label(log_file)}**
+            - Size on disk: {size_mb:.1f} MB{"" if compression == "none" else f" ({compression})"}
+            - Total entries: {sum(counts.values())}
+            - Errors: {counts.get("ERROR", 0)}
+            - Warnings: {counts.get("WARNING", 0)}
+            - Info: {counts.get("INFO", 0)}
+            """)
+
+# Live tail of this server's records; the stream itself starts at the end of the page
+st.markdown("### 🔴 Live Tail")
+follow_live = st.toggle(
+    "Follow live",
+    help="Stream new log lines from this server as they are logged, with the sidebar level and search filters"
+)
+live_placeholder = st.empty()
+
+# Saved request profiles
+st.markdown("### 🔬 Profiles")
+profiles = profiler.list_profiles(limit=50)
+if not profiles:
+    st.info("No profiles saved. Turn on request profiling in Settings or with PROFILE_REQUESTS=1.")
+else:
+    selected_profile = st.selectbox(
+        "Select Profile",
+        options=profiles,
+        format_func=lambda p: (
+            f"{p['started_at'][:19].replace('T', ' ')} · {p['name']} · {p['duration_ms']:.0f} ms "
+            f"· {p['mode']} · request {p['request_id']}"
+        )
+    )
+    details = selected_profile["attributes"]
+    if selected_profile.get("error"):
+        st.error(f"Request failed: {selected_profile['error']}")
+    st.caption(", ".join(f"{key}: {value}" for key, value in details.items()))
+    st.caption(
+        "Only the request's own thread is profiled; work done on other threads (query batching, "
+        "parallel batch search) shows up as time spent waiting for it."
+    )
+
+    st.markdown(f"**Top {len(selected_profile['hotspots'])} hotspots by own time**")
+    hotspots = selected_profile["hotspots"]
+    if hotspots:
+        st.table({
+            "Function": [row["function"] for row in hotspots],
+            "Location": [f"{row['file']}:{row['line']}" for row in hotspots],
+            "Calls" if selected_profile["mode"] == "cprofile" else "Samples":
+                [row.get("calls", row.get("samples")) for row in hotspots],
+            "Own (ms)": [f"{row['self_ms']:.1f}" for row in hotspots],
+            "Cumulative (ms)": [f"{row['cumulative_ms']:.1f}" for row in hotspots]
+        })
+    else:
+        st.info("The request finished before any samples were taken.")
+
+    if selected_profile.get("memory") is not None:
+        st.markdown(f"**Allocations** (net {selected_profile['memory_net_kb']:.0f} KB)")
+        st.table({
+            "Location": [row["location"] for row in selected_profile["memory"]],
+            "Size (KB)": [f"{row['size_kb']:.1f}" for row in selected_profile["memory"]],
+            "Blocks": [row["count"] for row in selected_profile["memory"]]
+        })
+
+    # Raw profile for snakeviz / pstats, or collapsed stacks for flame graph tools
+    for label, filename in selected_profile["files"].items():
+        raw_path = profiler.profiles_dir / filename
+        if raw_path.exists():
+            st.download_button(
+                f"⬇️ Download {label} ({filename})",
+                data=raw_path.read_bytes(),
+                file_name=filename,
+                key=f"profile_{filename}"
+            )
 
 # Add refresh button
 if st.button("🔄 Refresh Logs"):
-    st.experimental_rerun() 
\ No newline at end of file
+    st.experimental_rerun()
+
+# Follow the live tail by polling the buffer's sequence about once a second and rerunning the page
+# only when something was logged. The cursor and the lines on screen are kept in the session, and
+# the status line written on every poll lets Streamlit stop the loop as soon as the tail is toggled
+# off, the user interacts or the tab is closed.
+if follow_live:
+    live_filters = {"level": None if selected_level == "ALL" else selected_level, "search": search_query or None}
+    tail = st.session_state.get("live_tail")
+    if tail is None or tail["filters"] != live_filters:
+        sequence, records = log_buffer.since(0, limit=LIVE_TAIL_LINES, **live_filters)
+        tail = {"filters": live_filters, "sequence": sequence, "started": time.monotonic(),
+                "lines": [format_record(record) for record in records]}
+    else:
+        tail["sequence"], records = log_buffer.since(tail["sequence"], **live_filters)
+        tail["lines"] = (tail["lines"] + [format_record(record) for record in records])[-LIVE_TAIL_LINES:]
+    st.session_state.live_tail = tail
+    live_placeholder.code("\n".join(tail["lines"]) or "Waiting for log lines...", language="text")
+    live_status = st.empty()
+    while time.monotonic() - tail["started"] < LIVE_TAIL_SECONDS:
+        live_status.caption(f"Following live · checked {datetime.now():%H:%M:%S}")
+        time.sleep(LIVE_TAIL_POLL_SECONDS)
+        if log_buffer.last_sequence != tail["sequence"]:
+            st.experimental_rerun()
+    live_status.empty()
+    live_placeholder.info("Live tail paused after 15 minutes. Toggle it off and on to resume.")
+else:
+    st.session_state.pop("live_tail", None)
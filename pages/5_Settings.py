@@ -2,7 +2,12 @@ import streamlit as st
 from utils.styles import get_css, apply_custom_styles
 from utils.sqlite_client import SQLiteClient
 from utils.mongodb import mongodb
+from utils.openai_client import openai_client
+from utils.lexical_index import lexical_index
+from utils.text_store import text_store
+from utils.profiling import profiler, PROFILE_MODES
 from utils.logger import logger
+from datetime import datetime
 
 # Page config
 st.set_page_config(
@@ -55,7 +60,8 @@ nav_items = {
     "🔍 Search": "pages/1_Document_Search",
     "📚 Library": "pages/2_Document_Library",
     "⚙️ Settings": "",
-    "📋 Logs": "pages/4_Logs"
+    "📋 Logs": "pages/4_Logs",
+    "📈 Metrics": "pages/6_Metrics"
 }
 
 # Create navigation container
@@ -120,7 +126,7 @@ if st.button("💾 Save Settings", type="primary"):
                 # Try to connect to MongoDB with new credentials
                 try:
                     mongodb.connect()  # This will also initialize database and indexes
-                    status.write("Creating MongoDB indexes...")
+                    status.write("Vector search index is building in the background...")
                     status.update(label="✅ Setup Complete!", state="complete", expanded=False)
                     st.success("Settings saved and database initialized successfully!")
                 except Exception as e:
@@ -174,11 +180,35 @@ with col1:
         try:
             doc_count = mongodb.collection.count_documents({})
             index_count = len(list(mongodb.collection.list_indexes()))
+            result_cache = mongodb.result_cache.get_stats()
             mongodb_status["details"].extend([
                 f"Database: searchDb",
                 f"Documents: {doc_count}",
-                f"Indexes: {index_count}"
+                f"Indexes: {index_count}",
+                f"Corpus writes: {mongodb.corpus_writes} (all processes)",
+                f"Result cache: {result_cache['entries']} entries, "
+                f"{result_cache['bytes'] / (1024 * 1024):.1f} MB, {result_cache['hit_rate']:.0%} hit rate"
             ])
+            active = mongodb.active_version()
+            mongodb_status["details"].append(
+                f"Active corpus: {active['version']} ({active['model']}, {active['num_dimensions']} dimensions, "
+                f"{active['chunk_size']}/{active['chunk_overlap']} chunk size/overlap)"
+            )
+            migration = mongodb.get_migration_status()
+            if migration:
+                mongodb_status["details"].append(
+                    f"Migration to {migration['target']['version']}: {migration['status']}, "
+                    f"{migration.get('migrated', 0)} documents migrated"
+                )
+            keyword_index = lexical_index.get_stats()
+            mongodb_status["details"].append(
+                f"Keyword index: {keyword_index['documents']} documents, {keyword_index['chunks']} chunks"
+            )
+            stored_text = text_store.get_stats()
+            mongodb_status["details"].append(
+                f"Extracted text store: {stored_text['entries']} files, "
+                f"{stored_text['bytes'] / (1024 * 1024):.1f} MB"
+            )
         except Exception as e:
             mongodb_status["details"].append(f"Error getting details: {str(e)}")
     
@@ -186,6 +216,26 @@ with col1:
     for detail in mongodb_status["details"]:
         st.markdown(f"- {detail}")
 
+    if mongodb_connected:
+        # Vector search index build progress
+        index_status = mongodb.get_search_index_status()
+        index_labels = {
+            "pending": "⚪ Pending",
+            "checking": "🟡 Checking",
+            "building": "🟡 Building",
+            "ready": "🟢 Ready",
+            "unsupported": "⚪ Not available (exact search in use)",
+            "failed": "🔴 Failed"
+        }
+        st.markdown(f"**Vector Index:** {index_labels.get(index_status['status'], index_status['status'])}")
+        st.markdown(f"- {index_status['message']}")
+        if index_status["status"] in ("pending", "checking", "building"):
+            if index_status["started_at"]:
+                elapsed = (datetime.utcnow() - index_status["started_at"]).total_seconds()
+                st.markdown(f"- Building for {int(elapsed)}s; searches use exact scoring until it is ready")
+            if st.button("🔄 Refresh Index Status"):
+                st.experimental_rerun()
+
 with col2:
     st.markdown("#### OpenAI API Status")
     openai_configured = bool(st.session_state.get('openai_api_key'))
@@ -195,6 +245,62 @@ with col2:
         st.markdown("- API Key validated")
         st.markdown("- Using text-embedding-3-small model")
         st.markdown("- 1536-dimensional embeddings")
+        openai_stats = openai_client.get_stats()
+        coalescing = openai_stats["coalescing"]
+        st.markdown(
+            f"- Coalesced requests: {coalescing['coalesced']} of "
+            f"{coalescing['executions'] + coalescing['coalesced']} ({coalescing['hit_rate']:.0%})"
+        )
+        query_cache = openai_stats["query_cache"]
+        st.markdown(
+            f"- Query cache: {query_cache['entries']} in memory, "
+            f"{query_cache['hits']} memory hits, {query_cache['disk_hits']} disk hits, "
+            f"{query_cache['disk_misses']} misses"
+        )
+        for model, batching in openai_stats["batching"].items():
+            st.markdown(
+                f"- Query batches ({model}): {batching['batches']}, "
+                f"avg size {batching['batch_size']['mean']:.1f}, "
+                f"avg wait {batching['wait_ms']['mean']:.1f} ms"
+            )
+            with st.expander(f"Batching histograms ({model})"):
+                st.markdown("**Batch size**")
+                st.table({
+                    "Bucket": list(batching["batch_size"]["buckets"]),
+                    "Batches": list(batching["batch_size"]["buckets"].values())
+                })
+                st.markdown("**Queue wait (ms)**")
+                st.table({
+                    "Bucket": list(batching["wait_ms"]["buckets"]),
+                    "Requests": list(batching["wait_ms"]["buckets"].values())
+                })
+
+# Profiling
+st.markdown("### 🔬 Profiling")
+st.caption(
+    "Profile every search and upload on this server and save the results under `logs/profiles/`. "
+    "Saved profiles are listed on the Logs page. Applies to the running server until it restarts."
+)
+profile_col1, profile_col2, profile_col3 = st.columns(3)
+with profile_col1:
+    profile_enabled = st.toggle("Profile requests", value=profiler.enabled)
+with profile_col2:
+    profile_mode = st.selectbox(
+        "Profiler",
+        options=PROFILE_MODES,
+        index=PROFILE_MODES.index(profiler.mode),
+        format_func=lambda mode: {"cprofile": "Deterministic (cProfile)", "sampling": "Sampling"}[mode],
+        help="Deterministic profiling counts every call but slows Python-heavy code; sampling is cheaper. "
+             "Both follow only the request's own thread, so work on other threads shows up as waiting"
+    )
+with profile_col3:
+    profile_memory = st.toggle(
+        "Track allocations",
+        value=profiler.memory,
+        help="Record where memory was allocated during each request (tracemalloc; adds overhead)"
+    )
+if (profile_enabled, profile_mode, profile_memory) != (profiler.enabled, profiler.mode, profiler.memory):
+    profiler.configure(enabled=profile_enabled, mode=profile_mode, memory=profile_memory)
 
 # Security Information
 st.markdown("### 🔐 Security Information")
@@ -0,0 +1,221 @@
+import streamlit as st
+import os
+from pathlib import Path
+from utils.styles import get_css, apply_custom_styles
+from utils.metrics import (
+    metrics, STAGE_SECONDS, STAGE_ERRORS, MONGO_SECONDS, OPENAI_SECONDS, EMBEDDED_TEXTS,
+    CACHE_LOOKUPS, CHUNKS_CREATED, BYTES_EXTRACTED, INFLIGHT, EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_SECONDS
+)
+from utils.tracing import trace_store
+
+# Page config
+st.set_page_config(
+    page_title="Metrics",
+    page_icon="📈",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Apply custom styles
+apply_custom_styles()
+
+# Top Navigation
+st.markdown("""
+<style>
+    .top-nav {
+        display: flex;
+        justify-content: center;
+        align-items: center;
+        gap: 2rem;
+        padding: 1rem;
+        background-color: #1E1E1E;
+        border-radius: 10px;
+        margin-bottom: 2rem;
+    }
+
+    .nav-item {
+        color: #FFFFFF;
+        text-decoration: none;
+        padding: 0.5rem 1rem;
+        border-radius: 5px;
+        transition: background-color 0.3s;
+        font-weight: 500;
+        cursor: pointer;
+    }
+
+    .nav-item:hover {
+        background-color: #333333;
+    }
+
+    .nav-item.active {
+        background-color: #4169e1;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# Navigation
+nav_items = {
+    "🏠 Home": "Home",
+    "🔍 Search": "pages/1_Document_Search",
+    "📚 Library": "pages/2_Document_Library",
+    "⚙️ Settings": "pages/5_Settings",
+    "📋 Logs": "pages/4_Logs",
+    "📈 Metrics": ""
+}
+
+# Create navigation container
+nav_container = st.container()
+nav_cols = nav_container.columns(len(nav_items))
+
+# Add navigation items
+for idx, (label, page) in enumerate(nav_items.items()):
+    with nav_cols[idx]:
+        if st.button(
+            label,
+            key=f"nav_{page}",
+            use_container_width=True,
+            type="secondary" if page else "primary"
+        ):
+            if page:
+                st.switch_page(page + ".py")
+
+# Apply shared CSS
+st.markdown(f"<style>{get_css()}</style>", unsafe_allow_html=True)
+
+# Start the Prometheus exporters configured in the environment (once per process)
+metrics.start_exporters_from_env()
+
+# Title
+st.title("📈 Metrics")
+st.caption("Counters and latency histograms for this server process since it started.")
+
+
+def ms(seconds):
+    """Format seconds as milliseconds for display"""
+    return f"{seconds * 1000:.1f}" if seconds is not None else "–"
+
+
+def latency_table(histogram, label, errors=None):
+    """Table of count and latency percentiles per label set"""
+    rows = histogram.summary()
+    if not rows:
+        st.info("No data recorded yet.")
+        return
+    table = {
+        label.title(): [row[label] for row in rows],
+        "Count": [row["count"] for row in rows],
+        "Mean (ms)": [ms(row["mean"]) for row in rows],
+        "p50 (ms)": [ms(row["p50"]) for row in rows],
+        "p95 (ms)": [ms(row["p95"]) for row in rows],
+        "p99 (ms)": [ms(row["p99"]) for row in rows]
+    }
+    if errors is not None:
+        table["Errors"] = [errors.get((row[label],), 0) for row in rows]
+    st.table(table)
+
+
+# Pipeline stages
+st.markdown("### ⏱️ Pipeline Stages")
+st.caption("Percentiles are estimated from histogram buckets.")
+latency_table(STAGE_SECONDS, "stage", errors=STAGE_ERRORS.values())
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.markdown("### 🍃 MongoDB Round Trips")
+    latency_table(MONGO_SECONDS, "operation")
+
+with col2:
+    st.markdown("### 🤖 Embeddings API Requests")
+    latency_table(OPENAI_SECONDS, "status")
+
+# Query micro-batching
+st.markdown("### 📦 Embedding Batches")
+batch_sizes = EMBED_BATCH_SIZE.summary()
+if batch_sizes:
+    waits = {row["batcher"]: row for row in EMBED_BATCH_WAIT_SECONDS.summary()}
+    st.table({
+        "Batcher": [row["batcher"] for row in batch_sizes],
+        "Batches": [row["count"] for row in batch_sizes],
+        "Mean size": [f"{row['mean']:.1f}" for row in batch_sizes],
+        "p95 size": [f"{row['p95']:.0f}" for row in batch_sizes],
+        "Mean wait (ms)": [ms(waits[row["batcher"]]["mean"]) if row["batcher"] in waits else "–" for row in batch_sizes],
+        "p95 wait (ms)": [ms(waits[row["batcher"]]["p95"]) if row["batcher"] in waits else "–" for row in batch_sizes]
+    })
+else:
+    st.info("No query batches recorded yet.")
+
+# Caches
+st.markdown("### 💾 Caches")
+lookups = CACHE_LOOKUPS.values()
+caches = sorted({cache for cache, _ in lookups})
+if caches:
+    hits = [lookups.get((cache, "hit"), 0) for cache in caches]
+    misses = [lookups.get((cache, "miss"), 0) for cache in caches]
+    st.table({
+        "Cache": caches,
+        "Hits": hits,
+        "Misses": misses,
+        "Hit rate": [f"{h / (h + m):.0%}" if h + m else "–" for h, m in zip(hits, misses)]
+    })
+else:
+    st.info("No cache lookups recorded yet.")
+
+# Throughput counters
+st.markdown("### 📊 Counters")
+metric_cols = st.columns(4)
+with metric_cols[0]:
+    st.metric("Chunks created", CHUNKS_CREATED.value())
+with metric_cols[1]:
+    st.metric("MB extracted", f"{BYTES_EXTRACTED.value() / (1024 * 1024):.1f}")
+with metric_cols[2]:
+    st.metric("Texts embedded", EMBEDDED_TEXTS.value())
+with metric_cols[3]:
+    st.metric("In flight", sum(INFLIGHT.values().values()))
+
+# Prometheus export
+st.markdown("### 📤 Prometheus Export")
+snapshot = metrics.render_prometheus()
+export_col1, export_col2 = st.columns(2)
+with export_col1:
+    st.download_button(
+        "⬇️ Download Snapshot",
+        data=snapshot,
+        file_name="metrics.prom",
+        mime="text/plain",
+        use_container_width=True
+    )
+with export_col2:
+    if st.button("💾 Write Snapshot File", use_container_width=True):
+        project_root = Path(__file__).parent.parent
+        snapshot_path = os.environ.get("METRICS_SNAPSHOT_FILE") or project_root / "logs" / "metrics.prom"
+        try:
+            st.success(f"Snapshot written to {metrics.write_snapshot(snapshot_path)}")
+        except Exception as e:
+            st.error(f"Error writing snapshot: {str(e)}")
+with st.expander("View Prometheus text"):
+    st.code(snapshot, language="text")
+
+# Recent request traces
+st.markdown("### 🧵 Recent Requests")
+traces = trace_store.recent(limit=20)
+if traces:
+    st.table({
+        "Request ID": [trace.request_id for trace in traces],
+        "Type": [trace.name for trace in traces],
+        "Started": [trace.started_at.strftime("%H:%M:%S") for trace in traces],
+        "Duration (ms)": [f"{trace.duration_ms:.0f}" for trace in traces],
+        "Error": [trace.root.attributes.get("error", "") for trace in traces]
+    })
+    st.download_button(
+        "⬇️ Download Traces (JSON)",
+        data=trace_store.export_json(),
+        file_name="traces.json",
+        mime="application/json"
+    )
+else:
+    st.info("No searches or uploads traced yet.")
+
+# Add refresh button
+if st.button("🔄 Refresh Metrics"):
+    st.experimental_rerun()
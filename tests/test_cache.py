@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+
+import utils.cache
+from utils.cache import LRUCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the cache's monotonic clock with one the test advances"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(utils.cache, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_evicts_least_recently_used_entry():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_until_it_fits():
+    cache = LRUCache(max_entries=100, max_bytes=10, sizer=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+    assert cache.get("a") is None
+    assert cache.total_bytes == 8
+    assert len(cache) == 2
+
+
+def test_replacing_an_entry_updates_its_size():
+    cache = LRUCache(max_bytes=10, sizer=len)
+    cache.put("a", "xxxxxxxx")
+    cache.put("a", "xx")
+    assert cache.total_bytes == 2
+    cache.clear()
+    assert cache.total_bytes == 0 and len(cache) == 0
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = LRUCache(max_bytes=10, sizer=len)
+    cache.put("small", "xx")
+    cache.put("huge", "x" * 11)
+    assert cache.get("huge") is None
+    assert cache.get("small") == "xx"
+    assert cache.total_bytes == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(ttl_seconds=60)
+    cache.put("a", 1)
+    clock.value += 59
+    assert cache.get("a") == 1
+    clock.value += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = LRUCache(ttl_seconds=60, max_bytes=100, sizer=len)
+    cache.put("short", "xx", ttl_seconds=5)
+    cache.put("long", "xx")
+    clock.value += 10
+    assert cache.get("short") is None
+    assert cache.get("long") == "xx"
+    # An expired entry no longer counts against the budget
+    assert cache.total_bytes == 2
+
+
+def test_hit_and_miss_counters():
+    cache = LRUCache()
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_normalize_query_folds_case_and_whitespace():
+    assert normalize_query("  Hello \t WORLD\n") == normalize_query("hello world")
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from utils.http_transport import parse_retry_after
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, None),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "1.5"}, 1.5),
+    ({"retry-after": "-4"}, 0.0),
+    ({"retry-after": "soon"}, None),
+    ({"retry-after-ms": "250"}, 0.25),
+    # The millisecond header wins over the standard one
+    ({"retry-after-ms": "250", "retry-after": "10"}, 0.25),
+    # An unparseable millisecond header falls back to the standard one
+    ({"retry-after-ms": "x", "retry-after": "2"}, 2.0),
+])
+def test_parse_retry_after(headers, expected):
+    assert parse_retry_after(httpx.Headers(headers)) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = parse_retry_after(httpx.Headers({"Retry-After": format_datetime(retry_at, usegmt=True)}))
+    assert 28.0 <= delay <= 30.0
+
+
+def test_parse_retry_after_date_in_the_past():
+    retry_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert parse_retry_after(httpx.Headers({"Retry-After": format_datetime(retry_at, usegmt=True)})) == 0.0
@@ -0,0 +1,117 @@
+import gzip
+import json
+import logging
+
+import pytest
+
+import utils.log_segments
+from utils.log_segments import (
+    SegmentedFileHandler, compress_segment, list_segments, load_index, parse_segment_name, read_logs, read_range
+)
+
+
+def _lines(count, day="2024-03-14"):
+    return [f"{day} 10:{minute // 60:02d}:{minute % 60:02d},000 - app - INFO - line {minute}"
+            for minute in range(count)]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("app_20240314.log", ("20240314", None, "none")),
+    ("app_20240314.003.log", ("20240314", 3, "none")),
+    ("app_20240314.012.log.gz", ("20240314", 12, "gzip")),
+    ("app_20240314.001.log.zst", ("20240314", 1, "zstd")),
+    ("app_20240314.log.idx", None),
+    ("other.log", None),
+])
+def test_parse_segment_name(name, expected):
+    assert parse_segment_name(name) == expected
+
+
+def test_compress_segment_writes_block_index(tmp_path):
+    lines = _lines(200)
+    raw = tmp_path / "app_20240314.001.log"
+    raw.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    target = compress_segment(raw, "gzip", block_bytes=1024)
+
+    assert target.name == "app_20240314.001.log.gz" and not raw.exists()
+    index = load_index(target)
+    assert len(index["blocks"]) > 1
+    assert (index["first"], index["last"]) == (lines[0][:23], lines[-1][:23])
+    assert index["raw_bytes"] == sum(block["raw_length"] for block in index["blocks"])
+    # Blocks are independent members that each end on a line boundary
+    with open(target, "rb") as f:
+        for block in index["blocks"]:
+            f.seek(block["offset"])
+            data = gzip.decompress(f.read(block["length"]))
+            assert len(data) == block["raw_length"] and data.endswith(b"\n")
+    # Concatenated members still read as one gzip stream
+    assert gzip.decompress(target.read_bytes()).decode().splitlines() == lines
+
+
+def test_read_range_decompresses_only_overlapping_blocks(tmp_path, monkeypatch):
+    lines = _lines(200)
+    raw = tmp_path / "app_20240314.001.log"
+    raw.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    target = compress_segment(raw, "gzip", block_bytes=1024)
+    decompressed = []
+    original = utils.log_segments._decompress_block
+    monkeypatch.setattr(utils.log_segments, "_decompress_block",
+                        lambda data, compression: decompressed.append(1) or original(data, compression))
+
+    selected = list(read_range(target, "2024-03-14 10:01:00,000", "2024-03-14 10:01:09,000"))
+
+    assert selected == lines[60:70]
+    assert 0 < len(decompressed) < len(load_index(target)["blocks"])
+
+
+def test_tracebacks_stay_with_their_record(tmp_path):
+    raw = tmp_path / "app_20240314.001.log"
+    raw.write_text(
+        "2024-03-14 10:00:00,000 - app - ERROR - failed\nTraceback (most recent call last):\n  boom\n"
+        "2024-03-14 10:00:05,000 - app - INFO - later\n",
+        encoding="utf-8"
+    )
+    target = compress_segment(raw, "none")
+    assert target == raw and load_index(raw) is not None
+    assert list(read_range(raw, end="2024-03-14 10:00:01,000")) == [
+        "2024-03-14 10:00:00,000 - app - ERROR - failed", "Traceback (most recent call last):", "  boom"
+    ]
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    """A handler that rotates every few hundred bytes and runs maintenance inline"""
+    monkeypatch.setattr(SegmentedFileHandler, "_start_maintenance",
+                        lambda self, close_stale=False: self._maintain(close_stale))
+    handler = SegmentedFileHandler(tmp_path, max_bytes=400, compression="gzip", block_bytes=256,
+                                   retention_days=None)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    yield handler
+    handler.close()
+
+
+def test_handler_rotates_by_size_and_reads_back_in_order(tmp_path, handler):
+    messages = [f"record {number:03d} " + "x" * 40 for number in range(40)]
+    for message in messages:
+        handler.emit(logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None))
+    handler.flush()
+
+    segments = list_segments(tmp_path)
+    closed = [path for path in segments if parse_segment_name(path.name)[1] is not None]
+    assert len(closed) > 1
+    assert all(path.suffix == ".gz" and load_index(path) for path in closed)
+    assert parse_segment_name(segments[0].name)[1] is None
+    assert [line.split(" - ", 1)[1] for line in read_logs(tmp_path)] == messages
+
+
+def test_rollover_starts_a_new_segment(tmp_path, handler):
+    handler.emit(logging.LogRecord("test", logging.INFO, __file__, 1, "before", None, None))
+    handler.rollover()
+    handler.emit(logging.LogRecord("test", logging.INFO, __file__, 1, "after", None, None))
+    handler.flush()
+
+    names = sorted(path.name for path in list_segments(tmp_path))
+    assert names == [f"app_{handler.day}.001.log.gz", f"app_{handler.day}.log"]
+    assert [line.split(" - ", 1)[1] for line in read_logs(tmp_path)] == ["before", "after"]
+    assert json.loads((tmp_path / f"app_{handler.day}.001.log.gz.idx").read_text())["raw_bytes"] > 0
@@ -0,0 +1,54 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import utils.logger
+from utils.logger import RateLimitFilter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the filter's monotonic clock with one the test advances"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(utils.logger, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def _record(level=logging.INFO, lineno=10, msg="message"):
+    return logging.LogRecord("test", level, "/app/module.py", lineno, msg, None, None)
+
+
+def test_burst_then_drop(clock):
+    rate_filter = RateLimitFilter(per_second=1, burst=3)
+    assert [rate_filter.filter(_record()) for _ in range(5)] == [True, True, True, False, False]
+
+
+def test_tokens_refill_over_time_and_report_suppressed(clock):
+    rate_filter = RateLimitFilter(per_second=2, burst=1)
+    assert rate_filter.filter(_record())
+    assert not rate_filter.filter(_record())
+    assert not rate_filter.filter(_record())
+    clock.value += 0.5
+    record = _record()
+    assert rate_filter.filter(record)
+    assert record.msg == "message (2 similar messages suppressed)"
+    # The count is reported once
+    clock.value += 0.5
+    record = _record()
+    assert rate_filter.filter(record)
+    assert record.msg == "message"
+
+
+def test_call_sites_are_limited_separately(clock):
+    rate_filter = RateLimitFilter(per_second=1, burst=1)
+    assert rate_filter.filter(_record(lineno=10))
+    assert not rate_filter.filter(_record(lineno=10))
+    assert rate_filter.filter(_record(lineno=20))
+
+
+def test_warnings_are_never_dropped(clock):
+    rate_filter = RateLimitFilter(per_second=1, burst=1)
+    rate_filter.filter(_record())
+    assert all(rate_filter.filter(_record(level=logging.WARNING)) for _ in range(5))
+    assert rate_filter.filter(_record(level=logging.ERROR))
@@ -0,0 +1,28 @@
+import pytest
+
+from utils.search import RRF_K, reciprocal_rank_fusion
+
+
+def test_documents_in_both_lists_rank_first():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+    assert [doc_id for doc_id, _ in fused][0] == "c"
+    assert {doc_id for doc_id, _ in fused} == {"a", "b", "c", "d"}
+
+
+def test_scores_sum_reciprocal_ranks():
+    fused = dict(reciprocal_rank_fusion([["a", "b"], ["b"]], k=10))
+    assert fused["a"] == pytest.approx(1 / 11)
+    assert fused["b"] == pytest.approx(1 / 12 + 1 / 11)
+
+
+def test_ranking_is_by_descending_score():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"], ["c"]])
+    scores = [score for _, score in fused]
+    assert scores == sorted(scores, reverse=True)
+    assert [doc_id for doc_id, _ in fused] == ["c", "b", "a"]
+
+
+def test_default_k_and_empty_input():
+    assert reciprocal_rank_fusion([["a"]]) == [("a", pytest.approx(1 / (RRF_K + 1)))]
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
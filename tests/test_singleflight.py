@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+def _run_concurrently(flight, key, fn, followers):
+    """Start a leader blocked in fn, then followers for the same key; return their outcomes"""
+    outcomes = [None] * (followers + 1)
+
+    def call(slot):
+        try:
+            outcomes[slot] = ("result", flight.do(key, fn))
+        except Exception as e:
+            outcomes[slot] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    _wait_for(lambda: flight.in_flight() == 1)
+    for slot in range(1, followers + 1):
+        threads.append(threading.Thread(target=call, args=(slot,)))
+        threads[-1].start()
+    return threads, outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "vector"
+
+    threads, outcomes = _run_concurrently(flight, "query", fn, followers=3)
+    _wait_for(lambda: flight.get_stats()["coalesced"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert outcomes == [("result", "vector")] * 4
+    assert flight.get_stats() == {"executions": 1, "coalesced": 3, "in_flight": 0, "hit_rate": 0.75}
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("rate limited")
+
+    threads, outcomes = _run_concurrently(flight, "query", fn, followers=2)
+    _wait_for(lambda: flight.get_stats()["coalesced"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [kind for kind, _ in outcomes] == ["error"] * 3
+    assert all(str(error) == "rate limited" for _, error in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_finished_call_is_not_reused():
+    flight = SingleFlight()
+    assert flight.do("query", lambda: 1) == 1
+    assert flight.do("query", lambda: 2) == 2
+    assert flight.get_stats()["executions"] == 2
+
+
+def test_distinct_keys_run_separately():
+    flight = SingleFlight()
+    assert [flight.do(key, lambda key=key: key * 2) for key in (1, 2)] == [2, 4]
+    with pytest.raises(ValueError):
+        flight.do("bad", lambda: int("x"))
+    assert flight.get_stats()["coalesced"] == 0
@@ -0,0 +1,42 @@
+import hashlib
+
+from utils.text_store import TextStore, file_hash
+
+
+def test_file_hash_matches_sha256(tmp_path):
+    path = tmp_path / "doc.txt"
+    data = b"page one\n" * 1000
+    path.write_bytes(data)
+    assert file_hash(path, block_size=64) == hashlib.sha256(data).hexdigest()
+
+
+def test_round_trip(tmp_path):
+    store = TextStore(tmp_path)
+    entry = {"pages": ["Première page", "second page"], "text": "Première page\nsecond page", "offsets": [0, 14]}
+    path = store.put("ab" + "0" * 62, 2, entry)
+
+    assert path.parent.name == "ab"
+    stored = store.get("ab" + "0" * 62, 2)
+    assert {key: stored[key] for key in entry} == entry
+    assert (stored["content_hash"], stored["extractor_version"]) == ("ab" + "0" * 62, 2)
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_missing_entries(tmp_path):
+    store = TextStore(tmp_path)
+    store.put("cd" + "1" * 62, 1, {"text": "old extractor"})
+    assert store.get("cd" + "1" * 62, 2) is None
+    assert store.get("ef" + "2" * 62, 1) is None
+
+
+def test_delete_removes_every_version(tmp_path):
+    store = TextStore(tmp_path)
+    content_hash = "12" + "3" * 62
+    store.put(content_hash, 1, {"text": "a"})
+    store.put(content_hash, 2, {"text": "b"})
+    store.put("12" + "4" * 62, 1, {"text": "other file"})
+    assert store.get_stats()["entries"] == 3
+
+    store.delete(content_hash)
+    assert store.get(content_hash, 1) is None and store.get(content_hash, 2) is None
+    assert store.get_stats()["entries"] == 1
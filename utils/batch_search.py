@@ -0,0 +1,92 @@
+"""Batch semantic search from the command line.
+
+Usage:
+    python -m utils.batch_search queries.txt --k 5 --backend matrix --out results.jsonl
+
+The queries file holds one query per line, or JSON lines with a "query" field (.jsonl).
+Credentials come from OPENAI_API_KEY / MONGODB_URI or the credentials saved on the Settings page.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from utils.logger import logger
+
+
+def read_queries(path):
+    """Read queries from a text file (one per line) or a JSON lines file"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                queries.append(record["query"] if isinstance(record, dict) else str(record))
+            else:
+                queries.append(line)
+    return queries
+
+
+def format_result(result):
+    """Shape a search result as a JSON-serializable record"""
+    return {
+        "doc_id": str(result.get("_id")),
+        "filename": result.get("filename"),
+        "score": result.get("similarity"),
+        "best_chunk": result.get("best_chunk")
+    }
+
+
+def load_credentials():
+    """Resolve credentials from the environment, falling back to the saved settings"""
+    mongodb_uri = os.environ.get("MONGODB_URI")
+    openai_api_key = os.environ.get("OPENAI_API_KEY")
+    if not (mongodb_uri and openai_api_key):
+        from utils.sqlite_client import SQLiteClient
+        saved = SQLiteClient().get_credentials() or {}
+        mongodb_uri = mongodb_uri or saved.get("mongodb_uri")
+        openai_api_key = openai_api_key or saved.get("openai_api_key")
+    return mongodb_uri, openai_api_key
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run semantic search for a file of queries")
+    parser.add_argument("queries", help="Text file with one query per line, or a .jsonl file")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--backend", choices=["matrix", "parallel"], default="matrix",
+                        help="matrix: one in-memory matrix product; parallel: concurrent database searches")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent searches for the parallel backend")
+    parser.add_argument("--out", default="-", help="Output JSON lines file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    from utils.mongodb import mongodb
+    from utils.openai_client import openai_client
+    from utils.search import search_many
+
+    mongodb_uri, openai_api_key = load_credentials()
+    if not (mongodb_uri and openai_api_key):
+        parser.error("Set MONGODB_URI and OPENAI_API_KEY or save credentials on the Settings page")
+    mongodb.connect(mongodb_uri)
+    openai_client.connect(openai_api_key)
+
+    queries = read_queries(args.queries)
+    started = time.perf_counter()
+    results = search_many(queries, k=args.k, backend=args.backend, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Batch searched {len(queries)} queries in {elapsed:.2f}s ({args.backend} backend)")
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        for query, hits in zip(queries, results):
+            out.write(json.dumps({"query": query, "results": [format_result(hit) for hit in hits]}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from utils.logger import logger
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional TTL and byte budget"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=None, max_bytes=None, sizer=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return a cached value and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl_seconds=None):
+        """Store a value, evicting the least recently used entries when full"""
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = self.sizer(value) if self.sizer else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Values larger than the whole budget are not cached at all
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, expires_at)
+            self._sizes[key] = size
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        """Drop an entry and its size accounting; caller holds the lock"""
+        del self._entries[key]
+        self.total_bytes -= self._sizes.pop(key, 0)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self):
+        """Return hit, miss and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def normalize_query(text):
+    """Normalize a search query so trivially different spellings share a cache entry"""
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+class EmbeddingCache:
+    """Query embedding cache with an in-memory LRU tier backed by a persistent SQLite tier"""
+
+    def __init__(self, db_path=None, max_entries=1024, ttl_seconds=7 * 24 * 3600, persist=True):
+        project_root = Path(__file__).parent.parent
+        self.db_path = Path(db_path) if db_path else project_root / "data" / "cache" / "embeddings.db"
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    @staticmethod
+    def make_key(model, text):
+        """Build the cache key for a (model, normalized query) pair"""
+        digest = hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def _connection(self):
+        """Open the persistent tier on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, model, text):
+        """Return a cached embedding or None"""
+        key = self.make_key(model, text)
+        vector = self.memory.get(key)
+        if vector is not None or not self.persist:
+            return vector
+
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or (self.ttl_seconds and row[1] + self.ttl_seconds <= time.time()):
+                    self.disk_misses += 1
+                    return None
+                self.disk_hits += 1
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {e}")
+            return None
+
+        vector = array('d', row[0]).tolist()
+        remaining = self.ttl_seconds - (time.time() - row[1]) if self.ttl_seconds else None
+        self.memory.put(key, vector, ttl_seconds=remaining)
+        return vector
+
+    def put(self, model, text, vector):
+        """Cache an embedding in both tiers"""
+        key = self.make_key(model, text)
+        self.memory.put(key, vector)
+        if not self.persist:
+            return
+
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "REPLACE INTO query_embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model, array('d', vector).tobytes(), time.time())
+                )
+                self._writes += 1
+                # Expired rows are purged periodically rather than on every write
+                if self.ttl_seconds and self._writes % 500 == 0:
+                    conn.execute(
+                        "DELETE FROM query_embeddings WHERE created_at < ?",
+                        (time.time() - self.ttl_seconds,)
+                    )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {e}")
+
+    def clear(self):
+        """Drop every cached embedding"""
+        self.memory.clear()
+        if not self.persist:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM query_embeddings")
+            conn.commit()
+
+    def get_stats(self):
+        """Return hit counters for both tiers"""
+        stats = self.memory.get_stats()
+        stats.update({"disk_hits": self.disk_hits, "disk_misses": self.disk_misses})
+        return stats
@@ -0,0 +1,43 @@
+import os
+import threading
+from utils.logger import logger
+
+_env_file_lock = threading.Lock()
+_env_file_loaded = False
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid value for {name}, using default {default}")
+        return int(default)
+
+
+def env_float(name, default):
+    """Read a float setting from the environment"""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid value for {name}, using default {default}")
+        return float(default)
+
+
+def env_bool(name, default=False):
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def load_env_file():
+    """Load variables from .env into the environment the first time it is called in this process"""
+    global _env_file_loaded
+    with _env_file_lock:
+        if _env_file_loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_file_loaded = True
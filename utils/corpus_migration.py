@@ -0,0 +1,292 @@
+"""Re-chunk and/or re-embed the stored corpus into a new corpus version in the background.
+
+Usage:
+    python -m utils.corpus_migration --version v2 --model text-embedding-3-large --dimensions 1024
+    python -m utils.corpus_migration --version v2 --chunk-size 800 --chunk-overlap 100 --docs-per-second 2
+
+Searches keep using the active version the whole time. Each document gets its new chunks in a
+separate field (chunks_<version>) with its own vector index; once every document has them the
+active version is switched in one write, and the old field and index are removed. Rerunning the
+same command resumes an interrupted migration: documents that already have the new field are
+skipped. Credentials come from OPENAI_API_KEY / MONGODB_URI or the credentials saved on the
+Settings page.
+"""
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from utils.config import env_float
+from utils.logger import logger
+
+PROCESSED_DIR = Path(__file__).parent.parent / "data" / "processed"
+
+# Settings that define what a version's chunks contain; a resumed migration must not change them
+CHUNK_SETTINGS = ("model", "dimensions", "chunk_size", "chunk_overlap")
+
+
+def new_version(current, name, model=None, dimensions=None, chunk_size=None, chunk_overlap=None):
+    """Version record for a migration target; settings not given are kept from the current version"""
+    from utils.mongodb import VECTOR_INDEX_NAME
+    if not re.fullmatch(r"[A-Za-z0-9_]+", name):
+        raise ValueError(f"Version names may only contain letters, digits and underscores: {name}")
+    target = {key: value for key, value in current.items() if key not in ("_id", "activated_at")}
+    target.update(version=name, field=f"chunks_{name}", index_name=f"{VECTOR_INDEX_NAME}-{name}")
+    if model:
+        # A new model keeps its own output size unless dimensions are asked for
+        target.update(model=model, dimensions=None)
+    if dimensions:
+        target.update(dimensions=dimensions, num_dimensions=dimensions)
+    if chunk_size:
+        target["chunk_size"] = chunk_size
+    if chunk_overlap is not None:
+        target["chunk_overlap"] = chunk_overlap
+    if target["chunk_overlap"] >= target["chunk_size"]:
+        raise ValueError("Chunk overlap must be smaller than the chunk size")
+    return target
+
+
+class CorpusMigration:
+    """Moves the corpus from the active version to a target version without interrupting searches"""
+
+    def __init__(self, mongodb, openai_client, processor, target, docs_per_second=2.0, batch_size=8,
+                 drain_seconds=None, keep_old=False):
+        self.mongodb = mongodb
+        self.openai_client = openai_client
+        self.processor = processor
+        self.target = target
+        self.docs_per_second = docs_per_second
+        self.batch_size = batch_size
+        # Other processes re-read the active version this often; wait out two of their refreshes
+        # before removing what they may still be searching
+        self.drain_seconds = (2 * env_float("CORPUS_VERSION_REFRESH_SECONDS", 10)
+                              if drain_seconds is None else drain_seconds)
+        self.keep_old = keep_old
+        self.progress_id = f"migration:{target['version']}"
+        self.source = None
+
+    def run(self):
+        """Backfill, build the index, switch, then retire the old version"""
+        active = self.mongodb.active_version(refresh=True)
+        progress = self._resume(active)
+        if progress is None:
+            return self.target
+        if active["version"] != self.target["version"]:
+            logger.info(f"Migrating corpus from {self.source['version']} to {self.target['version']}")
+            self._record(status="backfilling")
+            self.backfill()
+
+            self._record(status="indexing")
+            self.build_index()
+            # Pick up documents uploaded while the index was building
+            self.backfill()
+
+            self._record(status="switching")
+            self.mongodb.switch_corpus_version(self.target)
+        # Uploads from processes that have not seen the switch yet still go to the old field
+        time.sleep(self.drain_seconds)
+        self.backfill()
+
+        if any(self.source[key] != self.target[key] for key in ("chunk_size", "chunk_overlap")):
+            # Keyword search should match the chunks vector search now returns
+            self.mongodb.reindex_keyword_text(self.target)
+
+        if not self.keep_old:
+            self._record(status="retiring")
+            self.retire_source()
+            # A straggling upload may have landed in the old field after the drain
+            self.backfill()
+            self.retire_source()
+
+        self._record(status="complete", completed_at=datetime.utcnow())
+        logger.info(f"Corpus migration to {self.target['version']} complete")
+        return self.target
+
+    def _resume(self, active):
+        """Start or resume the migration's progress record; None if there is nothing left to do.
+
+        An interrupted run is picked up where it stopped, but never with different chunk
+        settings, which would mix two kinds of chunks in one version.
+        """
+        progress = self.mongodb.meta.find_one({"_id": self.progress_id})
+        if progress is None:
+            if active["version"] == self.target["version"]:
+                logger.info(f"Corpus version {self.target['version']} is already active")
+                return None
+            self.source = active
+            progress = {
+                "_id": self.progress_id, "target": self.target, "source": self.source,
+                "status": "pending", "migrated": 0, "started_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }
+            self.mongodb.meta.insert_one(progress)
+            return progress
+
+        stored = progress["target"]
+        changed = [key for key in CHUNK_SETTINGS if stored.get(key) != self.target.get(key)]
+        if changed:
+            raise ValueError(f"Migration to {self.target['version']} was started with different "
+                             f"{', '.join(changed)}; choose a new version name")
+        if progress["status"] == "complete":
+            logger.info(f"Corpus migration to {self.target['version']} already completed")
+            return None
+        self.source = progress["source"]
+        if active["version"] not in (self.source["version"], stored["version"]):
+            raise ValueError(f"Version {active['version']} became active while migrating from "
+                             f"{self.source['version']} to {stored['version']}")
+        # Keep the embedding size measured by the earlier run
+        self.target = dict(stored)
+        logger.info(f"Resuming migration to {self.target['version']} "
+                    f"({progress.get('migrated', 0)} documents already migrated)")
+        return progress
+
+    def _record(self, migrated=0, **fields):
+        fields.update(updated_at=datetime.utcnow(), target=self.target)
+        update = {"$set": fields}
+        if migrated:
+            update["$inc"] = {"migrated": migrated}
+        self.mongodb.meta.update_one({"_id": self.progress_id}, update)
+
+    def backfill(self):
+        """Write target chunks for every document that has none yet, a throttled batch at a time"""
+        from pymongo import UpdateOne
+        collection = self.mongodb.ensure_connection()
+        field = self.target["field"]
+        source_field = self.source["field"]
+        projection = {"filename": 1, "content_hash": 1, f"{source_field}.text": 1}
+        total = 0
+        while True:
+            started = time.monotonic()
+            batch = list(collection.find({field: {"$exists": False}}, projection).limit(self.batch_size))
+            if not batch:
+                break
+            chunk_lists, extra = zip(*(self._chunk_document(doc) for doc in batch))
+            texts = [text for chunks in chunk_lists for text in chunks]
+            embeddings = self.openai_client.get_embeddings(
+                texts, model=self.target["model"], dimensions=self.target["dimensions"]
+            ) if texts else []
+            self._check_dimensions(embeddings)
+            vectors = iter(embeddings)
+            updates = []
+            for doc, chunks, fields in zip(batch, chunk_lists, extra):
+                fields[field] = [{"text": text, "embedding": next(vectors)} for text in chunks]
+                # Only set if still missing, so a concurrent run never overwrites a finished document
+                updates.append(UpdateOne({"_id": doc["_id"], field: {"$exists": False}}, {"$set": fields}))
+            collection.bulk_write(updates, ordered=False)
+            total += len(batch)
+            self._record(migrated=len(batch))
+            logger.info(f"Migrated {total} documents to {field}")
+
+            # Throttle so the job never competes with searches for the database or the API
+            pause = len(batch) / self.docs_per_second - (time.monotonic() - started)
+            if pause > 0:
+                time.sleep(pause)
+        return total
+
+    def _check_dimensions(self, embeddings):
+        """Take the index size from the first embeddings; later ones must match it"""
+        if not embeddings:
+            return
+        sizes = {len(embedding) for embedding in embeddings}
+        if len(sizes) != 1:
+            raise ValueError(f"Embeddings of different sizes in one batch: {sorted(sizes)}")
+        size = sizes.pop()
+        if size != self.target["num_dimensions"]:
+            # The size may only be taken over while no document holds target embeddings yet
+            if self.mongodb.collection.find_one({f"{self.target['field']}.0": {"$exists": True}}, {"_id": 1}):
+                raise ValueError(f"Embedding size changed from {self.target['num_dimensions']} to {size}")
+            logger.info(f"{self.target['model']} returns {size} dimensions")
+            self.target["num_dimensions"] = size
+
+    def _chunk_document(self, doc):
+        """Target chunk texts of one document, plus any fields to store alongside them"""
+        fields = {}
+        text = None
+        if doc.get("content_hash"):
+            entry = self.processor.load_document(doc["content_hash"])
+            text = entry["text"] if entry else None
+        if text is None and doc.get("filename") and (PROCESSED_DIR / doc["filename"]).exists():
+            extracted = self.processor.extract_document(PROCESSED_DIR / doc["filename"])
+            text = extracted["text"]
+            fields.update(content_hash=extracted["content_hash"],
+                          extractor_version=extracted["extractor_version"])
+        if text is not None:
+            chunks = self.processor.create_chunks(text, self.target["chunk_size"], self.target["chunk_overlap"])
+            return chunks, fields
+
+        # Without the original text the existing chunks can only be re-embedded, not re-chunked
+        chunks = [chunk.get("text", "") for chunk in doc.get(self.source["field"], [])]
+        if chunks and any(self.source[key] != self.target[key] for key in ("chunk_size", "chunk_overlap")):
+            logger.warning(f"No stored text for {doc.get('filename')}; re-embedding its existing chunks")
+        return [chunk for chunk in chunks if chunk], fields
+
+    def build_index(self, poll_seconds=5):
+        """Build the target's vector search index and wait until it can serve queries"""
+        builder = self.mongodb.ensure_search_index(self.target)
+        while True:
+            status = builder.get_status()
+            if status["status"] in ("ready", "unsupported"):
+                # Without Atlas Search the new version is served by exact scoring, like the old one
+                logger.info(f"Index {self.target['index_name']}: {status['message']}")
+                return status
+            if status["status"] == "failed":
+                raise RuntimeError(f"Index {self.target['index_name']} failed to build: {status['message']}")
+            time.sleep(poll_seconds)
+
+    def retire_source(self):
+        """Remove the old version's chunks from migrated documents and drop its index"""
+        collection = self.mongodb.ensure_connection()
+        source_field = self.source["field"]
+        result = collection.update_many(
+            {self.target["field"]: {"$exists": True}, source_field: {"$exists": True}},
+            {"$unset": {source_field: ""}}
+        )
+        if result.modified_count:
+            logger.info(f"Removed {source_field} from {result.modified_count} documents")
+        self.mongodb.drop_search_index(self.source["index_name"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate the corpus to new chunking or embedding settings")
+    parser.add_argument("--version", required=True, help="Name of the new corpus version, e.g. v2")
+    parser.add_argument("--model", default=None, help="Embedding model (default: the active version's)")
+    parser.add_argument("--dimensions", type=int, default=None, help="Embedding size to request from the model")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Characters per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=None, help="Characters shared by adjacent chunks")
+    parser.add_argument("--docs-per-second", type=float, default=2.0, help="Throttle for the backfill")
+    parser.add_argument("--batch-size", type=int, default=8, help="Documents embedded and written together")
+    parser.add_argument("--drain-seconds", type=float, default=None,
+                        help="Wait after the switch before removing the old version")
+    parser.add_argument("--keep-old", action="store_true", help="Keep the old version's chunks and index")
+    args = parser.parse_args(argv)
+
+    from utils.batch_search import load_credentials
+    from utils.document_processor import document_processor
+    from utils.mongodb import mongodb
+    from utils.openai_client import openai_client
+
+    mongodb_uri, openai_api_key = load_credentials()
+    if not (mongodb_uri and openai_api_key):
+        parser.error("Set MONGODB_URI and OPENAI_API_KEY or save credentials on the Settings page")
+    mongodb.connect(mongodb_uri)
+    openai_client.connect(openai_api_key)
+
+    try:
+        target = new_version(mongodb.active_version(refresh=True), args.version, args.model,
+                             args.dimensions, args.chunk_size, args.chunk_overlap)
+    except ValueError as e:
+        parser.error(str(e))
+    migration = CorpusMigration(mongodb, openai_client, document_processor, target,
+                                docs_per_second=args.docs_per_second, batch_size=args.batch_size,
+                                drain_seconds=args.drain_seconds, keep_old=args.keep_old)
+    try:
+        migration.run()
+    except Exception as e:
+        logger.error(f"Corpus migration to {args.version} failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from utils.logger import logger
+
+# Legacy key files written by the old credentials manager start with a 16-byte PBKDF2 salt
+LEGACY_SALT_BYTES = 16
+
+
+def parse_key(data):
+    """Return the Fernet key in a key file (raw key, or salt followed by key), or None"""
+    from cryptography.fernet import Fernet
+    for candidate in (data.strip(), data[LEGACY_SALT_BYTES:].strip()):
+        try:
+            Fernet(candidate)
+            return candidate
+        except Exception:
+            continue
+    return None
+
+
+class CredentialStore:
+    """Encrypted key-value store for API credentials in data/secure/credentials.db.
+
+    The key is loaded once per process and decrypted values are kept in memory until the
+    database file changes (another process wrote to it) or this process writes to it.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CredentialStore, cls).__new__(cls)
+            cls._instance.secure_dir = Path(__file__).parent.parent / "data" / "secure"
+            cls._instance.db_path = cls._instance.secure_dir / "credentials.db"
+            cls._instance.key_path = cls._instance.secure_dir / ".key"
+            cls._instance._lock = threading.RLock()
+            cls._instance._cipher = None
+            cls._instance._ready = False
+            cls._instance._version = 0
+            cls._instance._cached = (None, None)
+        return cls._instance
+
+    @property
+    def version(self):
+        """Incremented on every write from this process"""
+        return self._version
+
+    def initialize(self):
+        """Create the secure directory, key and schema if needed; runs once per process"""
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                self.secure_dir.mkdir(parents=True, exist_ok=True)
+                os.chmod(self.secure_dir, 0o700)
+                self._load_key()
+                self._init_db()
+                self._ready = True
+            except Exception as e:
+                logger.error(f"Error initializing credential store: {str(e)}")
+                raise
+
+    def _load_key(self):
+        # cryptography is imported with the key, on the first credential read rather than at page import
+        from cryptography.fernet import Fernet
+        key = parse_key(self.key_path.read_bytes()) if self.key_path.exists() else None
+        if key is None:
+            if self.key_path.exists():
+                logger.warning("Invalid encryption key found, generating new key")
+            # A random key needs no derivation, so a missing key never costs a KDF run
+            key = Fernet.generate_key()
+            temp_path = self.key_path.with_suffix(".tmp")
+            temp_path.write_bytes(key)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, self.key_path)
+        os.chmod(self.key_path, 0o600)
+        self._cipher = Fernet(key)
+
+    def _init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS credentials (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Databases created by the old SQLite client have no updated_at column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(credentials)")}
+            if "updated_at" not in columns:
+                conn.execute("ALTER TABLE credentials ADD COLUMN updated_at TIMESTAMP")
+                conn.execute("UPDATE credentials SET updated_at = created_at")
+                logger.info("Added updated_at column to credentials table")
+        os.chmod(self.db_path, 0o600)
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None, self._version
+        return (stat.st_mtime_ns, stat.st_size), self._version
+
+    def _load(self):
+        """Decrypted credentials, reloaded only when the database file or version changed"""
+        # One stat call on the fast path; (stamp, values) is swapped as a whole so readers never lock
+        cached_stamp, cached = self._cached
+        if cached is not None and self._stamp() == cached_stamp:
+            return cached
+        with self._lock:
+            self.initialize()
+            stamp = self._stamp()
+            cached_stamp, cached = self._cached
+            if cached is not None and stamp == cached_stamp:
+                return cached
+            values = {}
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute("SELECT key, value FROM credentials").fetchall()
+            for key, encrypted_value in rows:
+                try:
+                    values[key] = self._cipher.decrypt(encrypted_value.encode()).decode()
+                except Exception as e:
+                    logger.error(f"Error decrypting credential {key}: {str(e)}")
+            self._cached = (stamp, values)
+            return values
+
+    def get(self, key, default=None):
+        """Decrypted value of one credential"""
+        return self._load().get(key, default)
+
+    def get_all(self):
+        """Copy of all decrypted credentials"""
+        return dict(self._load())
+
+    def save(self, values):
+        """Encrypt and store several credentials in one transaction"""
+        with self._lock:
+            self.initialize()
+            try:
+                rows = [(key, self._cipher.encrypt(value.encode()).decode()) for key, value in values.items()]
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.executemany("""
+                        INSERT INTO credentials (key, value) VALUES (?, ?)
+                        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+                    """, rows)
+            finally:
+                self._version += 1
+
+    def delete(self, *keys):
+        """Remove the given credentials"""
+        with self._lock:
+            self.initialize()
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.executemany("DELETE FROM credentials WHERE key = ?", [(key,) for key in keys])
+            finally:
+                self._version += 1
+
+    def clear(self):
+        """Remove all stored credentials"""
+        with self._lock:
+            self.initialize()
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute("DELETE FROM credentials")
+            finally:
+                self._version += 1
+
+# Create a singleton instance
+credential_store = CredentialStore()
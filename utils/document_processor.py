@@ -1,47 +1,94 @@
-from PyPDF2 import PdfReader
 from pathlib import Path
 import re
 from utils.logger import logger
+from utils.metrics import track_stage, BYTES_EXTRACTED, CHUNKS_CREATED, CACHE_LOOKUPS
+from utils.text_store import file_hash, text_store
+
+# Bump when an extractor returns different text for the same file; stored text from other
+# versions is ignored and the file is parsed again
+EXTRACTOR_VERSION = 1
+# Bump when _clean_text changes; stored raw pages are cleaned again without re-parsing the file
+CLEANING_VERSION = 1
 
 class DocumentProcessor:
-    def __init__(self, chunk_size=1000, chunk_overlap=200):
+    def __init__(self, chunk_size=1000, chunk_overlap=200, store=None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Extracted text is kept in the store, when given, so the same file is only parsed once
+        self.store = store
 
     def extract_text(self, file_path: Path) -> str:
         """Extract text from a document."""
+        return self.extract_document(file_path)["text"]
+
+    def extract_document(self, file_path: Path) -> dict:
+        """Extract cleaned text and page offsets, reusing text stored for identical file contents."""
         try:
-            if file_path.suffix.lower() == '.pdf':
-                return self._extract_from_pdf(file_path)
-            elif file_path.suffix.lower() in ['.txt']:
-                return self._extract_from_text(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_path.suffix}")
+            with track_stage("extract"):
+                content_hash = file_hash(file_path)
+                entry = self.load_document(content_hash)
+                if entry is None:
+                    if file_path.suffix.lower() == '.pdf':
+                        pages = self._extract_from_pdf(file_path)
+                    elif file_path.suffix.lower() in ['.txt']:
+                        pages = self._extract_from_text(file_path)
+                    else:
+                        raise ValueError(f"Unsupported file type: {file_path.suffix}")
+                    BYTES_EXTRACTED.inc(file_path.stat().st_size)
+                    entry = {"source": file_path.name, "pages": pages, **self._clean_pages(pages)}
+                    if self.store is not None:
+                        self.store.put(content_hash, EXTRACTOR_VERSION, entry)
+            return {
+                "content_hash": content_hash,
+                "extractor_version": EXTRACTOR_VERSION,
+                "text": entry["text"],
+                "page_offsets": entry["page_offsets"]
+            }
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {e}")
             raise
 
-    def _extract_from_pdf(self, file_path: Path) -> str:
-        """Extract text from a PDF file."""
+    def load_document(self, content_hash: str) -> dict:
+        """Stored text of a previously extracted file, without the file; None if not stored."""
+        if self.store is None:
+            return None
+        entry = self.store.get(content_hash, EXTRACTOR_VERSION)
+        CACHE_LOOKUPS.inc(cache="extracted_text", result="hit" if entry is not None else "miss")
+        if entry is not None and entry.get("cleaning_version") != CLEANING_VERSION:
+            entry.update(self._clean_pages(entry["pages"]))
+            self.store.put(content_hash, EXTRACTOR_VERSION, entry)
+        return entry
+
+    def _extract_from_pdf(self, file_path: Path) -> list[str]:
+        """Extract the raw text of each page of a PDF file."""
         try:
+            from PyPDF2 import PdfReader  # Loaded with the first PDF upload, not at page import
             reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return self._clean_text(text)
+            return [page.extract_text() or "" for page in reader.pages]
         except Exception as e:
             logger.error(f"Error extracting text from PDF {file_path}: {e}")
             raise
 
-    def _extract_from_text(self, file_path: Path) -> str:
-        """Extract text from a text file."""
+    def _extract_from_text(self, file_path: Path) -> list[str]:
+        """Extract text from a text file as a single page."""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                return self._clean_text(f.read())
+                return [f.read()]
         except Exception as e:
             logger.error(f"Error extracting text from text file {file_path}: {e}")
             raise
 
+    def _clean_pages(self, pages: list[str]) -> dict:
+        """Clean each page and join them, recording where each page starts in the joined text."""
+        parts, offsets, position = [], [], 0
+        for page in pages:
+            cleaned = self._clean_text(page)
+            offsets.append(position)
+            if cleaned:
+                parts.append(cleaned)
+                position += len(cleaned) + 1
+        return {"text": " ".join(parts), "page_offsets": offsets, "cleaning_version": CLEANING_VERSION}
+
     def _clean_text(self, text: str) -> str:
         """Clean extracted text."""
         # Remove extra whitespace
@@ -50,31 +97,35 @@ class DocumentProcessor:
         text = re.sub(r'[^\w\s.,!?-]', '', text)
         return text.strip()
 
-    def create_chunks(self, text: str) -> list[str]:
-        """Split text into overlapping chunks."""
+    def create_chunks(self, text: str, chunk_size: int | None = None, chunk_overlap: int | None = None) -> list[str]:
+        """Split text into overlapping chunks, with this processor's sizes unless given."""
+        chunk_size = chunk_size or self.chunk_size
+        chunk_overlap = self.chunk_overlap if chunk_overlap is None else chunk_overlap
         try:
             chunks = []
             if not text:
                 return chunks
 
-            start = 0
-            while start < len(text):
-                # Get chunk of size chunk_size
-                end = start + self.chunk_size
-                chunk = text[start:end]
+            with track_stage("chunk"):
+                start = 0
+                while start < len(text):
+                    # Get chunk of size chunk_size
+                    end = start + chunk_size
+                    chunk = text[start:end]
 
-                # If this is not the last chunk, try to break at a sentence boundary
-                if end < len(text):
-                    # Look for last sentence boundary in chunk
-                    last_period = chunk.rfind('.')
-                    if last_period != -1:
-                        end = start + last_period + 1
-                        chunk = text[start:end]
+                    # If this is not the last chunk, try to break at a sentence boundary
+                    if end < len(text):
+                        # Look for last sentence boundary in chunk
+                        last_period = chunk.rfind('.')
+                        if last_period != -1:
+                            end = start + last_period + 1
+                            chunk = text[start:end]
 
-                chunks.append(chunk.strip())
-                # Move start position, accounting for overlap
-                start = end - self.chunk_overlap
+                    chunks.append(chunk.strip())
+                    # Move start position, accounting for overlap
+                    start = end - chunk_overlap
 
+            CHUNKS_CREATED.inc(len(chunks))
             logger.info(f"Created {len(chunks)} chunks from text")
             return chunks
         except Exception as e:
@@ -82,4 +133,4 @@ class DocumentProcessor:
             raise
 
 # Create a singleton instance
-document_processor = DocumentProcessor() 
\ No newline at end of file
+document_processor = DocumentProcessor(store=text_store)
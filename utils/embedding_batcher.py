@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from utils.logger import logger
+from utils.metrics import EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_SECONDS
+
+
+def _histogram_stats(histogram, name, scale=1.0):
+    """Bucket counts and mean of one batcher's series in a registry histogram"""
+    series = histogram.snapshot().get((name,), {"counts": [0] * (len(histogram.buckets) + 1), "sum": 0.0, "count": 0})
+    bounds = [f"{bound * scale:g}" for bound in histogram.buckets]
+    labels = [f"<={bound}" for bound in bounds] + [f">{bounds[-1]}"]
+    return {
+        "buckets": dict(zip(labels, series["counts"])),
+        "count": series["count"],
+        "mean": series["sum"] * scale / series["count"] if series["count"] else 0.0
+    }
+
+
+class EmbeddingBatcher:
+    """Gather embedding requests arriving within a short window into one API call"""
+
+    def __init__(self, embed_batch, window_ms=5.0, max_batch_size=64, name="embedding-batcher", timeout=60.0):
+        self.embed_batch = embed_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.batches = 0
+        self.errors = 0
+
+    def submit(self, text):
+        """Queue a text for embedding and return a Future for its vector"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text, timeout=None):
+        """Embed a single text through the batcher, blocking until the batch completes or the timeout
+        (the batcher's default when not given) expires"""
+        return self.submit(text).result(timeout=self.timeout if timeout is None else timeout)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._dispatch(batch)
+            except BaseException as e:
+                # Whatever went wrong, no caller is left waiting on an unresolved future
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Error embedding batch of {len(batch)} texts: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+
+    def _dispatch(self, batch):
+        """Embed one batch and resolve its futures in input order"""
+        texts = [text for text, _, _ in batch]
+        dispatched = time.perf_counter()
+        vectors = self.embed_batch(texts)
+        if len(vectors) != len(batch):
+            raise ValueError(f"Embeddings API returned {len(vectors)} vectors for {len(batch)} texts")
+
+        with self._lock:
+            self.batches += 1
+        EMBED_BATCH_SIZE.observe(len(batch), batcher=self.name)
+        for _, _, enqueued in batch:
+            EMBED_BATCH_WAIT_SECONDS.observe(dispatched - enqueued, batcher=self.name)
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def get_stats(self):
+        """Return batch size and queue wait histograms"""
+        with self._lock:
+            batches, errors = self.batches, self.errors
+        return {
+            "batches": batches,
+            "errors": errors,
+            "pending": self._queue.qsize(),
+            "batch_size": _histogram_stats(EMBED_BATCH_SIZE, self.name),
+            "wait_ms": _histogram_stats(EMBED_BATCH_WAIT_SECONDS, self.name, scale=1000.0)
+        }
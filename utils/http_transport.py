@@ -0,0 +1,171 @@
+import os
+import random
+import threading
+import time
+import atexit
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import importlib.util
+import httpx
+from utils.logger import logger
+from utils.config import env_int, env_float
+
+# Status codes that are safe to retry for our (idempotent) embedding calls
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def load_transport_settings():
+    """Load HTTP transport settings from the environment"""
+    http2_setting = os.getenv("OPENAI_HTTP2", "auto").lower()
+    h2_available = importlib.util.find_spec("h2") is not None
+    if http2_setting in ("1", "true", "yes", "on"):
+        if not h2_available:
+            logger.warning("OPENAI_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = h2_available
+    elif http2_setting == "auto":
+        http2 = h2_available
+    else:
+        http2 = False
+
+    return {
+        "max_connections": env_int("OPENAI_HTTP_MAX_CONNECTIONS", 20),
+        "max_keepalive_connections": env_int("OPENAI_HTTP_MAX_KEEPALIVE", 10),
+        "keepalive_expiry": env_float("OPENAI_HTTP_KEEPALIVE_EXPIRY", 60.0),
+        "http2": http2,
+        "connect_timeout": env_float("OPENAI_CONNECT_TIMEOUT", 5.0),
+        "read_timeout": env_float("OPENAI_READ_TIMEOUT", 30.0),
+        "write_timeout": env_float("OPENAI_WRITE_TIMEOUT", 30.0),
+        "pool_timeout": env_float("OPENAI_POOL_TIMEOUT", 10.0),
+        "max_retries": env_int("OPENAI_MAX_RETRIES", 3),
+        "backoff_base": env_float("OPENAI_RETRY_BACKOFF", 0.5),
+        "backoff_max": env_float("OPENAI_RETRY_MAX_BACKOFF", 8.0),
+        "retry_after_max": env_float("OPENAI_RETRY_AFTER_MAX", 30.0),
+    }
+
+
+def parse_retry_after(headers):
+    """Return the server-requested delay in seconds, or None"""
+    # OpenAI sends a millisecond-precision variant alongside the standard header
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000.0, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryTransport(httpx.BaseTransport):
+    """HTTP transport that retries transient failures with jittered exponential backoff"""
+
+    def __init__(self, transport, max_retries=3, backoff_base=0.5, backoff_max=8.0, retry_after_max=30.0):
+        self.transport = transport
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+
+    def _backoff(self, attempt, response=None):
+        """Compute the delay before the next attempt"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers)
+            if retry_after is not None:
+                return min(retry_after, self.retry_after_max)
+        # "Full jitter" keeps concurrent sessions from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def handle_request(self, request):
+        attempt = 0
+        while True:
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout,
+                    httpx.RemoteProtocolError, httpx.PoolTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                response.close()
+                logger.warning(f"OpenAI returned {response.status_code}, retrying in {delay:.2f}s")
+
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+
+def build_http_client(settings=None):
+    """Build an httpx client with tuned pooling, timeouts and retries"""
+    settings = settings or load_transport_settings()
+    limits = httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive_connections"],
+        keepalive_expiry=settings["keepalive_expiry"]
+    )
+    transport = RetryTransport(
+        httpx.HTTPTransport(limits=limits, http2=settings["http2"]),
+        max_retries=settings["max_retries"],
+        backoff_base=settings["backoff_base"],
+        backoff_max=settings["backoff_max"],
+        retry_after_max=settings["retry_after_max"]
+    )
+    return httpx.Client(transport=transport, timeout=build_timeout(settings))
+
+
+def build_timeout(settings=None):
+    """Build split connect/read/write/pool timeouts"""
+    settings = settings or load_transport_settings()
+    return httpx.Timeout(
+        connect=settings["connect_timeout"],
+        read=settings["read_timeout"],
+        write=settings["write_timeout"],
+        pool=settings["pool_timeout"]
+    )
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_http_client():
+    """Return the process-wide HTTP client shared by all sessions"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                settings = load_transport_settings()
+                _shared_client = build_http_client(settings)
+                logger.info(
+                    f"Created shared HTTP transport (max_connections={settings['max_connections']}, "
+                    f"http2={settings['http2']}, max_retries={settings['max_retries']})"
+                )
+    return _shared_client
+
+
+def close_shared_http_client():
+    """Close the process-wide HTTP client"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+
+atexit.register(close_shared_http_client)
@@ -1,16 +1,22 @@
-from credentials_manager import credentials_manager
+import sys
+from pathlib import Path
+
+# setup.sh runs this file directly, so make the project packages importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.credential_store import credential_store
 from utils.logger import logger
 
 def init_db():
     """Initialize the credentials database and encryption"""
     try:
         # This will create the database file, tables, and encryption key
-        credentials_manager._init_database()
-        logger.info(f"Credentials database initialized successfully at: {credentials_manager.db_path}")
-        logger.info(f"Encryption key created at: {credentials_manager.key_path}")
+        credential_store.initialize()
+        logger.info(f"Credentials database initialized successfully at: {credential_store.db_path}")
+        logger.info(f"Encryption key created at: {credential_store.key_path}")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise
 
 if __name__ == "__main__":
-    init_db() 
\ No newline at end of file
+    init_db()
@@ -0,0 +1,197 @@
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from utils.logger import logger
+
+# Tokens are alphanumeric runs; hyphenated codes such as "ERR-1042" become "err" AND "1042"
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split text into lowercase search terms"""
+    return [token.lower() for token in TOKEN_PATTERN.findall(text or "")]
+
+
+class LexicalIndex:
+    """Persistent BM25 inverted index over chunk text, backed by SQLite FTS5"""
+
+    def __init__(self, db_path=None):
+        project_root = Path(__file__).parent.parent
+        self.db_path = Path(db_path) if db_path else project_root / "data" / "index" / "lexical.db"
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connection(self):
+        """Open the index database on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    file_type TEXT,
+                    created_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                    text, content='chunks', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+            """)
+            # Indexes created before metadata filtering lack the file_type column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            if "file_type" not in columns:
+                conn.execute("ALTER TABLE documents ADD COLUMN file_type TEXT")
+                rows = conn.execute("SELECT doc_id, filename FROM documents").fetchall()
+                conn.executemany(
+                    "UPDATE documents SET file_type = ? WHERE doc_id = ?",
+                    [(filename.rsplit('.', 1)[-1].lower(), doc_id)
+                     for doc_id, filename in rows if filename and '.' in filename]
+                )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents(file_type, created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def add_document(self, doc_id, filename, chunks, created_at=None, file_type=None):
+        """Index (or re-index) the chunks of a document"""
+        doc_id = str(doc_id)
+        if file_type is None and filename and '.' in filename:
+            file_type = filename.rsplit('.', 1)[-1].lower()
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+                conn.execute(
+                    "REPLACE INTO documents (doc_id, filename, file_type, created_at) VALUES (?, ?, ?, ?)",
+                    (doc_id, filename, file_type, created_at)
+                )
+                conn.executemany(
+                    "INSERT INTO chunks (doc_id, chunk_index, text) VALUES (?, ?, ?)",
+                    [(doc_id, i, text) for i, text in enumerate(chunks) if text]
+                )
+        logger.info(f"Indexed {len(chunks)} chunks for keyword search (document {doc_id})")
+
+    def remove_document(self, doc_id):
+        """Remove a document and its chunks from the index"""
+        doc_id = str(doc_id)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+                conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def document_ids(self):
+        """Return the set of indexed document IDs"""
+        with self._lock:
+            return {row[0] for row in self._connection().execute("SELECT doc_id FROM documents")}
+
+    def clear(self):
+        """Remove every document from the index"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM documents")
+
+    @staticmethod
+    def _match_expression(query):
+        """Build an FTS5 query that ORs the quoted query terms"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    @staticmethod
+    def _filter_clause(filters):
+        """Build a SQL condition on the documents table for search filters"""
+        conditions, params = [], []
+        if not filters:
+            return "", params
+        if filters.get("file_types"):
+            conditions.append(f"file_type IN ({','.join('?' for _ in filters['file_types'])})")
+            params.extend(file_type.lower() for file_type in filters["file_types"])
+        if filters.get("created_after"):
+            conditions.append("created_at >= ?")
+            params.append(filters["created_after"].isoformat())
+        if filters.get("created_before"):
+            conditions.append("created_at < ?")
+            params.append(filters["created_before"].isoformat())
+        if filters.get("filename_prefix"):
+            conditions.append("substr(filename, 1, ?) = ?")
+            params.extend([len(filters["filename_prefix"]), filters["filename_prefix"]])
+        return " AND ".join(conditions), params
+
+    def search_chunks(self, query, limit=50, filters=None):
+        """Return the best matching chunks as (doc_id, chunk_index, text, score), best first"""
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        clause, filter_params = self._filter_clause(filters)
+        # Filtered searches only consider chunks of the prefiltered documents
+        filter_sql = f"AND c.doc_id IN (SELECT doc_id FROM documents WHERE {clause})" if clause else ""
+        with self._lock:
+            rows = self._connection().execute(f"""
+                SELECT c.doc_id, c.chunk_index, c.text, bm25(chunks_fts) AS rank
+                FROM chunks_fts
+                JOIN chunks c ON c.id = chunks_fts.rowid
+                WHERE chunks_fts MATCH ? {filter_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, [expression, *filter_params, limit]).fetchall()
+        # FTS5 reports BM25 as a negative number where lower is better
+        return [(doc_id, chunk_index, text, -rank) for doc_id, chunk_index, text, rank in rows]
+
+    def search_documents(self, query, limit=5, chunks_per_result=10, filters=None):
+        """Return the best matching documents with their best chunk and BM25 score"""
+        hits = self.search_chunks(query, limit=limit * chunks_per_result, filters=filters)
+        best = {}
+        for doc_id, _, text, score in hits:
+            if doc_id not in best:
+                best[doc_id] = {"doc_id": doc_id, "best_chunk": text, "lexical_score": score}
+            if len(best) >= limit:
+                break
+        if not best:
+            return []
+
+        with self._lock:
+            placeholders = ",".join("?" for _ in best)
+            rows = self._connection().execute(
+                f"SELECT doc_id, filename, file_type, created_at FROM documents WHERE doc_id IN ({placeholders})",
+                list(best)
+            ).fetchall()
+        for doc_id, filename, file_type, created_at in rows:
+            best[doc_id]["filename"] = filename
+            best[doc_id]["file_type"] = file_type
+            best[doc_id]["created_at"] = datetime.fromisoformat(created_at) if created_at else None
+        return list(best.values())
+
+    def candidate_document_ids(self, query, limit=100, filters=None):
+        """Return IDs of documents containing any query term, best first"""
+        return [result["doc_id"] for result in self.search_documents(query, limit=limit, filters=filters)]
+
+    def get_stats(self):
+        """Return index size counters"""
+        with self._lock:
+            conn = self._connection()
+            documents = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {"documents": documents, "chunks": chunks}
+
+# Create a singleton instance
+lexical_index = LexicalIndex()
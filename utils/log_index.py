@@ -0,0 +1,326 @@
+import json
+import re
+import sqlite3
+import threading
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from utils.lexical_index import tokenize
+from utils.log_segments import list_segments, open_segment, parse_segment_name, segment_size
+from utils.logger import logger
+
+# "2024-03-14 10:15:00,123 - doc_upload - INFO - message [request 1a2b3c4d5e6f]"
+RECORD_PATTERN = re.compile(
+    r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\S+) - (\w+) - (.*?)(?: \[request (\w+)\])?$'
+)
+
+# New bytes are read in blocks so a large backlog never has to fit in memory at once
+READ_BLOCK_BYTES = 4 * 1024 * 1024
+
+# Bytes at the start of a file used to notice that a log file was replaced rather than appended to
+HEAD_BYTES = 256
+
+
+def parse_line(line):
+    """Parse a text or JSON log line into (timestamp, name, level, message, request_id), or None"""
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+            return entry["timestamp"], entry["name"], entry["level"], entry["message"], entry.get("request_id")
+        except (ValueError, KeyError, TypeError):
+            return None
+    match = RECORD_PATTERN.match(line)
+    return match.groups() if match else None
+
+
+def _same_start(current, indexed):
+    """Whether a file's first bytes agree with those recorded when it was indexed"""
+    return current.startswith(indexed[:len(current)]) if indexed is not None else True
+
+
+class LogIndex:
+    """Incremental index of the application log files, backed by SQLite FTS5.
+
+    Each refresh reads only the bytes appended since the last one, so the cost of keeping the
+    index current is proportional to new log volume, and queries never touch the log files.
+    """
+
+    def __init__(self, logs_dir=None, db_path=None):
+        project_root = Path(__file__).parent.parent
+        self.logs_dir = Path(logs_dir) if logs_dir else project_root / "logs"
+        self.db_path = Path(db_path) if db_path else project_root / "data" / "index" / "logs.db"
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connection(self):
+        """Open the index database on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL,
+                    head BLOB,
+                    last_record_id INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    request_id TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_records_file_time ON records(file, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_records_time ON records(timestamp);
+                CREATE INDEX IF NOT EXISTS idx_records_level_time ON records(level, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_records_request ON records(request_id);
+                CREATE TABLE IF NOT EXISTS level_counts (
+                    file TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (file, level)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+                    message, content='records', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN
+                    INSERT INTO records_fts(records_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                END;
+                CREATE TRIGGER IF NOT EXISTS records_au AFTER UPDATE OF message ON records BEGIN
+                    INSERT INTO records_fts(records_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                    INSERT INTO records_fts(rowid, message) VALUES (new.id, new.message);
+                END;
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def log_files(self):
+        """Log segments on disk, newest first"""
+        return list_segments(self.logs_dir)
+
+    @staticmethod
+    def _read_head(path):
+        with open_segment(path) as f:
+            return f.read(HEAD_BYTES)
+
+    def refresh(self):
+        """Index whatever was appended to the log files since the last refresh"""
+        with self._lock:
+            conn = self._connection()
+            known = {name: (offset, head, last_id) for name, offset, head, last_id
+                     in conn.execute("SELECT name, offset, head, last_record_id FROM files")}
+            on_disk = {path.name: path for path in self.log_files()}
+            added = 0
+            try:
+                # Compressed segments never change once written, so only plain files and new names are read
+                heads = {
+                    name: self._read_head(path) for name, path in on_disk.items()
+                    if name not in known or parse_segment_name(name)[2] == "none"
+                }
+                unchanged = {
+                    name for name in known
+                    if name in on_disk and (name not in heads or _same_start(heads[name], known[name][1]))
+                }
+                claimed = set()
+                for name, (offset, head, last_id) in list(known.items()):
+                    if name in unchanged:
+                        continue
+                    # A segment that was rotated or compressed keeps its records under its new name
+                    target = next((other for other in heads if other not in known and other not in claimed
+                                   and head and _same_start(heads[other], head)), None)
+                    with conn:
+                        if target:
+                            claimed.add(target)
+                            conn.execute("UPDATE records SET file = ? WHERE file = ?", (target, name))
+                            conn.execute("UPDATE level_counts SET file = ? WHERE file = ?", (target, name))
+                            conn.execute("UPDATE files SET name = ? WHERE name = ?", (target, name))
+                        else:
+                            # Deleted by retention, or replaced by a new file under the same name
+                            conn.execute("DELETE FROM records WHERE file = ?", (name,))
+                            conn.execute("DELETE FROM level_counts WHERE file = ?", (name,))
+                            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                    if target:
+                        known[target] = (offset, head, last_id)
+                for name, path in on_disk.items():
+                    state = known.get(name) if name in unchanged or name in claimed else None
+                    added += self._index_file(conn, path, *(state or (0, None, None)), heads.get(name))
+            except Exception as e:
+                logger.error(f"Error indexing logs: {str(e)}")
+                raise
+        return added
+
+    def _index_file(self, conn, path, offset, head, last_id, current_head):
+        size = segment_size(path)
+        if head is None:
+            # List new files straight away, even before they hold a complete line
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO files (name, offset, head) VALUES (?, 0, ?)",
+                             (path.name, current_head))
+        if current_head is None:
+            current_head = head
+        if size < offset:
+            # Truncated in place: start over
+            with conn:
+                conn.execute("DELETE FROM records WHERE file = ?", (path.name,))
+                conn.execute("DELETE FROM level_counts WHERE file = ?", (path.name,))
+            offset, last_id = 0, None
+        if size == offset:
+            return 0
+        with open_segment(path) as f:
+            added = 0
+            f.seek(offset)
+            while True:
+                block = f.read(READ_BLOCK_BYTES)
+                # Only complete lines are indexed; a partly written last line waits for the next refresh
+                end = block.rfind(b"\n") + 1
+                if not end:
+                    if len(block) < READ_BLOCK_BYTES:
+                        break
+                    # A single line longer than a block is indexed in pieces rather than stalling
+                    end = len(block)
+                rows = []
+                position = offset
+                lines = block[:end].split(b"\n")
+                if not lines[-1]:
+                    lines.pop()
+                for raw in lines:
+                    line = raw.decode("utf-8", errors="replace").rstrip("\r")
+                    parsed = parse_line(line)
+                    if parsed:
+                        timestamp, name, level, message, request_id = parsed
+                        rows.append((path.name, position, timestamp, name, level, message, request_id))
+                    elif line and rows:
+                        # Continuation lines (tracebacks, multi-line messages) belong to the previous record
+                        rows[-1] = rows[-1][:5] + (rows[-1][5] + "\n" + line,) + rows[-1][6:]
+                    elif line and last_id is not None:
+                        conn.execute("UPDATE records SET message = message || ? WHERE id = ?",
+                                     ("\n" + line, last_id))
+                    position += len(raw) + 1
+                with conn:
+                    if rows:
+                        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+                        conn.executemany(
+                            "INSERT INTO records (file, offset, timestamp, name, level, message, request_id) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                        )
+                        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                        # New rows enter the full-text index in one statement; a per-row trigger is several times slower
+                        conn.execute(
+                            "INSERT INTO records_fts(rowid, message) SELECT id, message FROM records WHERE id > ?",
+                            (first_id,)
+                        )
+                        # Per-level totals are kept up to date here so statistics never scan the records
+                        conn.executemany(
+                            "INSERT INTO level_counts (file, level, count) VALUES (?, ?, ?) "
+                            "ON CONFLICT (file, level) DO UPDATE SET count = count + excluded.count",
+                            [(path.name, level, count) for level, count in Counter(row[4] for row in rows).items()]
+                        )
+                    offset += end
+                    conn.execute(
+                        "REPLACE INTO files (name, offset, head, last_record_id) VALUES (?, ?, ?, ?)",
+                        (path.name, offset, current_head, last_id)
+                    )
+                added += len(rows)
+                f.seek(offset)
+        return added
+
+    @staticmethod
+    def _match_expression(text):
+        """Build an FTS5 query requiring every term, the last one as a prefix"""
+        terms = list(dict.fromkeys(tokenize(text)))
+        return " AND ".join(f'"{term}"' + ("*" if i == len(terms) - 1 else "") for i, term in enumerate(terms))
+
+    def _where(self, file=None, start_date=None, end_date=None, level=None, search=None, request_id=None):
+        """Build the WHERE clause shared by record queries and counts"""
+        conditions, params = [], []
+        if file:
+            conditions.append("r.file = ?")
+            params.append(file)
+        if start_date:
+            conditions.append("r.timestamp >= ?")
+            params.append(start_date.strftime("%Y-%m-%d"))
+        if end_date:
+            # Timestamps sort as text, so the day after the end date bounds the range
+            conditions.append("r.timestamp < ?")
+            params.append((end_date + timedelta(days=1)).strftime("%Y-%m-%d"))
+        if level:
+            conditions.append("r.level = ?")
+            params.append(level)
+        if request_id:
+            conditions.append("r.request_id = ?")
+            params.append(request_id)
+        if search:
+            expression = self._match_expression(search)
+            if not expression:
+                return "0", []
+            conditions.append("r.id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+            params.append(expression)
+        return " AND ".join(conditions) or "1", params
+
+    def query(self, limit=200, offset=0, **filters):
+        """Matching records as dicts, newest first"""
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._connection().execute(f"""
+                SELECT r.timestamp, r.name, r.level, r.message, r.request_id, r.file
+                FROM records r
+                WHERE {where}
+                ORDER BY r.timestamp DESC, r.id DESC
+                LIMIT ? OFFSET ?
+            """, [*params, limit, offset]).fetchall()
+        return [
+            {"timestamp": timestamp, "name": name, "level": level, "message": message,
+             "request_id": request_id, "file": file}
+            for timestamp, name, level, message, request_id, file in rows
+        ]
+
+    def count(self, limit=None, **filters):
+        """Number of matching records, counting no further than limit when one is given"""
+        where, params = self._where(**filters)
+        limit_sql = "LIMIT ?" if limit else ""
+        with self._lock:
+            return self._connection().execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM records r WHERE {where} {limit_sql})",
+                [*params, limit] if limit else params
+            ).fetchone()[0]
+
+    def level_counts(self, by_file=False):
+        """Record counts per level ({level: count}), or per file ({file: {level: count}})"""
+        with self._lock:
+            rows = self._connection().execute("SELECT file, level, count FROM level_counts").fetchall()
+        counts = {}
+        for file, level, count in rows:
+            if by_file:
+                counts.setdefault(file, {})[level] = count
+            else:
+                counts[level] = counts.get(level, 0) + count
+        return counts
+
+    def indexed_files(self):
+        """Names of indexed log files, newest first"""
+        with self._lock:
+            return [row[0] for row in self._connection().execute("SELECT name FROM files ORDER BY name DESC")]
+
+    def clear(self):
+        """Drop the index; the next refresh reindexes every log file"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM records")
+                conn.execute("DELETE FROM level_counts")
+                conn.execute("DELETE FROM files")
+
+
+def format_record(record):
+    """Render a record back into its log line"""
+    tag = f" [request {record['request_id']}]" if record["request_id"] else ""
+    return f"{record['timestamp']} - {record['name']} - {record['level']} - {record['message']}{tag}"
+
+# Create a singleton instance
+log_index = LogIndex()
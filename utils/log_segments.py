@@ -0,0 +1,438 @@
+"""Log file segments: rotation, compression, retention and time-indexed reading.
+
+The active segment of a day is logs/app_YYYYMMDD.log. When it reaches LOG_MAX_BYTES, or the day
+changes, it is renamed to app_YYYYMMDD.NNN.log and compressed in the background into a series of
+independent gzip members (or zstd frames) of about LOG_BLOCK_BYTES each. A JSON sidecar
+(<segment>.idx) records the first and last timestamp and the byte range of every block, so a time
+range can be read by decompressing only the blocks that overlap it.
+
+Every process that imports utils.logger (the Streamlit server, the command-line tools, the
+benchmarks) appends to the same active segment. Writers hold a shared lock on logs/.app.lock while
+they write, and rotation takes it exclusively; before each write a process checks that its open
+file is still the active segment and reopens it if another process rotated. A renamed segment is
+therefore never written to again, so it can be compressed and removed safely.
+
+This module is used by the logger itself, so it must not log through utils.logger.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+    LOCK_SH, LOCK_EX, LOCK_UN = fcntl.LOCK_SH, fcntl.LOCK_EX, fcntl.LOCK_UN
+except ImportError:
+    # No advisory locks on Windows; rotation is then only safe with a single writing process
+    fcntl = None
+    LOCK_SH = LOCK_EX = LOCK_UN = None
+
+COMPRESSIONS = ("gzip", "zstd", "none")
+SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+# app_20240314.log (active) or app_20240314.003.log[.gz|.zst] (closed)
+SEGMENT_PATTERN = re.compile(r'^app_(\d{8})(?:\.(\d{3,}))?\.log(\.gz|\.zst)?$')
+
+# Leading timestamp of a text line, or the "timestamp" field that opens a JSON line
+TIMESTAMP_PATTERN = re.compile(r'^(?:\{"timestamp": ")?(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})')
+
+INDEX_VERSION = 1
+
+
+def parse_segment_name(name):
+    """Return (day, sequence or None for the active segment, compression) or None"""
+    match = SEGMENT_PATTERN.match(name)
+    if not match:
+        return None
+    day, sequence, suffix = match.groups()
+    return day, int(sequence) if sequence else None, SUFFIXES.get(suffix, "none")
+
+
+def segment_label(name):
+    """Human-readable segment name, e.g. '2024-03-14 #3 (gzip)'"""
+    parsed = parse_segment_name(name)
+    if not parsed:
+        return name
+    day, sequence, compression = parsed
+    label = f"{day[:4]}-{day[4:6]}-{day[6:]}"
+    if sequence is None:
+        return f"{label} (current)"
+    return f"{label} #{sequence}" + (f" ({compression})" if compression != "none" else "")
+
+
+def list_segments(logs_dir):
+    """Log segments in logs_dir, newest first (a day's active segment before its closed ones)"""
+    segments = []
+    for path in Path(logs_dir).glob("app_*.log*"):
+        parsed = parse_segment_name(path.name)
+        if parsed:
+            day, sequence, _ = parsed
+            segments.append(((day, float("inf") if sequence is None else sequence), path))
+    return [path for _, path in sorted(segments, reverse=True)]
+
+
+def index_path(path):
+    return Path(f"{path}.idx")
+
+
+def load_index(path):
+    """The sidecar block index of a closed segment, or None"""
+    try:
+        index = json.loads(index_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def open_segment(path):
+    """Open a segment for binary reading, decompressing transparently"""
+    compression = SUFFIXES.get(Path(path).suffix, "none")
+    if compression == "gzip":
+        # GzipFile reads concatenated members as one stream
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"Reading {Path(path).name} requires the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+    return open(path, "rb")
+
+
+def segment_size(path):
+    """Uncompressed size of a segment"""
+    path = Path(path)
+    if SUFFIXES.get(path.suffix, "none") == "none":
+        return path.stat().st_size
+    index = load_index(path)
+    if index:
+        return index["raw_bytes"]
+    # No sidecar: decompress to count
+    size = 0
+    with open_segment(path) as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return size
+            size += len(block)
+
+
+def _line_timestamp(line):
+    match = TIMESTAMP_PATTERN.match(line.decode("utf-8", errors="replace")[:64])
+    return match.group(1) if match else None
+
+
+def _compress_block(data, compression):
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def _decompress_block(data, compression):
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _split_blocks(source, block_bytes):
+    """Yield blocks of about block_bytes that end on line boundaries"""
+    pending = b""
+    while True:
+        data = source.read(block_bytes)
+        pending += data
+        while pending and (len(pending) >= block_bytes or not data):
+            cut = pending.rfind(b"\n", 0, block_bytes) + 1 if data else len(pending)
+            if not cut:
+                # A line longer than a block ends the block where the line ends
+                cut = pending.find(b"\n", block_bytes) + 1
+                if not cut:
+                    break
+            yield pending[:cut]
+            pending = pending[cut:]
+        if not data:
+            return
+
+
+def compress_segment(path, compression="gzip", block_bytes=1024 * 1024):
+    """Compress a closed segment into independent blocks and write its sidecar index.
+
+    With compression "none" the segment is left as it is and only the sidecar is written.
+    Returns the path of the finished segment.
+    """
+    path = Path(path)
+    if compression == "zstd" and zstandard is None:
+        compression = "gzip"
+    suffix = {"gzip": ".gz", "zstd": ".zst"}.get(compression, "")
+    target = Path(f"{path}{suffix}")
+    temp_path = Path(f"{target}.tmp")
+    blocks = []
+    raw_offset = offset = 0
+    out = open(temp_path, "wb") if suffix else None
+    try:
+        with open(path, "rb") as source:
+            for block in _split_blocks(source, block_bytes):
+                lines = block.splitlines()
+                stamps = (_line_timestamp(line) for line in lines)
+                last_stamps = (_line_timestamp(line) for line in reversed(lines))
+                compressed = _compress_block(block, compression)
+                if out:
+                    out.write(compressed)
+                blocks.append({
+                    "first": next((stamp for stamp in stamps if stamp), None),
+                    "last": next((stamp for stamp in last_stamps if stamp), None),
+                    "offset": offset if out else raw_offset,
+                    "length": len(compressed),
+                    "raw_offset": raw_offset,
+                    "raw_length": len(block)
+                })
+                offset += len(compressed)
+                raw_offset += len(block)
+    finally:
+        if out:
+            out.close()
+    index = {
+        "version": INDEX_VERSION,
+        "compression": compression,
+        "raw_bytes": raw_offset,
+        "first": next((block["first"] for block in blocks if block["first"]), None),
+        "last": next((block["last"] for block in reversed(blocks) if block["last"]), None),
+        "blocks": blocks
+    }
+    # The segment is swapped in before its sidecar, and the raw file removed last, so an
+    # interrupted compression leaves the raw segment to be compressed again
+    sidecar = index_path(target)
+    Path(f"{sidecar}.tmp").write_text(json.dumps(index), encoding="utf-8")
+    if out:
+        os.replace(temp_path, target)
+    os.replace(f"{sidecar}.tmp", sidecar)
+    if out:
+        path.unlink()
+    return target
+
+
+def read_range(path, start=None, end=None):
+    """Yield the lines of a segment logged between start and end (inclusive timestamp strings).
+
+    With a sidecar index only the overlapping blocks are read and decompressed. Lines without a
+    timestamp (tracebacks) go with the record before them.
+    """
+    index = load_index(path)
+    if index is None:
+        with open_segment(path) as f:
+            chunks = [f.read()]
+    else:
+        chunks = []
+        with open(path, "rb") as f:
+            for block in index["blocks"]:
+                if (end and block["first"] and block["first"] > end) or (start and block["last"] and block["last"] < start):
+                    continue
+                f.seek(block["offset"])
+                chunks.append(_decompress_block(f.read(block["length"]), index["compression"]))
+    include = start is None
+    for chunk in chunks:
+        for line in chunk.splitlines():
+            stamp = _line_timestamp(line)
+            if stamp:
+                include = (start is None or stamp >= start) and (end is None or stamp <= end)
+            if include:
+                yield line.decode("utf-8", errors="replace")
+
+
+def read_logs(logs_dir, start=None, end=None):
+    """Yield log lines between start and end (timestamp strings) across all segments, oldest first.
+
+    Segments of days outside the range are skipped by name, and blocks outside it by their index.
+    """
+    start_day = start[:10].replace("-", "") if start else None
+    end_day = end[:10].replace("-", "") if end else None
+    for path in reversed(list_segments(logs_dir)):
+        day = parse_segment_name(path.name)[0]
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        yield from read_range(path, start, end)
+
+
+def apply_retention(logs_dir, retention_days=None, max_total_bytes=None):
+    """Delete the oldest closed segments beyond the age and total size limits"""
+    closed = [path for path in list_segments(logs_dir) if parse_segment_name(path.name)[1] is not None]
+    deleted = []
+    if retention_days:
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y%m%d")
+        deleted += [path for path in closed if parse_segment_name(path.name)[0] < cutoff]
+    if max_total_bytes:
+        active_bytes = sum(path.stat().st_size for path in list_segments(logs_dir)
+                           if parse_segment_name(path.name)[1] is None)
+        total = active_bytes
+        for path in closed:
+            if path in deleted:
+                continue
+            total += path.stat().st_size
+            if total > max_total_bytes:
+                deleted.append(path)
+    for path in deleted:
+        path.unlink(missing_ok=True)
+        index_path(path).unlink(missing_ok=True)
+    return deleted
+
+
+class SegmentedFileHandler(logging.FileHandler):
+    """File handler that rotates by size and by day, compressing closed segments in the background"""
+
+    def __init__(self, logs_dir, max_bytes=50 * 1024 * 1024, compression="gzip", block_bytes=1024 * 1024,
+                 retention_days=30, max_total_bytes=None):
+        self.logs_dir = Path(logs_dir)
+        self.max_bytes = max_bytes
+        self.compression = compression if compression in COMPRESSIONS else "gzip"
+        if self.compression == "zstd" and zstandard is None:
+            self.compression = "gzip"
+        self.block_bytes = block_bytes
+        self.retention_days = retention_days
+        self.max_total_bytes = max_total_bytes
+        self.day = datetime.now().strftime("%Y%m%d")
+        self._maintenance_lock = threading.Lock()
+        self._stale_checked = False
+        self._lock_fd = None
+        # The file is opened with the first record, so importing the logger touches no files
+        super().__init__(self.logs_dir / f"app_{self.day}.log", delay=True)
+
+    def _open(self):
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        if not self._stale_checked:
+            # Segments left behind by an earlier process (a previous day, or an interrupted compression)
+            self._stale_checked = True
+            self._start_maintenance(close_stale=True)
+        return super()._open()
+
+    def _flock(self, operation):
+        """Shared (writing) or exclusive (rotating) lock on the active segment across processes"""
+        if fcntl is None:
+            return
+        if self._lock_fd is None:
+            self.logs_dir.mkdir(parents=True, exist_ok=True)
+            self._lock_fd = os.open(self.logs_dir / ".app.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, operation)
+
+    def _is_current(self):
+        """Whether the open file is still the active segment on disk (no other process rotated it)"""
+        try:
+            on_disk = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(self.stream.fileno())
+        return (on_disk.st_dev, on_disk.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def _reopen(self):
+        self.stream.close()
+        self.stream = None  # Opened again by the next write
+
+    def emit(self, record):
+        try:
+            self._flock(LOCK_SH)
+        except Exception:
+            self.handleError(record)
+        try:
+            try:
+                day = datetime.fromtimestamp(record.created).strftime("%Y%m%d")
+                # The size on disk includes what other processes wrote
+                if day != self.day or (self.max_bytes and self.stream
+                                       and os.fstat(self.stream.fileno()).st_size >= self.max_bytes):
+                    self._rotate(day)
+                elif self.stream and not self._is_current():
+                    self._reopen()
+            except Exception:
+                self.handleError(record)
+            # Written and flushed while the shared lock is held, so a rotation cannot rename the
+            # file between the check above and this write
+            super().emit(record)
+        finally:
+            self._flock(LOCK_UN)
+
+    def rollover(self, day=None):
+        """Close the active segment, start a new one and compress the old one in the background"""
+        try:
+            self._rotate(day)
+        finally:
+            self._flock(LOCK_UN)
+
+    def _rotate(self, day=None):
+        self.acquire()
+        try:
+            self._flock(LOCK_EX)
+            if self.stream:
+                self.stream.flush()
+                # Rename only if no other process got here first; otherwise just follow its rotation
+                current = self._is_current()
+                self._reopen()
+                if current:
+                    self._close_segment(Path(self.baseFilename))
+            self.day = day or datetime.now().strftime("%Y%m%d")
+            self.baseFilename = os.path.abspath(self.logs_dir / f"app_{self.day}.log")
+        finally:
+            self.release()
+        self._start_maintenance()
+
+    def close(self):
+        super().close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _close_segment(self, path):
+        """Rename an active segment to the next sequence number of its day"""
+        if not path.exists() or not path.stat().st_size:
+            return
+        day = parse_segment_name(path.name)[0]
+        sequences = [parse_segment_name(other.name)[1] for other in self.logs_dir.glob(f"app_{day}.*.log*")
+                     if parse_segment_name(other.name)]
+        sequence = max([s for s in sequences if s is not None], default=0) + 1
+        os.replace(path, self.logs_dir / f"app_{day}.{sequence:03d}.log")
+
+    def _start_maintenance(self, close_stale=False):
+        threading.Thread(target=self._maintain, args=(close_stale,), name="log-maintenance", daemon=True).start()
+
+    def _maintain(self, close_stale=False):
+        # One pass at a time; a rollover during a pass is picked up by the next one
+        with self._maintenance_lock:
+            lock_fd = None
+            try:
+                if fcntl:
+                    # One pass across all processes too; whoever holds the lock covers every segment
+                    lock_fd = os.open(self.logs_dir / ".maintenance.lock", os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return
+                if close_stale:
+                    self.acquire()
+                    try:
+                        self._flock(LOCK_EX)
+                        for path in list_segments(self.logs_dir):
+                            day, sequence, _ = parse_segment_name(path.name)
+                            if sequence is None and day < self.day:
+                                self._close_segment(path)
+                    finally:
+                        self._flock(LOCK_UN)
+                        self.release()
+                for path in list_segments(self.logs_dir):
+                    day, sequence, compression = parse_segment_name(path.name)
+                    if sequence is not None and compression == "none" and load_index(path) is None:
+                        compress_segment(path, self.compression, self.block_bytes)
+                apply_retention(self.logs_dir, self.retention_days, self.max_total_bytes)
+            except Exception as e:
+                # Report through stderr: logging from the handler that failed could recurse
+                print(f"Log maintenance failed: {e}", file=sys.stderr)
+            finally:
+                if lock_fd is not None:
+                    os.close(lock_fd)
@@ -1,32 +1,190 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from datetime import datetime
+from utils.log_segments import SegmentedFileHandler
+from utils.tracing import RequestIdFilter, current_request_id
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s%(request_tag)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the same timestamp format as the text logs"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": self.formatTime(record),
+            "name": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["message"] += "\n" + record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site for records below WARNING.
+
+    A line that logs faster than `per_second` (after an initial `burst`) is dropped, and the next
+    line from the same call site that gets through says how many were suppressed.
+    """
+
+    def __init__(self, per_second, burst):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) * self.per_second)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class LogBuffer(logging.Handler):
+    """Bounded in-memory buffer of recent records, numbered by sequence, for live log views"""
+
+    def __init__(self, capacity=5000):
+        super().__init__()
+        self._records = deque(maxlen=capacity)
+        self._sequence = 0
+        self._records_lock = threading.Lock()
+        self._time_formatter = logging.Formatter()
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            if record.exc_info:
+                message += "\n" + self._time_formatter.formatException(record.exc_info)
+            entry = {
+                "timestamp": self._time_formatter.formatTime(record),
+                "name": record.name,
+                "level": record.levelname,
+                "message": message,
+                "request_id": current_request_id()
+            }
+        except Exception:
+            self.handleError(record)
+            return
+        with self._records_lock:
+            self._sequence += 1
+            entry["seq"] = self._sequence
+            self._records.append(entry)
+
+    @property
+    def last_sequence(self):
+        return self._sequence
+
+    def since(self, sequence=0, level=None, search=None, limit=None):
+        """Return (latest sequence, records newer than sequence oldest first, optionally filtered).
+
+        Poll again with the returned sequence to get only what arrived in between.
+        """
+        with self._records_lock:
+            latest = self._sequence
+            if not self._records or sequence >= latest:
+                return latest, []
+            # Sequence numbers are consecutive, so the first newer record is found by position
+            start = max(sequence - self._records[0]["seq"] + 1, 0)
+            records = list(islice(self._records, start, None))
+        if level:
+            records = [record for record in records if record["level"] == level]
+        if search:
+            needle = search.lower()
+            records = [record for record in records if needle in record["message"].lower()]
+        return latest, records[-limit:] if limit else records
+
+
+def _env_number(name, default):
+    # utils.config logs through this module, so the logger reads its own settings
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
 
 def setup_logger():
     """Configure logging for the application"""
     # Get project root directory
     project_root = Path(__file__).parent.parent
     logs_dir = project_root / "logs"
-    logs_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create a timestamp for the log file
-    timestamp = datetime.now().strftime("%Y%m%d")
-    log_file = logs_dir / f"app_{timestamp}.log"
-    
+
+    # Daily segments (app_YYYYMMDD.log), rotated by size and compressed once closed
+    file_handler = SegmentedFileHandler(
+        logs_dir,
+        max_bytes=int(_env_number("LOG_MAX_BYTES", 50 * 1024 * 1024)),
+        compression=os.environ.get("LOG_COMPRESSION", "gzip").lower(),
+        block_bytes=int(_env_number("LOG_BLOCK_BYTES", 1024 * 1024)),
+        retention_days=_env_number("LOG_RETENTION_DAYS", 30),
+        max_total_bytes=int(_env_number("LOG_MAX_TOTAL_MB", 1024) * 1024 * 1024)
+    )
+
+    # Plain text by default; LOG_FORMAT=json writes JSON lines to the file instead
+    formatter = logging.Formatter(TEXT_FORMAT)
+    file_handler.setFormatter(JsonFormatter() if os.environ.get("LOG_FORMAT", "text").lower() == "json" else formatter)
+    console_handler = logging.StreamHandler()  # Also log to console
+    console_handler.setFormatter(formatter)
+    output_handlers = [file_handler, console_handler]
+
+    rate = _env_number("LOG_RATE_LIMIT_PER_SECOND", 20)
+    burst = _env_number("LOG_RATE_LIMIT_BURST", 100)
+
+    if os.environ.get("LOG_ASYNC", "1").strip().lower() in ("0", "false", "no", "off"):
+        handlers = output_handlers
+    else:
+        # Records are queued and written by a background thread, so disk and console I/O
+        # never run on the request path
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *output_handlers, respect_handler_level=True)
+        listener.start()
+        # Write out whatever is still queued when the process exits
+        atexit.register(listener.stop)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # Only the message is rendered before queueing; the output handlers apply the real format
+        queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        handlers = [queue_handler]
+    # Filters run in the calling thread before anything is queued: the request ID lives in its
+    # context, and rate-limited records are dropped before they cost any formatting
+    for handler in handlers:
+        handler.addFilter(RequestIdFilter())
+        if rate > 0:
+            handler.addFilter(RateLimitFilter(rate, burst))
+
     # Configure logging
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()  # Also log to console
-        ]
+        handlers=handlers
     )
-    
-    # Create logger
+
+    # Create logger; recent application records are also kept in memory for the live tail
     logger = logging.getLogger('doc_upload')
+    logger.addHandler(log_buffer)
     return logger
 
-# Create a singleton logger instance
-logger = setup_logger() 
\ No newline at end of file
+# Create a singleton log buffer and logger instance
+log_buffer = LogBuffer(capacity=int(_env_number("LOG_BUFFER_SIZE", 5000)))
+logger = setup_logger()
@@ -0,0 +1,313 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from utils.config import env_int, env_float
+from utils.logger import logger
+from utils.tracing import span
+
+# Latency bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames, labels):
+    """Order label values by the metric's declared label names"""
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def values(self):
+        """Return {label values: value} for every label set seen"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, (), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down per label set"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram per label set, in the Prometheus layout"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """Return {label values: {counts, sum, count}} copies"""
+        with self._lock:
+            return {key: {"counts": list(series["counts"]), "sum": series["sum"], "count": series["count"]}
+                    for key, series in self._series.items()}
+
+    def quantile(self, q, series):
+        """Estimate a quantile from bucket counts by linear interpolation within the bucket"""
+        if not series["count"]:
+            return None
+        rank = q * series["count"]
+        cumulative, lower = 0, 0.0
+        for upper, count in zip(self.buckets + (float("inf"),), series["counts"]):
+            if cumulative + count >= rank:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * ((rank - cumulative) / count if count else 0.0)
+            cumulative += count
+            lower = upper
+        return lower
+
+    def summary(self):
+        """Return one row per label set with count, mean and estimated p50/p95/p99"""
+        rows = []
+        for key, series in sorted(self.snapshot().items()):
+            row = dict(zip(self.labelnames, key))
+            row.update({
+                "count": series["count"],
+                "mean": series["sum"] / series["count"] if series["count"] else None,
+                "p50": self.quantile(0.50, series),
+                "p95": self.quantile(0.95, series),
+                "p99": self.quantile(0.99, series)
+            })
+            rows.append(row)
+        return rows
+
+    def samples(self):
+        samples = []
+        for key, series in self.snapshot().items():
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", self.labelnames, key, (("le", _format_value(upper)),), cumulative))
+            samples.append((f"{self.name}_sum", self.labelnames, key, (), series["sum"]))
+            samples.append((f"{self.name}_count", self.labelnames, key, (), series["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics with Prometheus text export"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._http_server = None
+        self._snapshot_thread = None
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path):
+        """Atomically write the Prometheus text snapshot to a file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(path.suffix + ".tmp")
+        temp_path.write_text(self.render_prometheus(), encoding="utf-8")
+        os.replace(temp_path, path)
+        return path
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serve the snapshot at http://host:port/metrics from a daemon thread (once per process)"""
+        with self._lock:
+            if self._http_server is not None:
+                return self._http_server
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/metrics", "/"):
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            server = ThreadingHTTPServer((host, port), Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            self._http_server = server
+        logger.info(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    def start_snapshot_writer(self, path, interval_seconds=15.0):
+        """Rewrite the snapshot file periodically from a daemon thread (once per process)"""
+        with self._lock:
+            if self._snapshot_thread is not None:
+                return
+            def run():
+                while True:
+                    try:
+                        self.write_snapshot(path)
+                    except Exception as e:
+                        logger.error(f"Error writing metrics snapshot: {e}")
+                    time.sleep(interval_seconds)
+            self._snapshot_thread = threading.Thread(target=run, name="metrics-snapshot", daemon=True)
+            self._snapshot_thread.start()
+        logger.info(f"Writing metrics snapshots to {path} every {interval_seconds:g}s")
+
+    def start_exporters_from_env(self):
+        """Start the exporters configured by METRICS_HTTP_PORT and METRICS_SNAPSHOT_FILE"""
+        try:
+            port = env_int("METRICS_HTTP_PORT", 0)
+            if port:
+                self.start_http_server(port, os.environ.get("METRICS_HTTP_HOST", "127.0.0.1"))
+            snapshot_file = os.environ.get("METRICS_SNAPSHOT_FILE")
+            if snapshot_file:
+                self.start_snapshot_writer(snapshot_file, env_float("METRICS_SNAPSHOT_INTERVAL_SECONDS", 15.0))
+        except Exception as e:
+            # Metrics export is diagnostics; never break a page because of it
+            logger.error(f"Error starting metrics exporters: {e}")
+
+# Create a singleton instance
+metrics = MetricsRegistry()
+
+# Application metrics recorded by the hot paths
+STAGE_SECONDS = metrics.histogram(
+    "searchdb_stage_seconds", "Wall time of pipeline stages (extract, chunk, embed, store, search)", ("stage",)
+)
+STAGE_ERRORS = metrics.counter("searchdb_stage_errors_total", "Pipeline stage failures", ("stage",))
+MONGO_SECONDS = metrics.histogram(
+    "searchdb_mongo_operation_seconds", "MongoDB round-trip time by operation", ("operation",)
+)
+OPENAI_SECONDS = metrics.histogram(
+    "searchdb_openai_request_seconds", "Embeddings API request time", ("status",)
+)
+EMBEDDED_TEXTS = metrics.counter("searchdb_embedded_texts_total", "Texts sent to the embeddings API")
+CACHE_LOOKUPS = metrics.counter("searchdb_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+CHUNKS_CREATED = metrics.counter("searchdb_chunks_created_total", "Chunks produced by the document processor")
+BYTES_EXTRACTED = metrics.counter("searchdb_extracted_bytes_total", "Size of files passed to text extraction")
+INFLIGHT = metrics.gauge("searchdb_inflight_operations", "Operations currently running", ("stage",))
+EMBED_BATCH_SIZE = metrics.histogram(
+    "searchdb_embed_batch_size", "Queries sent per micro-batched embeddings request", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+EMBED_BATCH_WAIT_SECONDS = metrics.histogram(
+    "searchdb_embed_batch_wait_seconds", "Time a query waited in the micro-batch queue", ("batcher",),
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+@contextmanager
+def track_stage(stage):
+    """Time a pipeline stage, count it as in flight and count its failures; inside a request
+    trace the stage is also recorded as a span"""
+    INFLIGHT.inc(stage=stage)
+    started = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        INFLIGHT.dec(stage=stage)
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
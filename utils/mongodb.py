@@ -1,10 +1,288 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
-from pymongo.operations import SearchIndexModel
 import streamlit as st
 from utils.logger import logger
+from utils.config import env_int, env_float
+from utils.cache import LRUCache
+from utils.lexical_index import lexical_index
+from utils.text_store import text_store
+from utils.openai_client import EMBEDDING_MODEL
+from utils.metrics import track_stage, MONGO_SECONDS, CACHE_LOOKUPS
+from utils.tracing import span
+from contextlib import contextmanager
+from bson import ObjectId
+from array import array
+import atexit
+import hashlib
 import os
+import re
+import threading
 import time
+from datetime import datetime
+
+VECTOR_INDEX_NAME = "vector-search-index"
+
+# Each corpus version keeps its chunks in its own document field with its own vector index, so a
+# migration can fill a new field while searches keep reading the active one. The active version
+# lives in one document of the meta collection; without it the original layout below is used.
+ACTIVE_VERSION_ID = "active_version"
+# Counts document writes from every process, so each can tell its cached results are stale
+CORPUS_WRITES_ID = "corpus_writes"
+DEFAULT_CORPUS_VERSION = {
+    "version": "v1",
+    "field": "chunks",
+    "index_name": VECTOR_INDEX_NAME,
+    "model": EMBEDDING_MODEL,
+    "dimensions": None,  # Requested output size; None keeps the model's own
+    "num_dimensions": 1536,
+    "chunk_size": 1000,
+    "chunk_overlap": 200
+}
+
+def vector_index_definition(version):
+    """Atlas vector search index definition for a corpus version's chunk field"""
+    return {
+        "fields": [
+            {
+                "type": "vector",
+                "numDimensions": version["num_dimensions"],
+                "path": f"{version['field']}.embedding",
+                "similarity": "cosine"
+            },
+            # Metadata fields that $vectorSearch can prefilter on
+            {"type": "filter", "path": "file_type"},
+            {"type": "filter", "path": "created_at"}
+        ]
+    }
+
+VECTOR_INDEX_DEFINITION = vector_index_definition(DEFAULT_CORPUS_VERSION)
+
+def file_type_for(filename):
+    """Derive the stored file type (lowercase extension) from a filename"""
+    return filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else "unknown"
+
+def build_filter_match(filters):
+    """Translate search filters into a MongoDB query on document metadata"""
+    match = {}
+    if not filters:
+        return match
+    if filters.get("file_types"):
+        match["file_type"] = {"$in": [file_type.lower() for file_type in filters["file_types"]]}
+    created_range = {}
+    if filters.get("created_after"):
+        created_range["$gte"] = filters["created_after"]
+    if filters.get("created_before"):
+        created_range["$lt"] = filters["created_before"]
+    if created_range:
+        match["created_at"] = created_range
+    if filters.get("filename_prefix"):
+        # Anchored, case-sensitive prefix regexes can use the filename index
+        match["filename"] = {"$regex": f"^{re.escape(filters['filename_prefix'])}"}
+    return match
+
+def build_vector_search_filter(filters):
+    """Translate the filters $vectorSearch supports into its pre-filter syntax"""
+    match = build_filter_match(filters)
+    # $vectorSearch filters cannot express string prefixes; that part runs as a post-filter
+    match.pop("filename", None)
+    return match
+
+@contextmanager
+def _round_trip(operation):
+    """Time a MongoDB round trip in the metrics and the current request trace"""
+    with span(f"mongo.{operation}"), MONGO_SECONDS.time(operation=operation):
+        yield
+
+class MongoClientRegistry:
+    """Process-wide registry holding one pooled MongoClient per connection string"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._bootstrap_locks = {}
+        self._bootstrapped = set()
+
+    def get_client(self, uri):
+        """Return the shared client for a URI, creating and verifying it on first use"""
+        with self._lock:
+            client = self._clients.get(uri)
+            if client is not None:
+                return client
+
+            # The driver is imported on first connect so pages that never query load faster
+            from pymongo import MongoClient
+            client = MongoClient(
+                uri,
+                maxPoolSize=env_int("MONGODB_MAX_POOL_SIZE", 100),
+                minPoolSize=env_int("MONGODB_MIN_POOL_SIZE", 0),
+                maxIdleTimeMS=env_int("MONGODB_MAX_IDLE_TIME_MS", 300000),
+                serverSelectionTimeoutMS=env_int("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 10000),
+                appname="searchdb"
+            )
+            try:
+                # Verify once on creation; afterwards the driver's server monitoring tracks health
+                client.admin.command('ping')
+            except Exception:
+                client.close()
+                raise
+            self._clients[uri] = client
+            self._bootstrap_locks[uri] = threading.Lock()
+            logger.info("Created pooled MongoDB client")
+            return client
+
+    def bootstrap_once(self, uri, initializer):
+        """Run schema bootstrap for a URI once per process"""
+        with self._lock:
+            if uri in self._bootstrapped:
+                return
+            bootstrap_lock = self._bootstrap_locks[uri]
+        with bootstrap_lock:
+            if uri in self._bootstrapped:
+                return
+            initializer()
+            with self._lock:
+                self._bootstrapped.add(uri)
+
+    def is_bootstrapped(self, uri):
+        """Check whether schema bootstrap has completed for a URI"""
+        with self._lock:
+            return uri in self._bootstrapped
+
+    def close(self, uri):
+        """Close and forget the client for a URI"""
+        with self._lock:
+            client = self._clients.pop(uri, None)
+            self._bootstrap_locks.pop(uri, None)
+            self._bootstrapped.discard(uri)
+        if client is not None:
+            client.close()
+
+    def close_all(self):
+        """Close every registered client"""
+        with self._lock:
+            uris = list(self._clients)
+        for uri in uris:
+            self.close(uri)
+
+# Process-wide client registry shared by all sessions; clients live until the process exits
+client_registry = MongoClientRegistry()
+atexit.register(client_registry.close_all)
+
+class SearchIndexBuilder:
+    """Create an Atlas search index in the background and track when it becomes queryable"""
+
+    def __init__(self, collection, name, definition, index_type="vectorSearch"):
+        self.collection = collection
+        self.name = name
+        self.definition = definition
+        self.index_type = index_type
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = {
+            "status": "pending",
+            "message": "Index build has not started",
+            "atlas_status": None,
+            "started_at": None,
+            "updated_at": datetime.utcnow()
+        }
+
+    def _update(self, status, message, atlas_status=None):
+        with self._lock:
+            self._state.update({
+                "status": status,
+                "message": message,
+                "atlas_status": atlas_status,
+                "updated_at": datetime.utcnow()
+            })
+
+    def start(self):
+        """Start the build in a daemon thread; returns immediately"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._state["started_at"] = datetime.utcnow()
+            self._thread = threading.Thread(target=self._run, name=f"search-index-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _needs_update(self, index):
+        """Check whether an existing index's fields differ from the wanted definition"""
+        current = index.get("latestDefinition", {}).get("fields", [])
+        wanted = self.definition.get("fields", [])
+        as_keys = lambda fields: sorted((field.get("type"), field.get("path")) for field in fields)
+        return as_keys(current) != as_keys(wanted)
+
+    def _find_index(self):
+        indices = list(self.collection.list_search_indexes(self.name))
+        return indices[0] if indices else None
+
+    def _run(self):
+        from pymongo.errors import OperationFailure
+        from pymongo.operations import SearchIndexModel
+        try:
+            self._update("checking", "Checking for an existing search index")
+            index = self._find_index()
+            if index is None:
+                search_index_model = SearchIndexModel(
+                    definition=self.definition,
+                    name=self.name,
+                    type=self.index_type
+                )
+                try:
+                    result = self.collection.create_search_index(model=search_index_model)
+                    logger.info(f"New search index named {result} is building.")
+                except OperationFailure as e:
+                    # Another process may have created it between our check and create
+                    if "IndexAlreadyExists" not in str(e) and "already exists" not in str(e):
+                        raise
+                    logger.info("Vector search index already exists")
+            elif self._needs_update(index):
+                # Existing index predates a definition change (e.g. new filter fields)
+                self.collection.update_search_index(self.name, self.definition)
+                logger.info(f"Updating search index {self.name} to the current definition")
+
+            poll_interval = env_int("MONGODB_INDEX_POLL_SECONDS", 5)
+            deadline = time.monotonic() + env_int("MONGODB_INDEX_BUILD_TIMEOUT_SECONDS", 1800)
+            while True:
+                index = self._find_index()
+                atlas_status = index.get("status") if index else None
+                if index and index.get("queryable") is True:
+                    self._update("ready", "Search index is ready for querying", atlas_status)
+                    logger.info(f"{self.name} is ready for querying.")
+                    return
+                if atlas_status == "FAILED":
+                    self._update("failed", "Atlas reported the index build as failed", atlas_status)
+                    logger.error(f"Search index {self.name} failed to build")
+                    return
+                if time.monotonic() > deadline:
+                    self._update("failed", "Timed out waiting for the index to become queryable", atlas_status)
+                    logger.error(f"Timed out waiting for search index {self.name}")
+                    return
+                self._update("building", f"Index is building ({atlas_status or 'PENDING'})", atlas_status)
+                time.sleep(poll_interval)
+        except OperationFailure as e:
+            # Plain mongod deployments have no Atlas Search; exact search still works
+            self._update("unsupported", f"Atlas Search is not available on this deployment: {e}")
+            logger.warning(f"Atlas Search unavailable, using exact search fallback: {e}")
+        except Exception as e:
+            self._update("failed", f"Error building search index: {e}")
+            logger.error(f"Error building search index {self.name}: {e}")
+
+    def is_ready(self):
+        """Check whether the index can serve queries"""
+        with self._lock:
+            return self._state["status"] == "ready"
+
+    def get_status(self):
+        """Return a copy of the build state"""
+        with self._lock:
+            return dict(self._state)
+
+def _estimate_results_size(results):
+    """Approximate the memory held by a cached search result list"""
+    size = 0
+    for result in results:
+        size += 256  # Per-result dict, ObjectId and datetime overhead
+        for field in ("filename", "content", "best_chunk"):
+            size += len(result.get(field) or "")
+    return size
 
 class MongoDB:
     _instance = None
@@ -13,45 +291,70 @@ class MongoDB:
         if cls._instance is None:
             cls._instance = super(MongoDB, cls).__new__(cls)
             cls._instance.client = None
+            cls._instance.uri = None
             cls._instance.db = None
             cls._instance.collection = None
             cls._instance.db_name = "searchDb"
             cls._instance.collection_name = "documents"
+            cls._instance.meta_collection_name = "corpus_meta"
+            cls._instance.meta = None
+            # Search index builders by (uri, index name)
+            cls._instance.index_builders = {}
+            cls._instance._builders_lock = threading.Lock()
+            # Last known active corpus version and when it was read from the database
+            cls._instance._active_version = dict(DEFAULT_CORPUS_VERSION)
+            cls._instance._active_checked = None
+            # Bumped on every local write and version switch, and paired with the shared write count
+            # last read from the meta collection, so cached search results never outlive a corpus change
+            cls._instance.corpus_version = 0
+            cls._instance.corpus_writes = 0
+            cls._instance._version_lock = threading.Lock()
+            cls._instance.result_cache = LRUCache(
+                max_entries=env_int("RESULT_CACHE_MAX_ENTRIES", 512),
+                max_bytes=env_int("RESULT_CACHE_MAX_MB", 64) * 1024 * 1024,
+                sizer=_estimate_results_size
+            )
         return cls._instance
 
     def is_connected(self):
         """Check if we have a valid MongoDB connection"""
         try:
             if self.client:
-                # Test the connection
-                self.client.admin.command('ping')
-                return True
+                # Use the driver's monitored topology instead of a ping round trip
+                return self.client.topology_description.has_readable_server()
             return False
         except Exception:
             return False
 
-    def connect(self):
+    def connect(self, uri=None):
         """Connect or reconnect to MongoDB with current credentials"""
-        if not st.session_state.get('mongodb_uri'):
+        # An explicit URI lets scripts and benchmarks connect outside a Streamlit session
+        uri = uri or st.session_state.get('mongodb_uri')
+        if not uri:
             logger.error("MongoDB connection string not found in session state")
+            from pymongo.errors import ConnectionFailure
             raise ConnectionFailure("MongoDB connection string not found. Please configure it in the Settings page.")
             
         try:
-            if self.client:
-                self.close()
-                
             # Clean up the connection string and ensure proper database
-            mongodb_uri = st.session_state.mongodb_uri.strip()
-            
-            # Connect to MongoDB
-            self.client = MongoClient(mongodb_uri)
-            
-            # Test the connection
-            self.client.admin.command('ping')
-            
-            # Initialize database and collections
-            self._initialize_database()
-            
+            mongodb_uri = uri.strip()
+
+            # Already attached to the pooled client for these credentials
+            if (self.client is not None and self.uri == mongodb_uri
+                    and client_registry.is_bootstrapped(mongodb_uri)):
+                return
+
+            # Attach to the process-wide pooled client
+            self.client = client_registry.get_client(mongodb_uri)
+            self.uri = mongodb_uri
+            self.db = self.client[self.db_name]
+            self.collection = self.db[self.collection_name]
+            self.meta = self.db[self.meta_collection_name]
+            self._active_checked = None
+
+            # Initialize database and collections once per process
+            client_registry.bootstrap_once(mongodb_uri, self._initialize_database)
+
             logger.info("Successfully connected to MongoDB")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
@@ -67,59 +370,217 @@ class MongoDB:
             # Create date-based index for efficient querying
             self.collection.create_index([("created_at", 1)])
             
-            # Check if vector search index already exists
-            existing_indexes = list(self.collection.list_search_indexes())
-            index_exists = any(idx.get("name") == "vector-search-index" for idx in existing_indexes)
+            # Metadata indexes so filtered searches narrow the scan instead of widening it
+            self.collection.create_index([("file_type", 1), ("created_at", 1)])
+            self.collection.create_index([("filename", 1)])
             
-            if not index_exists:
-                # Create vector search index using the exact working template
-                search_index_model = SearchIndexModel(
-                    definition={
-                        "fields": [{
-                            "type": "vector",
-                            "numDimensions": 1536,
-                            "path": "chunks.embedding",
-                            "similarity": "cosine"
-                        }]
-                    },
-                    name="vector-search-index",
-                    type="vectorSearch"
+            # Build the active version's vector search index in the background; searches use
+            # exact scoring until it is queryable
+            self.meta = self.db[self.meta_collection_name]
+            version = self.active_version(refresh=True)
+            self.ensure_search_index(version)
+
+            # Bring the local keyword index in line with the collection in the background; the
+            # field is resolved here so the thread never has to reach back into the connection
+            threading.Thread(
+                target=self._sync_lexical_index,
+                args=(self.collection, version["field"]),
+                name="lexical-index-sync",
+                daemon=True
+            ).start()
+
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+            raise
+
+    def _backfill_metadata(self, collection):
+        """Add filterable metadata to documents stored before it was recorded"""
+        from pymongo.operations import UpdateOne
+        try:
+            updates = [
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"file_type": file_type_for(doc.get("filename"))}})
+                for doc in collection.find({"file_type": {"$exists": False}}, {"filename": 1})
+            ]
+            if updates:
+                collection.bulk_write(updates, ordered=False)
+                logger.info(f"Backfilled file_type on {len(updates)} documents")
+        except Exception as e:
+            logger.error(f"Error backfilling document metadata: {e}")
+
+    def _sync_lexical_index(self, collection, field="chunks"):
+        """Index documents missing from the keyword index and drop ones no longer stored"""
+        try:
+            self._backfill_metadata(collection)
+            # Read the keyword index first: uploads are stored before they are indexed, so every
+            # indexed ID is already in MongoDB when it is read, unless it has really been deleted
+            indexed_ids = lexical_index.document_ids()
+            stored_ids = {str(doc["_id"]) for doc in collection.find({}, {"_id": 1})}
+            for doc_id in indexed_ids - stored_ids:
+                lexical_index.remove_document(doc_id)
+            missing = [ObjectId(doc_id) for doc_id in stored_ids - indexed_ids]
+            projection = {"filename": 1, "file_type": 1, "created_at": 1, f"{field}.text": 1}
+            for doc in collection.find({"_id": {"$in": missing}}, projection):
+                self._index_document_text(doc, field)
+            if missing or indexed_ids - stored_ids:
+                logger.info(
+                    f"Keyword index synced: {len(missing)} added, {len(indexed_ids - stored_ids)} removed"
                 )
-                
-                result = self.collection.create_search_index(model=search_index_model)
-                logger.info(f"New search index named {result} is building.")
-                
-                # Wait for initial sync to complete
-                logger.info("Polling to check if the index is ready. This may take up to a minute.")
-                predicate = lambda index: index.get("queryable") is True
-                
-                while True:
-                    indices = list(self.collection.list_search_indexes(result))
-                    if len(indices) and predicate(indices[0]):
-                        break
-                    time.sleep(5)
-                logger.info(f"{result} is ready for querying.")
-            else:
-                logger.info("Vector search index already exists")
-            
         except Exception as e:
-            if "IndexAlreadyExists" in str(e):
-                logger.info("Vector search index already exists")
-            else:
-                logger.error(f"Error initializing database: {e}")
-                raise
+            logger.error(f"Error syncing keyword index: {e}")
+
+    def _index_document_text(self, document, field="chunks"):
+        """Add a stored document's chunk text to the keyword index"""
+        try:
+            created_at = document.get("created_at")
+            lexical_index.add_document(
+                document["_id"],
+                document.get("filename"),
+                [chunk.get("text", "") for chunk in document.get(field, [])],
+                created_at if not isinstance(created_at, str) else None,
+                file_type=document.get("file_type") or file_type_for(document.get("filename"))
+            )
+        except Exception as e:
+            # Keyword search is an accelerator; never fail a write because of it
+            logger.error(f"Error updating keyword index for document {document.get('_id')}: {e}")
+
+    def active_version(self, refresh=False):
+        """The corpus version searches and uploads use.
+
+        Re-read from the meta collection every CORPUS_VERSION_REFRESH_SECONDS together with the
+        shared write count, so a switch made by a migration, or an upload or delete made by another
+        process, reaches this one's caches within that time.
+        """
+        if self.meta is None:
+            self.ensure_connection()
+        now = time.monotonic()
+        if (refresh or self._active_checked is None
+                or now - self._active_checked >= env_float("CORPUS_VERSION_REFRESH_SECONDS", 10)):
+            try:
+                with _round_trip("active_version"):
+                    stored = {doc.pop("_id"): doc for doc in
+                              self.meta.find({"_id": {"$in": [ACTIVE_VERSION_ID, CORPUS_WRITES_ID]}})}
+                self._set_active_version(dict(DEFAULT_CORPUS_VERSION, **stored.get(ACTIVE_VERSION_ID, {})))
+                self._set_corpus_writes(stored.get(CORPUS_WRITES_ID, {}).get("count", 0))
+                self._active_checked = now
+            except Exception as e:
+                # Keep serving the last known version rather than failing the request
+                logger.error(f"Error reading the active corpus version: {e}")
+        return self._active_version
+
+    def _set_active_version(self, version):
+        with self._version_lock:
+            previous = self._active_version
+            if version == previous:
+                return
+            self._active_version = version
+            # Results cached for the previous version must not be served for the new one
+            self.corpus_version += 1
+        if version["version"] != previous["version"]:
+            logger.info(f"Active corpus version is now {version['version']} (field {version['field']})")
+            if self.collection is not None:
+                self.ensure_search_index(version)
+
+    def switch_corpus_version(self, version):
+        """Make a version the one every process searches and uploads with.
+
+        The switch is a single document write, so each process sees either the old version or the
+        new one, never a mix.
+        """
+        self.ensure_connection()
+        record = {key: value for key, value in version.items() if key not in ("_id", "activated_at")}
+        record["activated_at"] = datetime.utcnow()
+        with _round_trip("switch_version"):
+            self.meta.replace_one({"_id": ACTIVE_VERSION_ID}, record, upsert=True)
+        logger.info(f"Switched corpus version to {version['version']}")
+        return self.active_version(refresh=True)
+
+    def ensure_search_index(self, version):
+        """Start building a version's vector search index in the background if not already tracked"""
+        key = (self.uri, version["index_name"])
+        with self._builders_lock:
+            builder = self.index_builders.get(key)
+            if builder is not None:
+                return builder
+            builder = SearchIndexBuilder(self.collection, version["index_name"], vector_index_definition(version))
+            self.index_builders[key] = builder
+        builder.start()
+        return builder
+
+    def drop_search_index(self, index_name):
+        """Drop a vector search index that no version uses any more"""
+        from pymongo.errors import OperationFailure
+        collection = self.ensure_connection()
+        with self._builders_lock:
+            self.index_builders.pop((self.uri, index_name), None)
+        try:
+            collection.drop_search_index(index_name)
+            logger.info(f"Dropped search index {index_name}")
+        except OperationFailure as e:
+            # Deployments without Atlas Search have no index to drop
+            logger.warning(f"Could not drop search index {index_name}: {e}")
+
+    def reindex_keyword_text(self, version):
+        """Rebuild the keyword index from a version's chunks, e.g. after a migration re-chunked them"""
+        collection = self.ensure_connection()
+        field = version["field"]
+        projection = {"filename": 1, "file_type": 1, "created_at": 1, f"{field}.text": 1}
+        count = 0
+        for doc in collection.find({field: {"$exists": True}}, projection):
+            self._index_document_text(doc, field)
+            count += 1
+        logger.info(f"Re-indexed keyword text of {count} documents from {field}")
+        return count
+
+    def get_migration_status(self):
+        """Progress record of the most recent corpus migration, or None"""
+        self.ensure_connection()
+        with _round_trip("migration_status"):
+            return self.meta.find_one({"_id": {"$regex": "^migration:"}}, sort=[("updated_at", -1)])
+
+    def get_search_index_status(self, index_name=None):
+        """Return the vector search index build state for the current connection"""
+        builder = self.index_builders.get((self.uri, index_name or self._active_version["index_name"]))
+        if builder is None:
+            return {
+                "status": "pending",
+                "message": "Not connected",
+                "atlas_status": None,
+                "started_at": None,
+                "updated_at": None
+            }
+        return builder.get_status()
+
+    def is_search_index_ready(self, index_name=None):
+        """Check whether vector search can use the Atlas index"""
+        builder = self.index_builders.get((self.uri, index_name or self._active_version["index_name"]))
+        return builder is not None and builder.is_ready()
 
     def ensure_connection(self):
         """Ensure we have a valid connection before operations"""
-        if not self.is_connected():
+        # No ping here: the pooled client reconnects and selects servers on its own
+        current_uri = (st.session_state.get('mongodb_uri') or '').strip()
+        if (self.collection is None or not client_registry.is_bootstrapped(self.uri)
+                or (current_uri and current_uri != self.uri)):
             self.connect()
         return self.collection
 
-    def store_document(self, document_data):
-        """Store a document with its vector embeddings"""
+    def store_document(self, document_data, version=None):
+        """Store a document with its vector embeddings.
+
+        Chunks are passed as "chunks" and stored in the field of the corpus version they were
+        made with (the active one unless given).
+        """
         try:
             collection = self.ensure_connection()
-            result = collection.insert_one(document_data)
+            version = version or self.active_version()
+            if version["field"] != "chunks" and "chunks" in document_data:
+                document_data[version["field"]] = document_data.pop("chunks")
+            document_data.setdefault("file_type", file_type_for(document_data.get("filename")))
+            with track_stage("store"):
+                with _round_trip("insert"):
+                    result = collection.insert_one(document_data)
+                self._bump_corpus_version()
+                self._index_document_text(document_data, version["field"])
             logger.info(f"Successfully stored document with ID: {result.inserted_id}")
             return result
         except Exception as e:
@@ -135,11 +596,12 @@ class MongoDB:
             
             # Convert cursor to list and ensure created_at is properly formatted
             documents = []
-            for doc in cursor:
-                # Handle documents that might not have created_at
-                if 'created_at' not in doc:
-                    doc['created_at'] = 'Unknown date'
-                documents.append(doc)
+            with _round_trip("find"):
+                for doc in cursor:
+                    # Handle documents that might not have created_at
+                    if 'created_at' not in doc:
+                        doc['created_at'] = 'Unknown date'
+                    documents.append(doc)
             
             logger.info(f"Retrieved {len(documents)} documents from MongoDB")
             return documents
@@ -156,14 +618,23 @@ class MongoDB:
             return False
 
     def close(self):
-        """Close the MongoDB connection"""
+        """Detach from the MongoDB connection.
+
+        The pooled client is shared by every session and thread in the process, so it stays open
+        for their in-flight requests; its idle connections are closed by the pool after
+        MONGODB_MAX_IDLE_TIME_MS, and the client itself at process exit.
+        """
         try:
             if self.client:
-                self.client.close()
+                with self._builders_lock:
+                    for key in [key for key in self.index_builders if key[0] == self.uri]:
+                        self.index_builders.pop(key)
                 self.client = None
+                self.uri = None
                 self.db = None
                 self.collection = None
-                logger.info("MongoDB connection closed")
+                self.meta = None
+                logger.info("Detached from MongoDB")
         except Exception as e:
             logger.error(f"Error closing MongoDB connection: {e}")
 
@@ -171,8 +642,15 @@ class MongoDB:
         """Delete a document by its ID"""
         try:
             collection = self.ensure_connection()
-            result = collection.delete_one({"_id": document_id})
-            if result.deleted_count:
+            with _round_trip("delete"):
+                deleted = collection.find_one_and_delete({"_id": document_id}, {"content_hash": 1})
+            if deleted is not None:
+                self._bump_corpus_version()
+                try:
+                    lexical_index.remove_document(document_id)
+                except Exception as e:
+                    logger.error(f"Error removing document {document_id} from keyword index: {e}")
+                self._release_extracted_text(collection, deleted.get("content_hash"))
                 logger.info(f"Successfully deleted document with ID: {document_id}")
                 return True
             else:
@@ -182,81 +660,199 @@ class MongoDB:
             logger.error(f"Error deleting document: {e}")
             raise
 
-    def search_documents(self, query_embedding, limit=5):
-        """Search documents using vector similarity"""
+    def _release_extracted_text(self, collection, content_hash):
+        """Delete a file's stored text once no remaining document was uploaded from the same file"""
+        if not content_hash:
+            return
         try:
-            collection = self.ensure_connection()
+            with _round_trip("count"):
+                still_used = collection.count_documents({"content_hash": content_hash}, limit=1)
+            if not still_used:
+                text_store.delete(content_hash)
+        except Exception as e:
+            # A leftover entry only costs disk space
+            logger.error(f"Error removing extracted text {content_hash[:12]}: {e}")
+
+    def _bump_corpus_version(self):
+        """Invalidate cached search results after a corpus change, in this process at once and in
+        the others at their next active version refresh"""
+        from pymongo import ReturnDocument
+        with self._version_lock:
+            self.corpus_version += 1
+        try:
+            with _round_trip("count_write"):
+                writes = self.meta.find_one_and_update(
+                    {"_id": CORPUS_WRITES_ID}, {"$inc": {"count": 1}},
+                    upsert=True, return_document=ReturnDocument.AFTER
+                )
+            self._set_corpus_writes(writes["count"])
+        except Exception as e:
+            # Other processes keep serving their cached results until the next counted write
+            logger.error(f"Error counting corpus write: {e}")
+
+    def _set_corpus_writes(self, count):
+        with self._version_lock:
+            self.corpus_writes = max(self.corpus_writes, count)
+
+    def corpus_generation(self):
+        """Changes whenever the corpus may have changed, in this process or another"""
+        with self._version_lock:
+            return (self.corpus_version, self.corpus_writes)
+
+    def _result_cache_key(self, query_embedding, limit, filters=None, candidate_ids=None, version_name=None):
+        """Key cached results by query vector, limit, filters and corpus version"""
+        vector_hash = hashlib.sha1(array('d', query_embedding).tobytes()).hexdigest()
+        filters_key = repr(sorted(filters.items())) if filters else ""
+        candidates_key = (
+            hashlib.sha1(",".join(sorted(map(str, candidate_ids))).encode()).hexdigest()
+            if candidate_ids is not None else ""
+        )
+        return (self.uri, version_name, vector_hash, limit, filters_key, candidates_key, self.corpus_generation())
+
+    def _chunk_scoring_stages(self, query_embedding, limit, field="chunks"):
+        """Pipeline stages that score every chunk exactly and keep the best chunk per document"""
+        return [
+            # Unwind the chunks array to search within each chunk
+            {"$unwind": f"${field}"},
             
-            # Aggregate pipeline for vector search
-            pipeline = [
-                # Match only documents that have chunks
-                {
-                    "$match": {
-                        "chunks": {"$exists": True, "$ne": []}
-                    }
-                },
-                
-                # Unwind the chunks array to search within each chunk
-                {"$unwind": "$chunks"},
-                
-                # Match only chunks that have embeddings
-                {
-                    "$match": {
-                        "chunks.embedding": {"$exists": True}
-                    }
-                },
-                
-                # Add a similarity score using dot product
-                {
-                    "$addFields": {
-                        "similarity": {
-                            "$reduce": {
-                                "input": {"$range": [0, {"$size": "$chunks.embedding"}]},
-                                "initialValue": 0,
-                                "in": {
-                                    "$add": [
-                                        "$$value",
-                                        {"$multiply": [
-                                            {"$arrayElemAt": ["$chunks.embedding", "$$this"]},
-                                            {"$arrayElemAt": [query_embedding, "$$this"]}
-                                        ]}
-                                    ]
-                                }
+            # Match only chunks that have embeddings
+            {
+                "$match": {
+                    f"{field}.embedding": {"$exists": True}
+                }
+            },
+            
+            # Add a similarity score using dot product
+            {
+                "$addFields": {
+                    "similarity": {
+                        "$reduce": {
+                            "input": {"$range": [0, {"$size": f"${field}.embedding"}]},
+                            "initialValue": 0,
+                            "in": {
+                                "$add": [
+                                    "$$value",
+                                    {"$multiply": [
+                                        {"$arrayElemAt": [f"${field}.embedding", "$$this"]},
+                                        {"$arrayElemAt": [query_embedding, "$$this"]}
+                                    ]}
+                                ]
                             }
                         }
                     }
-                },
-                
-                # Sort by similarity score (highest first)
-                {"$sort": {"similarity": -1}},
-                
-                # Group back by document to get best matching chunks
-                {
-                    "$group": {
-                        "_id": "$_id",
-                        "filename": {"$first": "$filename"},
-                        "content": {"$first": "$content"},
-                        "created_at": {"$first": "$created_at"},
-                        "similarity": {"$max": "$similarity"},
-                        "best_chunk": {"$first": "$chunks.text"},
-                    }
-                },
-                
-                # Final sort of documents by best chunk similarity
-                {"$sort": {"similarity": -1}},
-                
-                # Limit results
-                {"$limit": limit}
-            ]
+                }
+            },
+            
+            # Sort by similarity score (highest first)
+            {"$sort": {"similarity": -1}},
+            
+            # Group back by document to get best matching chunks
+            {
+                "$group": {
+                    "_id": "$_id",
+                    "filename": {"$first": "$filename"},
+                    "file_type": {"$first": "$file_type"},
+                    "content": {"$first": "$content"},
+                    "created_at": {"$first": "$created_at"},
+                    "similarity": {"$max": "$similarity"},
+                    "best_chunk": {"$first": f"${field}.text"},
+                }
+            },
+            
+            # Final sort of documents by best chunk similarity
+            {"$sort": {"similarity": -1}},
+            
+            # Limit results
+            {"$limit": limit}
+        ]
+
+    def _exact_search_pipeline(self, query_embedding, limit, candidate_ids=None, filters=None, field="chunks"):
+        """Score all chunks of the matching documents exactly"""
+        match = {field: {"$exists": True, "$ne": []}}
+        # Metadata filters run before $unwind, so narrower filters score fewer chunks
+        match.update(build_filter_match(filters))
+        if candidate_ids is not None:
+            # Only score documents preselected by the keyword index
+            match["_id"] = {"$in": [ObjectId(str(doc_id)) for doc_id in candidate_ids]}
+        return [
+            # Match only documents that have chunks
+            {"$match": match}
+        ] + self._chunk_scoring_stages(query_embedding, limit, field)
+
+    def _vector_search_pipeline(self, query_embedding, limit, filters=None, version=DEFAULT_CORPUS_VERSION):
+        """Fetch candidate documents from the vector index, then rank their chunks exactly"""
+        num_candidates = max(limit * env_int("MONGODB_VECTOR_CANDIDATE_FACTOR", 20), 100)
+        candidate_limit = limit * 4
+        vector_search = {
+            "index": version["index_name"],
+            "path": f"{version['field']}.embedding",
+            "queryVector": query_embedding,
+            "numCandidates": num_candidates,
+            "limit": candidate_limit
+        }
+        # Supported filters are applied inside the index during candidate selection
+        index_filter = build_vector_search_filter(filters)
+        if index_filter:
+            vector_search["filter"] = index_filter
+        
+        pipeline = [{"$vectorSearch": vector_search}]
+        if filters and filters.get("filename_prefix"):
+            # Prefixes can't be pushed into the index; over-fetch and post-filter instead
+            vector_search["numCandidates"] = num_candidates * 4
+            vector_search["limit"] = candidate_limit * 4
+            pipeline.append({"$match": {"filename": build_filter_match(filters)["filename"]}})
+        return pipeline + self._chunk_scoring_stages(query_embedding, limit, version["field"])
+
+    def search_documents(self, query_embedding, limit=5, candidate_ids=None, filters=None, version=None):
+        """Search documents using vector similarity, optionally restricted by metadata filters
+        (file_types, created_after, created_before, filename_prefix) or candidate document IDs.
+
+        version is the corpus version the query was embedded for (the active one unless given).
+        """
+        from pymongo.errors import OperationFailure
+        try:
+            collection = self.ensure_connection()
+            version = version or self.active_version()
+            field = version["field"]
+            
+            # Serve repeated queries from the cache until the corpus changes
+            cache_key = self._result_cache_key(query_embedding, limit, filters, candidate_ids, version["version"])
+            cached = self.result_cache.get(cache_key)
+            CACHE_LOOKUPS.inc(cache="search_results", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                logger.info(f"Found {len(cached)} documents matching the query (cached)")
+                return [dict(result) for result in cached]
+            
+            results = None
+            if candidate_ids is not None:
+                # A small prefiltered candidate set is cheapest to score exactly
+                with _round_trip("prefiltered_search"):
+                    results = list(collection.aggregate(
+                        self._exact_search_pipeline(query_embedding, limit, candidate_ids, filters, field)
+                    )) if candidate_ids else []
+            elif self.is_search_index_ready(version["index_name"]):
+                try:
+                    with _round_trip("vector_search"):
+                        results = list(collection.aggregate(
+                            self._vector_search_pipeline(query_embedding, limit, filters, version)
+                        ))
+                except OperationFailure as e:
+                    logger.warning(f"Vector index query failed, falling back to exact search: {e}")
+            if results is None:
+                # Degrade to exact scoring while the index builds or if it is unavailable
+                with _round_trip("exact_search"):
+                    results = list(collection.aggregate(
+                        self._exact_search_pipeline(query_embedding, limit, filters=filters, field=field)
+                    ))
             
-            results = list(collection.aggregate(pipeline))
+            self.result_cache.put(cache_key, results)
             
             if not results:
                 logger.warning("No documents found with valid chunks and embeddings")
                 return []
             
             logger.info(f"Found {len(results)} documents matching the query")
-            return results
+            return [dict(result) for result in results]
             
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
@@ -1,68 +1,208 @@
-import httpx
-from openai import OpenAI
 import streamlit as st
 from utils.logger import logger
+from utils.singleflight import SingleFlight
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.config import env_int, env_float, env_bool
+from utils.cache import EmbeddingCache, normalize_query
+from utils.metrics import track_stage, OPENAI_SECONDS, EMBEDDED_TEXTS, CACHE_LOOKUPS
+from utils.tracing import span
+import threading
+import time
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def model_key(model, dimensions=None):
+    """Name for a model at a requested output size, used to key caches and batchers"""
+    return model if dimensions is None else f"{model}/{dimensions}"
 
 class OpenAIClient:
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(OpenAIClient, cls).__new__(cls)
             cls._instance.client = None
             cls._instance.http_client = None
+            cls._instance.api_key = None
+            # Identical (model, text) requests in flight share one API call
+            cls._instance.inflight = SingleFlight()
+            # Query embeddings from concurrent sessions are micro-batched per model
+            cls._instance.batchers = {}
+            cls._instance._batchers_lock = threading.Lock()
+            # Repeated search queries are served from a normalized-query cache
+            cls._instance.query_cache = EmbeddingCache(
+                max_entries=env_int("QUERY_CACHE_MAX_ENTRIES", 1024),
+                ttl_seconds=env_int("QUERY_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+                persist=env_bool("QUERY_CACHE_PERSIST", True)
+            )
         return cls._instance
-    
-    def connect(self):
+
+    def connect(self, api_key=None):
         """Connect or reconnect to OpenAI with current credentials"""
-        if not st.session_state.get('openai_api_key'):
+        # An explicit key lets scripts and benchmarks connect outside a Streamlit session
+        api_key = api_key or st.session_state.get('openai_api_key')
+        if not api_key:
             logger.error("OpenAI API key not found in settings")
             raise ValueError("OpenAI API key not found in settings. Please configure it in the Settings page.")
-            
+
         try:
-            if self.http_client:
-                self.close()
-                
-            self.http_client = httpx.Client()
+            # The SDK and httpx take most of a second to import, so pages load them on first connect
+            from openai import OpenAI
+            from utils.http_transport import get_shared_http_client, build_timeout
+
+            # The HTTP transport is shared by every session and outlives reconnects,
+            # so only the lightweight API wrapper is rebuilt here
+            self.http_client = get_shared_http_client()
+            self.api_key = api_key
             self.client = OpenAI(
-                api_key=st.session_state.openai_api_key,
-                http_client=self.http_client
+                api_key=self.api_key,
+                http_client=self.http_client,
+                timeout=build_timeout(),
+                max_retries=0  # Retries are handled by the transport
             )
             logger.info("Successfully connected to OpenAI")
         except Exception as e:
             logger.error(f"Failed to connect to OpenAI: {e}")
             raise
-            
+
     def ensure_connection(self):
         """Ensure we have a valid connection before operations"""
-        if not self.client:
+        session_key = st.session_state.get('openai_api_key')
+        if not self.client or (session_key and session_key != self.api_key):
             self.connect()
         return self.client
-    
-    def get_embedding(self, text):
+
+    def get_embedding(self, text, model=EMBEDDING_MODEL, dimensions=None):
         """Get embedding for a text using OpenAI's API"""
         try:
-            client = self.ensure_connection()
-            response = client.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"
-            )
-            logger.info("Successfully generated embedding")
-            return response.data[0].embedding
+            with track_stage("embed"):
+                return self.inflight.do((model_key(model, dimensions), text),
+                                        lambda: self._create_embedding(text, model, dimensions))
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
-        
+
+    def get_embeddings(self, texts, model=EMBEDDING_MODEL, batch_size=None, dimensions=None):
+        """Get embeddings for many texts with batched API calls, preserving input order"""
+        batch_size = batch_size or env_int("EMBED_REQUEST_BATCH_SIZE", 256)
+        try:
+            self.ensure_connection()
+            embeddings = []
+            with track_stage("embed"):
+                for start in range(0, len(texts), batch_size):
+                    embeddings.extend(self._create_embeddings(texts[start:start + batch_size], model, dimensions))
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            raise
+
+    def get_query_embeddings(self, texts, model=EMBEDDING_MODEL, dimensions=None):
+        """Get embeddings for many search queries, embedding only distinct cache misses"""
+        cache_model = model_key(model, dimensions)
+        embeddings = [self.query_cache.get(cache_model, text) for text in texts]
+        hits = sum(embedding is not None for embedding in embeddings)
+        CACHE_LOOKUPS.inc(hits, cache="query_embedding", result="hit")
+        CACHE_LOOKUPS.inc(len(texts) - hits, cache="query_embedding", result="miss")
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            fresh = dict(zip(missing, self.get_embeddings(missing, model, dimensions=dimensions)))
+            for text, embedding in fresh.items():
+                self.query_cache.put(cache_model, text, embedding)
+            embeddings = [embedding if embedding is not None else fresh[text]
+                          for text, embedding in zip(texts, embeddings)]
+        return embeddings
+
+    def get_query_embedding(self, text, model=EMBEDDING_MODEL, dimensions=None):
+        """Get a search query embedding, batched with concurrent queries from other sessions"""
+        cache_model = model_key(model, dimensions)
+        try:
+            with track_stage("embed"):
+                cached = self.query_cache.get(cache_model, text)
+                CACHE_LOOKUPS.inc(cache="query_embedding", result="hit" if cached is not None else "miss")
+                if cached is not None:
+                    return cached
+
+                # Resolve credentials on the caller's thread; the batcher thread has no session state
+                self.ensure_connection()
+                batcher = self._get_batcher(model, dimensions)
+                # Keyed like the cache, so queries that share a cache entry also share one request
+                embedding = self.inflight.do((cache_model, normalize_query(text)), lambda: batcher.embed(text))
+                self.query_cache.put(cache_model, text, embedding)
+                return embedding
+        except Exception as e:
+            logger.error(f"Error generating query embedding: {e}")
+            raise
+
+    def _get_batcher(self, model, dimensions=None):
+        """Return the micro-batcher for a model, creating it on first use"""
+        key = model_key(model, dimensions)
+        with self._batchers_lock:
+            if key not in self.batchers:
+                self.batchers[key] = EmbeddingBatcher(
+                    lambda texts: self._create_embeddings(texts, model, dimensions),
+                    window_ms=env_float("EMBED_BATCH_WINDOW_MS", 5.0),
+                    max_batch_size=env_int("EMBED_BATCH_MAX_SIZE", 64),
+                    name=f"embedding-batcher-{key}",
+                    timeout=env_float("EMBED_BATCH_TIMEOUT_SECONDS", 60.0)
+                )
+            return self.batchers[key]
+
+    def _create_embeddings(self, texts, model, dimensions=None):
+        """Call the embeddings endpoint for a batch of texts, preserving input order"""
+        if not self.client:
+            raise ValueError("OpenAI API key not found in settings. Please configure it in the Settings page.")
+        response = self._timed_request(self.client, texts, model, dimensions)
+        logger.info(f"Successfully generated {len(texts)} embeddings in one batch")
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _create_embedding(self, text, model, dimensions=None):
+        """Call the embeddings endpoint for a single text"""
+        client = self.ensure_connection()
+        response = self._timed_request(client, text, model, dimensions)
+        logger.info("Successfully generated embedding")
+        return response.data[0].embedding
+
+    def _timed_request(self, client, texts, model, dimensions=None):
+        """Call the embeddings endpoint, recording request latency and volume"""
+        count = 1 if isinstance(texts, str) else len(texts)
+        # text-embedding-3 models can return shortened vectors; omitted, the model's full size is used
+        options = {"dimensions": dimensions} if dimensions is not None else {}
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span("openai.request", texts=count):
+                response = client.embeddings.create(
+                    input=texts,
+                    model=model,
+                    **options
+                )
+            status = "ok"
+            return response
+        finally:
+            OPENAI_SECONDS.observe(time.perf_counter() - started, status=status)
+            EMBEDDED_TEXTS.inc(count)
+
+    def get_stats(self):
+        """Return request coalescing and batching statistics"""
+        with self._batchers_lock:
+            batching = {model: batcher.get_stats() for model, batcher in self.batchers.items()}
+        return {
+            "coalescing": self.inflight.get_stats(),
+            "batching": batching,
+            "query_cache": self.query_cache.get_stats()
+        }
+
     def close(self):
         """Close the OpenAI connection"""
         try:
-            if self.http_client:
-                self.http_client.close()
-                self.http_client = None
+            if self.client:
+                # Leave the shared transport open for other sessions
                 self.client = None
+                self.api_key = None
                 logger.info("OpenAI connection closed")
         except Exception as e:
             logger.error(f"Error closing OpenAI connection: {e}")
 
 # Create a singleton instance
-openai_client = OpenAIClient() 
\ No newline at end of file
+openai_client = OpenAIClient()
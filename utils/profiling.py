@@ -0,0 +1,278 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from utils.config import env_bool, env_int, env_float
+from utils.logger import logger
+from utils.tracing import current_request_id, new_request_id
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+
+def _short_path(filename):
+    """Trim a source path to the part after the project root or site-packages"""
+    for marker in ("site-packages" + os.sep, os.path.dirname(os.__file__) + os.sep,
+                   str(Path(__file__).parent.parent) + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
+
+
+class StackSampler:
+    """Sampling profiler: records the stack of one thread at a fixed interval from a daemon thread"""
+
+    def __init__(self, thread_id, interval_seconds=0.005, max_depth=128):
+        self.thread_id = thread_id
+        self.interval = interval_seconds
+        self.max_depth = max_depth
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            functions = []
+            while frame is not None and len(functions) < self.max_depth:
+                code = frame.f_code
+                functions.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[functions[0]] += 1
+            # Recursive functions count once per sample towards their total
+            for function in set(functions):
+                self.total_counts[function] += 1
+            self.stacks[";".join(f"{name} ({_short_path(filename)}:{line})"
+                                 for filename, line, name in reversed(functions))] += 1
+
+    def hotspots(self, elapsed_seconds, top_n):
+        """Top functions by samples where they were running, with time estimated from sample share"""
+        per_sample_ms = elapsed_seconds * 1000.0 / self.samples if self.samples else 0.0
+        return [
+            {
+                "function": name,
+                "file": _short_path(filename),
+                "line": line,
+                "samples": count,
+                "self_ms": round(count * per_sample_ms, 3),
+                "cumulative_ms": round(self.total_counts[(filename, line, name)] * per_sample_ms, 3)
+            }
+            for (filename, line, name), count in self.self_counts.most_common(top_n)
+        ]
+
+    def folded(self):
+        """Collapsed stacks ('outer;inner count' per line), the input format of flame graph tools"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def cprofile_hotspots(profile, top_n):
+    """Top functions by own time from a cProfile run"""
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+    return [
+        {
+            "function": name,
+            "file": _short_path(filename),
+            "line": line,
+            "calls": total_calls,
+            "self_ms": round(own_time * 1000.0, 3),
+            "cumulative_ms": round(cumulative_time * 1000.0, 3)
+        }
+        for (filename, line, name), (_, total_calls, own_time, cumulative_time, _) in rows
+    ]
+
+
+class Profiler:
+    """On-demand profiling of uploads and searches, saved under logs/profiles/"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Profiler, cls).__new__(cls)
+            cls._instance.profiles_dir = Path(__file__).parent.parent / "logs" / "profiles"
+            cls._instance.enabled = env_bool("PROFILE_REQUESTS", False)
+            cls._instance.mode = os.getenv("PROFILE_MODE", "cprofile")
+            cls._instance.memory = env_bool("PROFILE_MEMORY", False)
+            cls._instance.sample_interval = env_float("PROFILE_SAMPLE_INTERVAL_MS", 5.0) / 1000.0
+            cls._instance.top_n = env_int("PROFILE_TOP_N", 25)
+            cls._instance.keep = env_int("PROFILE_KEEP", 100)
+            cls._instance._lock = threading.Lock()
+            cls._instance._memory_users = 0
+            cls._instance._memory_started = False
+            if cls._instance.mode not in PROFILE_MODES:
+                logger.warning(f"Unknown PROFILE_MODE {cls._instance.mode}, using cprofile")
+                cls._instance.mode = "cprofile"
+        return cls._instance
+
+    def configure(self, enabled=None, mode=None, memory=None):
+        """Change profiling settings for this server process (the Settings page toggle)"""
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if enabled is not None:
+            self.enabled = enabled
+        if mode is not None:
+            self.mode = mode
+        if memory is not None:
+            self.memory = memory
+        logger.info(f"Profiling {'enabled' if self.enabled else 'disabled'} "
+                    f"(mode={self.mode}, memory={self.memory})")
+
+    def _start_memory(self):
+        # tracemalloc is process-wide; leave it running if something else started it
+        with self._lock:
+            if self._memory_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                self._memory_started = True
+            self._memory_users += 1
+
+    def _stop_memory(self):
+        with self._lock:
+            self._memory_users -= 1
+            if self._memory_users == 0 and self._memory_started:
+                tracemalloc.stop()
+                self._memory_started = False
+
+    @contextmanager
+    def profile(self, name, **attributes):
+        """Profile the enclosed block when profiling is enabled; a no-op otherwise"""
+        if not self.enabled:
+            yield None
+            return
+        mode, memory = self.mode, self.memory
+        # The baseline snapshot is taken before the profiler starts so it does not show up as a hotspot
+        if memory:
+            self._start_memory()
+            baseline = tracemalloc.take_snapshot()
+        if mode == "sampling":
+            collector = StackSampler(threading.get_ident(), self.sample_interval).start()
+        else:
+            collector = cProfile.Profile()
+            try:
+                collector.enable()
+            except ValueError as e:
+                # Newer Pythons allow one deterministic profiler per process at a time
+                logger.warning(f"Skipping profile of {name}: {e}")
+                collector = None
+            if collector is None:
+                if memory:
+                    self._stop_memory()
+                yield None
+                return
+        started_at = datetime.now()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield collector
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if mode == "sampling":
+                collector.stop()
+            else:
+                collector.disable()
+            allocations = None
+            if memory:
+                try:
+                    allocations = tracemalloc.take_snapshot().compare_to(baseline, "lineno")
+                finally:
+                    self._stop_memory()
+            try:
+                self._save(name, mode, collector, allocations, started_at, elapsed, attributes, error)
+            except Exception as e:
+                # Profiling is diagnostics; never fail the request because a profile could not be saved
+                logger.error(f"Error saving profile: {str(e)}")
+
+    def _save(self, name, mode, collector, allocations, started_at, elapsed, attributes, error):
+        request_id = current_request_id() or new_request_id()
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{started_at.strftime('%Y%m%d_%H%M%S')}_{re.sub(r'[^A-Za-z0-9_-]', '_', name)}_{request_id}"
+        summary = {
+            "request_id": request_id,
+            "name": name,
+            "mode": mode,
+            "started_at": started_at.isoformat(),
+            "duration_ms": round(elapsed * 1000.0, 3),
+            "attributes": attributes,
+            "error": error,
+            # Both profilers follow the request's own thread; work it hands to the embedding
+            # batcher or a thread pool appears only as time spent waiting
+            "scope": "calling thread",
+            "files": {}
+        }
+        if mode == "sampling":
+            summary["samples"] = collector.samples
+            summary["sample_interval_ms"] = self.sample_interval * 1000.0
+            summary["hotspots"] = collector.hotspots(elapsed, self.top_n)
+            folded_path = self.profiles_dir / f"{stem}.folded"
+            folded_path.write_text(collector.folded(), encoding="utf-8")
+            summary["files"]["stacks"] = folded_path.name
+        else:
+            summary["hotspots"] = cprofile_hotspots(collector, self.top_n)
+            stats_path = self.profiles_dir / f"{stem}.prof"
+            collector.dump_stats(stats_path)
+            summary["files"]["stats"] = stats_path.name
+        if allocations is not None:
+            summary["memory"] = [
+                {
+                    "location": f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size_diff / 1024.0, 1),
+                    "count": stat.count_diff
+                }
+                for stat in allocations[:self.top_n]
+            ]
+            summary["memory_net_kb"] = round(sum(stat.size_diff for stat in allocations) / 1024.0, 1)
+        summary_path = self.profiles_dir / f"{stem}.json"
+        temp_path = summary_path.with_suffix(".json.tmp")
+        temp_path.write_text(json.dumps(summary, indent=2, default=str), encoding="utf-8")
+        os.replace(temp_path, summary_path)
+        logger.info(f"Saved {mode} profile of {name} ({elapsed * 1000.0:.0f} ms) to {summary_path.name}")
+        self._prune()
+        return summary_path
+
+    def _prune(self):
+        """Keep only the newest PROFILE_KEEP profiles"""
+        summaries = sorted(self.profiles_dir.glob("*.json"), reverse=True)
+        for summary_path in summaries[self.keep:]:
+            for path in self.profiles_dir.glob(f"{summary_path.stem}.*"):
+                path.unlink(missing_ok=True)
+
+    def list_profiles(self, limit=None):
+        """Saved profile summaries, newest first"""
+        profiles = []
+        for summary_path in sorted(self.profiles_dir.glob("*.json"), reverse=True)[:limit]:
+            try:
+                summary = json.loads(summary_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable profile {summary_path.name}: {e}")
+                continue
+            summary["path"] = summary_path
+            profiles.append(summary)
+        return profiles
+
+# Create a singleton instance
+profiler = Profiler()
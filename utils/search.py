@@ -0,0 +1,148 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from utils.mongodb import mongodb
+from utils.openai_client import openai_client
+from utils.lexical_index import lexical_index
+from utils.vector_index import exact_vector_index
+from utils.config import env_int
+from utils.metrics import track_stage
+from utils.tracing import span
+from utils.logger import logger
+
+# Search modes offered on the Search page
+SEARCH_MODES = {
+    "hybrid": "Hybrid (keyword + semantic)",
+    "semantic": "Semantic",
+    "keyword": "Keyword",
+    "prefiltered": "Semantic within keyword matches"
+}
+
+# Standard reciprocal-rank fusion damping constant
+RRF_K = 60
+
+# Batch search backends: one in-memory matrix product, or concurrent per-query database searches
+BATCH_BACKENDS = ("matrix", "parallel")
+
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K):
+    """Fuse ranked lists of document IDs into one ranking of (doc_id, score)"""
+    scores = {}
+    for ranking in ranked_lists:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _lexical_result(hit):
+    """Shape a keyword index hit like a vector search result"""
+    return {
+        "_id": ObjectId(hit["doc_id"]) if ObjectId.is_valid(hit["doc_id"]) else hit["doc_id"],
+        "filename": hit.get("filename"),
+        "file_type": hit.get("file_type"),
+        "created_at": hit.get("created_at"),
+        "similarity": None,
+        "best_chunk": hit["best_chunk"],
+        "lexical_score": hit["lexical_score"]
+    }
+
+
+def search(query, limit=5, mode="hybrid", filters=None):
+    """Search documents by keyword, semantic similarity or both, best match first.
+
+    filters may contain file_types, created_after, created_before and filename_prefix.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    with track_stage("search"):
+        return _search(query, limit, mode, filters)
+
+
+def _search(query, limit, mode, filters):
+    """Run a search in the given mode"""
+
+    if mode == "keyword":
+        with span("keyword"):
+            hits = lexical_index.search_documents(query, limit=limit, filters=filters)
+        return [_lexical_result(hit) for hit in hits]
+
+    # The query is embedded for, and searched against, one corpus version even if a migration
+    # switches versions in the meantime
+    version = mongodb.active_version()
+    query_embedding = openai_client.get_query_embedding(
+        query, model=version["model"], dimensions=version["dimensions"]
+    )
+
+    if mode == "semantic":
+        return mongodb.search_documents(query_embedding, limit=limit, filters=filters, version=version)
+
+    if mode == "prefiltered":
+        # Only documents containing a query term are scored against the query vector
+        with span("keyword"):
+            candidates = lexical_index.candidate_document_ids(
+                query, limit=max(limit, env_int("SEARCH_PREFILTER_CANDIDATES", 200)), filters=filters
+            )
+        if not candidates:
+            logger.info("No keyword matches to prefilter on, falling back to semantic search")
+            return mongodb.search_documents(query_embedding, limit=limit, filters=filters, version=version)
+        return mongodb.search_documents(
+            query_embedding, limit=limit, candidate_ids=candidates, filters=filters, version=version
+        )
+
+    # Hybrid: fuse the keyword and vector rankings
+    vector_results = mongodb.search_documents(query_embedding, limit=limit, filters=filters, version=version)
+    with span("keyword"):
+        lexical_results = [
+            _lexical_result(hit) for hit in lexical_index.search_documents(query, limit=limit, filters=filters)
+        ]
+
+    by_id = {}
+    for result in lexical_results + vector_results:
+        # Prefer the vector result's fields when a document appears in both lists
+        merged = by_id.setdefault(str(result["_id"]), {})
+        for field, value in result.items():
+            if value is not None or field not in merged:
+                merged[field] = value
+
+    fused = reciprocal_rank_fusion([
+        [str(result["_id"]) for result in vector_results],
+        [str(result["_id"]) for result in lexical_results]
+    ])
+    results = []
+    for doc_id, score in fused[:limit]:
+        result = by_id[doc_id]
+        result["fusion_score"] = score
+        results.append(result)
+    return results
+
+
+def search_many(queries, k=5, backend="matrix", filters=None, workers=None):
+    """Run semantic search for many queries at once; returns one result list per query, in order.
+
+    Queries are embedded in batched API calls, skipping cached ones. The matrix backend scores every query against
+    an in-memory chunk matrix in one product; the parallel backend runs the per-query
+    database searches concurrently. The matrix backend falls back to the parallel one when the
+    corpus is too large for the in-memory matrix.
+    """
+    if backend not in BATCH_BACKENDS:
+        raise ValueError(f"Unknown batch search backend: {backend}")
+    if not queries:
+        return []
+
+    version = mongodb.active_version()
+    embeddings = openai_client.get_query_embeddings(
+        list(queries), model=version["model"], dimensions=version["dimensions"]
+    )
+
+    if backend == "matrix" and exact_vector_index.load(mongodb, filters=filters, corpus_version=version):
+        return exact_vector_index.search_many(embeddings, k=k)
+
+    workers = workers or env_int("BATCH_SEARCH_WORKERS", 8)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-search") as executor:
+        # Each search runs in a copy of the caller's context so it joins the caller's trace
+        futures = [
+            executor.submit(contextvars.copy_context().run, mongodb.search_documents,
+                            embedding, limit=k, filters=filters, version=version)
+            for embedding in embeddings
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from utils.logger import logger
+
+
+def file_hash(file_path, block_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TextStore:
+    """Extracted document text on disk, gzip-compressed, keyed by content hash and extractor version.
+
+    Each entry holds the raw text of every page as the extractor returned it, plus the cleaned
+    text and its page offsets, so re-chunking reads this store instead of parsing the original
+    file again, and a change to the cleaning rules only needs the raw pages.
+    """
+
+    def __init__(self, root=None, compresslevel=6):
+        project_root = Path(__file__).parent.parent
+        self.root = Path(root) if root else project_root / "data" / "text"
+        self.compresslevel = compresslevel
+
+    def path_for(self, content_hash, extractor_version):
+        """File holding one entry; fanned out by hash prefix to keep directories small"""
+        return self.root / content_hash[:2] / f"{content_hash}.v{extractor_version}.json.gz"
+
+    def get(self, content_hash, extractor_version):
+        """Return the stored entry, or None if this file was never extracted with this version"""
+        path = self.path_for(content_hash, extractor_version)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading extracted text {path.name}: {e}")
+            return None
+
+    def put(self, content_hash, extractor_version, entry):
+        """Write an entry atomically; a failed write only costs a later re-extraction"""
+        path = self.path_for(content_hash, extractor_version)
+        entry = dict(entry, content_hash=content_hash, extractor_version=extractor_version,
+                     stored_at=time.time())
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=self.compresslevel) as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            return path
+        except Exception as e:
+            logger.error(f"Error writing extracted text {path.name}: {e}")
+            return None
+
+    def delete(self, content_hash):
+        """Remove every version stored for a file"""
+        for path in (self.root / content_hash[:2]).glob(f"{content_hash}.v*.json.gz"):
+            path.unlink(missing_ok=True)
+
+    def get_stats(self):
+        """Number of entries and their size on disk"""
+        paths = list(self.root.glob("*/*.json.gz")) if self.root.exists() else []
+        return {"entries": len(paths), "bytes": sum(path.stat().st_size for path in paths)}
+
+# Create a singleton instance
+text_store = TextStore()
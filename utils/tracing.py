@@ -0,0 +1,191 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# The trace and span of the request running in the current context (thread or task)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def new_request_id():
+    """Short random request identifier"""
+    return uuid.uuid4().hex[:12]
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("span_id", "parent_id", "name", "attributes", "start", "end", "thread")
+
+    def __init__(self, span_id, parent_id, name, attributes, start=None):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def duration_ms(self):
+        return ((self.end if self.end is not None else time.perf_counter()) - self.start) * 1000.0
+
+
+class Trace:
+    """Request-scoped record of nested spans"""
+
+    def __init__(self, name, request_id=None, **attributes):
+        self.request_id = request_id or new_request_id()
+        self.name = name
+        self.started_at = datetime.now()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.spans = []
+        self.root = self._new_span(name, None, attributes)
+
+    def _new_span(self, name, parent_id, attributes, start=None):
+        with self._lock:
+            self._next_id += 1
+            span = Span(self._next_id, parent_id, name, attributes, start)
+            self.spans.append(span)
+        return span
+
+    def add_span(self, name, started, seconds, **attributes):
+        """Record a span measured outside the trace context, e.g. page rendering"""
+        span = self._new_span(name, self.root.span_id, attributes, start=started)
+        span.end = started + seconds
+        return span
+
+    @property
+    def duration_ms(self):
+        return self.root.duration_ms
+
+    def total_ms(self, name=None, prefix=None):
+        """Sum the durations of spans with a given name or name prefix"""
+        with self._lock:
+            spans = list(self.spans)
+        return sum(
+            span.duration_ms for span in spans
+            if span is not self.root and (span.name == name or (prefix and span.name.startswith(prefix)))
+        )
+
+    def to_dict(self):
+        """JSON-serializable form with span start offsets relative to the trace start"""
+        with self._lock:
+            spans = list(self.spans)
+        origin = self.root.start
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.root.attributes,
+            "spans": [
+                {
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "start_ms": round((span.start - origin) * 1000.0, 3),
+                    "duration_ms": round(span.duration_ms, 3),
+                    "thread": span.thread,
+                    "attributes": span.attributes
+                }
+                for span in spans
+            ]
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, default=str)
+
+
+class TraceStore:
+    """Bounded history of finished traces in this process"""
+
+    def __init__(self, max_traces=200):
+        self._traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def get(self, request_id):
+        with self._lock:
+            return next((trace for trace in self._traces if trace.request_id == request_id), None)
+
+    def recent(self, limit=None):
+        """Most recent traces first"""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return traces[:limit] if limit else traces
+
+    def export_json(self, limit=None):
+        """Export recent traces as a JSON array"""
+        return json.dumps([trace.to_dict() for trace in self.recent(limit)], indent=2, default=str)
+
+# Create a singleton instance (the logger imports this module, so it reads the environment directly)
+trace_store = TraceStore(max_traces=int(os.environ.get("TRACE_HISTORY", "200")))
+
+
+@contextmanager
+def start_trace(name, request_id=None, **attributes):
+    """Start a request trace for the enclosed block and make it current"""
+    trace = Trace(name, request_id, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end = time.perf_counter()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        trace_store.add(trace)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as a child of the current span; a no-op outside a trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = trace._new_span(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_request_id():
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to log records (request_id, and request_tag for formats)"""
+
+    def filter(self, record):
+        request_id = current_request_id()
+        record.request_id = request_id
+        record.request_tag = f" [request {request_id}]" if request_id else ""
+        return True
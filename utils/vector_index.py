@@ -0,0 +1,147 @@
+import threading
+from utils.mongodb import build_filter_match
+from utils.config import env_int
+from utils.logger import logger
+
+# Documents fetched per round trip while loading, and chunk rows converted to float32 at a time
+LOAD_BATCH_DOCUMENTS = 100
+BUILD_BLOCK_ROWS = 4096
+
+
+class ExactVectorIndex:
+    """In-memory chunk embedding matrix for exact many-query search with one matrix product"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.matrix = None
+        self.doc_starts = None
+        self.documents = []
+        self.chunk_texts = []
+        self.loaded_version = None
+        self.refused_version = None
+
+    def build(self, documents, field="chunks", max_bytes=None):
+        """Build the index from documents with chunks carrying embeddings.
+
+        Embeddings are converted to float32 a block of rows at a time, so only one block is ever
+        held as Python floats. Returns False, leaving the current index in place, once the matrix
+        would exceed max_bytes.
+        """
+        # NumPy is only needed once the index is built, so the Search page does not import it on load
+        import numpy as np
+        blocks, rows, texts, starts, docs = [], [], [], [], []
+        row_count, matrix_bytes = 0, 0
+        for document in documents:
+            chunks = [chunk for chunk in document.get(field, []) if chunk.get("embedding")]
+            if not chunks:
+                continue
+            starts.append(row_count)
+            docs.append({key: value for key, value in document.items() if key not in (field, "content")})
+            for chunk in chunks:
+                rows.append(chunk["embedding"])
+                texts.append(chunk.get("text"))
+            row_count += len(chunks)
+            if len(rows) >= BUILD_BLOCK_ROWS:
+                blocks.append(np.asarray(rows, dtype=np.float32))
+                rows = []
+                matrix_bytes += blocks[-1].nbytes
+                if max_bytes and matrix_bytes > max_bytes:
+                    return False
+        if rows:
+            blocks.append(np.asarray(rows, dtype=np.float32))
+            matrix_bytes += blocks[-1].nbytes
+            if max_bytes and matrix_bytes > max_bytes:
+                return False
+
+        matrix = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        self.build_arrays(matrix, starts, docs, texts)
+        return True
+
+    def build_arrays(self, matrix, doc_starts, documents, chunk_texts):
+        """Build the index from a prepared (chunks x dims) matrix and each document's first row"""
+        import numpy as np
+        # Rows of a document are contiguous, so per-document maxima are one reduceat
+        with self._lock:
+            self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            self.doc_starts = np.asarray(doc_starts, dtype=np.int64)
+            self.documents = documents
+            self.chunk_texts = chunk_texts
+        logger.info(f"Built exact vector index with {len(documents)} documents and {len(matrix)} chunks")
+
+    def load(self, mongodb, filters=None, corpus_version=None):
+        """Load chunk embeddings of a corpus version (the active one unless given) from MongoDB,
+        reusing the matrix while the corpus is unchanged.
+
+        Returns False when the embeddings would take more than VECTOR_INDEX_MAX_MB; callers then
+        search the database per query instead. The refusal is remembered until the corpus changes.
+        """
+        try:
+            mongodb.ensure_connection()
+            corpus_version = corpus_version or mongodb.active_version()
+            field = corpus_version["field"]
+            version = (mongodb.corpus_generation(), corpus_version["version"], repr(sorted((filters or {}).items())))
+            if self.matrix is not None and self.loaded_version == version:
+                return True
+            if self.refused_version == version:
+                return False
+            match = {field: {"$exists": True, "$ne": []}}
+            match.update(build_filter_match(filters))
+            projection = {"filename": 1, "file_type": 1, "created_at": 1,
+                          f"{field}.text": 1, f"{field}.embedding": 1}
+            max_mb = env_int("VECTOR_INDEX_MAX_MB", 1024)
+            documents = mongodb.collection.find(match, projection, batch_size=LOAD_BATCH_DOCUMENTS)
+            if not self.build(documents, field, max_bytes=max_mb * 1024 * 1024):
+                documents.close()
+                self.refused_version = version
+                logger.warning(f"Exact vector index would exceed VECTOR_INDEX_MAX_MB ({max_mb} MB); not loading it")
+                return False
+            self.loaded_version = version
+            return True
+        except Exception as e:
+            logger.error(f"Error loading exact vector index: {e}")
+            raise
+
+    def search_many(self, query_embeddings, k=5):
+        """Return the top-k documents for each query embedding, best first"""
+        import numpy as np
+        with self._lock:
+            matrix, starts = self.matrix, self.doc_starts
+            documents, texts = self.documents, self.chunk_texts
+        if matrix is None or not len(documents):
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        ends = np.append(starts[1:], matrix.shape[0])
+        k = min(k, len(documents))
+        # Queries are scored a block at a time so the (queries x chunks) score matrix stays
+        # within VECTOR_SCORE_BLOCK_MB however many queries there are
+        block_bytes = env_int("VECTOR_SCORE_BLOCK_MB", 256) * 1024 * 1024
+        block_rows = max(1, min(256, block_bytes // (4 * matrix.shape[0])))
+        results = []
+        for block_start in range(0, len(queries), block_rows):
+            # (block queries x chunks) similarity matrix in one product
+            scores = queries[block_start:block_start + block_rows] @ matrix.T
+            # Best chunk score per document: (block queries x documents)
+            doc_scores = np.maximum.reduceat(scores, starts, axis=1)
+            for row, query_scores in enumerate(doc_scores):
+                top = np.argpartition(-query_scores, k - 1)[:k]
+                top = top[np.argsort(-query_scores[top])]
+                hits = []
+                for doc_index in top:
+                    start, end = starts[doc_index], ends[doc_index]
+                    best_chunk = start + int(np.argmax(scores[row, start:end]))
+                    result = dict(documents[doc_index])
+                    result["similarity"] = float(query_scores[doc_index])
+                    result["best_chunk"] = texts[best_chunk]
+                    hits.append(result)
+                results.append(hits)
+        return results
+
+    def get_stats(self):
+        """Return index size counters"""
+        with self._lock:
+            chunks, dims = self.matrix.shape if self.matrix is not None and self.matrix.size else (0, 0)
+            return {"documents": len(self.documents), "chunks": chunks, "dimensions": dims}
+
+# Create a singleton instance
+exact_vector_index = ExactVectorIndex()